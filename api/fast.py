@@ -1,31 +1,50 @@
-from fastapi import FastAPI, HTTPException
-from google.cloud import storage
+from fastapi import FastAPI, Header, HTTPException, Response
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
+from contextlib import asynccontextmanager
+import asyncio
 import pandas as pd
 import json
-from io import StringIO
+import math
+import time
+from functools import lru_cache
 
-app = FastAPI()
-client = storage.Client()
+from solar_germany.aggregates import GEOGRAPHY_LEVELS, rollup
+from solar_germany.analytics import KINDS, LEVELS, TREND_METRICS, snapshot_trends, trend_index
+from solar_germany.approximate import estimate_distinct, estimate_totals
+from solar_germany import dictionary
+from solar_germany.bundle import current_bundle, load_bundle
+from solar_germany.clients import load_blob_json, open_blob
+from solar_germany.concurrency import BoundedExecutor, Overloaded
+from solar_germany.export import negotiate, serialize
+from solar_germany.metrics import FILTER_ROWS, observe_dataset, observe_request, render, timed
+from solar_germany.params import DISTRICTS_GEOJSON_FILE, DISTRICT_PROPERTIES, MODEL_PATH, STATE_PROPERTIES
+from solar_germany.explain import explain_cached
+from solar_germany.prediction import load_model, model_version, predict_cached, prediction_cache_info
+from solar_germany.snapshots import list_snapshots, load_snapshot, compare_snapshots
+from solar_germany.spatial import SpatialIndex, aggregate_areas, bounding_box, circle
+from solar_germany.storage import read_filtered
+from solar_germany.tiles import read_tile
+
+# CPU-heavy work (filtering, serialization) runs here, never on the event loop
+cpu_executor = BoundedExecutor()
+
+# Both loaders parse while the rest of the file downloads (see solar_germany.streaming)
+def read_csv_blob(bucket_name: str, file_name: str) -> pd.DataFrame:
+    with open_blob(bucket_name, file_name) as stream:
+        return dictionary.read_csv(stream)
 
 # Utility function to load CSV from GCS
-def load_csv_from_gcs(bucket_name: str, file_name: str):
+async def load_csv_from_gcs(bucket_name: str, file_name: str):
     try:
-        bucket = client.bucket(bucket_name)
-        blob = bucket.blob(file_name)
-        data = blob.download_as_text()
-        return pd.read_csv(StringIO(data))
+        return await asyncio.to_thread(read_csv_blob, bucket_name, file_name)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error loading CSV from GCS: {str(e)}")
 
 # Utility function to load GeoJSON from GCS
-def load_geojson_from_gcs(bucket_name: str, file_name: str):
+async def load_geojson_from_gcs(bucket_name: str, file_name: str):
     try:
-        bucket = client.bucket(bucket_name)
-        blob = bucket.blob(file_name)
-        geojson_data = blob.download_as_text()
-        return json.loads(geojson_data)
+        return await asyncio.to_thread(load_blob_json, bucket_name, file_name)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error loading GeoJSON from GCS: {str(e)}")
 
@@ -35,47 +54,210 @@ class SolarDataRequest(BaseModel):
     year: int
     city: Optional[str] = None
     administrative_region: Optional[str] = None
+    snapshot: Optional[str] = None
+
+class InstallationRequest(BaseModel):
+    State: str
+    AdministrativeRegion: str
+    City: str
+    MainOrientation: str
+    FeedInType: str
+    AssignedActivePowerInverter: float
+    Location: str
+    NumberOfModules: int
 
 # Load data during startup
 BUCKET_NAME = "solar_germany"
 DATA_FILE = "solar_visualization.csv"
 GEOJSON_FILE = "states.geo.json"
 
-try:
-    solar_data = load_csv_from_gcs(BUCKET_NAME, DATA_FILE)
-    geojson_data = load_geojson_from_gcs(BUCKET_NAME, GEOJSON_FILE)
-except Exception as e:
-    solar_data = None
-    geojson_data = None
-    print(f"Error during initialization: {str(e)}")
+solar_data = None
+data_version = DATA_FILE
+dataset_path = None
+geojson_data = None
+geojson_bytes = None
+state_index = None
+district_index = None
+model = None
+model_digest = None
+
+async def load_from_gcs():
+    global solar_data, geojson_data, geojson_bytes, state_index, district_index
+    try:
+        # Both downloads share the pooled storage client and run concurrently
+        solar_data, geojson_data = await asyncio.gather(
+            load_csv_from_gcs(BUCKET_NAME, DATA_FILE),
+            load_geojson_from_gcs(BUCKET_NAME, GEOJSON_FILE),
+        )
+        # Serialize once instead of re-encoding the whole GeoJSON per request
+        geojson_bytes = json.dumps(geojson_data).encode()
+        state_index = await asyncio.to_thread(SpatialIndex, geojson_data, STATE_PROPERTIES)
+    except Exception as e:
+        print(f"Error during initialization: {str(e)}")
+
+    # District polygons are optional; lookups fall back to state level
+    try:
+        districts = await load_geojson_from_gcs(BUCKET_NAME, DISTRICTS_GEOJSON_FILE)
+        district_index = await asyncio.to_thread(SpatialIndex, districts, DISTRICT_PROPERTIES)
+    except Exception as e:
+        print(f"District polygons not available: {str(e)}")
+
+def load_bundle_state():
+    global solar_data, data_version, dataset_path, geojson_data, geojson_bytes, state_index, district_index, model, model_digest
+    bundle = load_bundle()
+    solar_data, data_version = bundle["data"], bundle["data_version"]
+    dataset_path = bundle["dataset_path"]
+    geojson_data = bundle["states_geojson"]
+    geojson_bytes = json.dumps(geojson_data).encode()
+    state_index, district_index = bundle["state_index"], bundle["district_index"]
+    model, model_digest = bundle["model"], bundle["model_version"]
+    observe_dataset(solar_data, "bundle")
+
+# Called by the gunicorn master (see api/gunicorn_conf.py) before it forks the
+# workers, which then share the memory-mapped data and the model. Only local
+# files are read here: cloud clients are not safe to share across a fork.
+def preload():
+    if current_bundle():
+        try:
+            load_bundle_state()
+        except Exception as e:
+            print(f"Error preloading bundle: {str(e)}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # A baked bundle has everything ready; memory-map it instead of downloading.
+    # Preloaded workers have it already.
+    if solar_data is None and current_bundle():
+        try:
+            await asyncio.to_thread(load_bundle_state)
+        except Exception as e:
+            print(f"Error loading bundle, falling back to GCS: {str(e)}")
+
+    if solar_data is None:
+        with timed("gcs_load"):
+            await load_from_gcs()
+        if solar_data is not None:
+            observe_dataset(solar_data, "gcs")
+    yield
+
+app = FastAPI(lifespan=lifespan)
+
+# Latency and status of every request, labelled with the route's path template
+# (e.g. /tiles/{level}/{z}/{x}/{y}.pbf) so the number of series stays bounded
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_and_record_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_record_status)
+        finally:
+            endpoint = getattr(scope.get("route"), "path", "unmatched")
+            observe_request(endpoint, scope["method"], status, time.perf_counter() - started)
+
+app.add_middleware(MetricsMiddleware)
+
+async def run_cpu(func, *args):
+    try:
+        return await cpu_executor.run(func, *args)
+    except Overloaded:
+        raise HTTPException(status_code=503, detail="Server is busy, please retry.", headers={"Retry-After": "1"})
+
+# Tabular endpoints answer in JSON, Arrow IPC or Parquet depending on the
+# Accept header (or an explicit ?format=json|arrow|parquet)
+def response_media_type(accept: Optional[str], format: Optional[str]) -> str:
+    try:
+        return negotiate(accept, format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/")
-def root():
+async def root():
     return {"message": "SolarGermany API is running!"}
 
+# Operational metrics in the Prometheus text format (see solar_germany.metrics)
+@app.get("/metrics")
+async def get_metrics():
+    content, media_type = render()
+    return Response(content=content, media_type=media_type)
+
 @app.get("/data")
-def get_solar_data():
+async def get_solar_data(limit: int = 10, format: Optional[str] = None, accept: Optional[str] = Header(None)):
+    media_type = response_media_type(accept, format)
     if solar_data is not None:
-        return solar_data.head(10).to_dict(orient="records")
+        content = await run_cpu(serialize, solar_data.head(limit), media_type)
+        return Response(content=content, media_type=media_type)
     else:
         raise HTTPException(status_code=500, detail="Solar data is not available.")
 
 @app.get("/geojson")
-def get_geojson():
-    if geojson_data is not None:
-        return geojson_data
+async def get_geojson():
+    if geojson_bytes is not None:
+        return Response(content=geojson_bytes, media_type="application/json")
     else:
         raise HTTPException(status_code=500, detail="GeoJSON data is not available.")
 
-@app.post("/filter")
-def filter_solar_data(request: SolarDataRequest):
-    if solar_data is None:
+# Snapshots are immutable, so keep the most recently used ones in memory
+@lru_cache(maxsize=2)
+def get_snapshot_data(snapshot_id: str):
+    try:
+        return load_snapshot(snapshot_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.get("/snapshots")
+async def get_snapshots():
+    return list_snapshots()
+
+def compare_to_records(base: str, target: str, level: str):
+    try:
+        comparison = compare_snapshots(base, target, level=level)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Unknown snapshot.")
+
+    comparison.columns = [f"{kind}_{metric}" for kind, metric in comparison.columns]
+    return comparison.reset_index().to_dict(orient="records")
+
+@app.get("/snapshots/compare")
+async def compare_solar_snapshots(base: str, target: str, level: str = "State"):
+    if level not in ("State", "AdministrativeRegion", "City"):
+        raise HTTPException(status_code=400, detail="level must be State, AdministrativeRegion or City.")
+    return await run_cpu(compare_to_records, base, target, level)
+
+def filter_rows(request: SolarDataRequest) -> pd.DataFrame:
+    if dataset_path is not None and not request.snapshot:
+        # Only the blocks whose statistics can match are read and decoded
+        filtered_data = read_filtered(
+            dataset_path,
+            years=(request.year, request.year),
+            states=(request.state,),
+            regions=(request.administrative_region,) if request.administrative_region else None,
+            cities=(request.city,) if request.city else None,
+        )
+        if filtered_data.empty:
+            raise HTTPException(status_code=404, detail="No data found for the given filters.")
+        return filtered_data
+
+    data = get_snapshot_data(request.snapshot) if request.snapshot else solar_data
+    if data is None:
         raise HTTPException(status_code=500, detail="Solar data is not available.")
 
-    filtered_data = solar_data[(solar_data["State"] == request.state) & (solar_data["CommissioningYear"] == request.year)]
+    filtered_data = data[(data["State"] == request.state) & (data["CommissioningYear"] == request.year)]
 
     if request.administrative_region:
-        filtered_data = filtered_data[filtered_data["Administrative Region"] == request.administrative_region]
+        filtered_data = filtered_data[filtered_data["AdministrativeRegion"] == request.administrative_region]
 
     if request.city:
         filtered_data = filtered_data[filtered_data["City"] == request.city]
@@ -83,4 +265,194 @@ def filter_solar_data(request: SolarDataRequest):
     if filtered_data.empty:
         raise HTTPException(status_code=404, detail="No data found for the given filters.")
 
-    return filtered_data.to_dict(orient="records")
+    return filtered_data
+
+def filter_and_serialize(request: SolarDataRequest, media_type: str):
+    filtered_data = filter_rows(request)
+    FILTER_ROWS.observe(len(filtered_data))
+    return serialize(filtered_data, media_type)
+
+@app.post("/filter")
+async def filter_solar_data(request: SolarDataRequest, format: Optional[str] = None, accept: Optional[str] = Header(None)):
+    media_type = response_media_type(accept, format)
+    content = await run_cpu(filter_and_serialize, request, media_type)
+    return Response(content=content, media_type=media_type)
+
+# JSON has no NaN: the ratios and quantiles of an empty selection are null
+def json_safe(value):
+    if isinstance(value, dict):
+        return {key: json_safe(item) for key, item in value.items()}
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+def quantile_labels(quantiles: dict) -> dict:
+    # {0.5: ...} -> {"p50": ...}
+    return {f"p{q * 100:g}": value for q, value in quantiles.items()}
+
+def summarize(start_year: int, end_year: int, state: Optional[str], administrative_region: Optional[str],
+              city: Optional[str], approximate: bool) -> dict:
+    selection = dict(
+        years=(start_year, end_year),
+        states=(state,) if state else None,
+        regions=(administrative_region,) if administrative_region else None,
+        cities=(city,) if city else None,
+    )
+    exact = rollup(solar_data, data_version, qs=(0.5, 0.9), **selection)
+    quantiles = quantile_labels(exact["GrossPowerQuantiles"])
+    if not approximate:
+        return json_safe({**exact, "GrossPowerQuantiles": quantiles, "approximate": False})
+
+    # Quantiles come from the cube's sketches, which are cheap either way
+    return json_safe({
+        **estimate_totals(solar_data, data_version, **selection),
+        "DistinctCities": estimate_distinct(solar_data, data_version, "City", selection["years"], selection["states"]),
+        "GrossPowerQuantiles": quantiles,
+        "approximate": True,
+    })
+
+# Totals of a selection; with approximate=true, sample-based estimates with
+# 95% confidence intervals (see solar_germany.approximate)
+@app.get("/summary")
+async def get_summary(start_year: int = 2000, end_year: int = 2024, state: Optional[str] = None,
+                      administrative_region: Optional[str] = None, city: Optional[str] = None,
+                      approximate: bool = False):
+    if solar_data is None:
+        raise HTTPException(status_code=500, detail="Solar data is not available.")
+    if start_year > end_year:
+        raise HTTPException(status_code=400, detail="start_year must not be after end_year.")
+    return await run_cpu(summarize, start_year, end_year, state, administrative_region, city, approximate)
+
+def prediction_model() -> tuple:
+    # The bundled model if there is one, else the one at MODEL_PATH, with its version
+    try:
+        if model is not None:
+            return model, model_digest
+        return load_model(MODEL_PATH), model_version(MODEL_PATH)
+    except FileNotFoundError:
+        raise HTTPException(status_code=500, detail="Prediction model is not available.")
+
+def predict_installations(installations: List[InstallationRequest]) -> list:
+    current_model, version = prediction_model()
+    # Repeated configurations are answered from the prediction cache shared with the app
+    return predict_cached(current_model, version, [installation.model_dump() for installation in installations])
+
+@app.post("/predict")
+async def predict(installations: List[InstallationRequest]):
+    if not installations:
+        raise HTTPException(status_code=400, detail="No installations given.")
+    return await run_cpu(predict_installations, installations)
+
+def explain_installations(installations: List[InstallationRequest]) -> list:
+    current_model, version = prediction_model()
+    try:
+        return explain_cached(current_model, version, [installation.model_dump() for installation in installations])
+    except ValueError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# SHAP contributions of every input and sensitivity sweeps over NumberOfModules
+# and AssignedActivePowerInverter, scored in one batch (see solar_germany.explain)
+@app.post("/predict/explain")
+async def explain(installations: List[InstallationRequest]):
+    if not installations:
+        raise HTTPException(status_code=400, detail="No installations given.")
+    return await run_cpu(explain_installations, installations)
+
+# Hit rate and size of the prediction cache
+@app.get("/predict/cache")
+async def get_prediction_cache():
+    return prediction_cache_info()
+
+def spatial_index() -> SpatialIndex:
+    index = district_index or state_index
+    if index is None:
+        raise HTTPException(status_code=500, detail="Spatial index is not available.")
+    return index
+
+async def aggregate_geometry(geometry, year: Optional[int]):
+    if solar_data is None:
+        raise HTTPException(status_code=500, detail="Solar data is not available.")
+    areas = spatial_index().intersecting(geometry)
+    return await run_cpu(aggregate_areas, solar_data, data_version, areas, year)
+
+@app.get("/locate")
+async def locate(lat: float, lon: float):
+    area = spatial_index().locate(lon, lat)
+    if area is None:
+        raise HTTPException(status_code=404, detail="No area found at the given coordinates.")
+    return area
+
+@app.get("/aggregate/bbox")
+async def aggregate_bbox(min_lon: float, min_lat: float, max_lon: float, max_lat: float, year: Optional[int] = None):
+    if min_lon >= max_lon or min_lat >= max_lat:
+        raise HTTPException(status_code=400, detail="Bounding box minimums must be below its maximums.")
+    return await aggregate_geometry(bounding_box(min_lon, min_lat, max_lon, max_lat), year)
+
+@app.get("/aggregate/radius")
+async def aggregate_radius(lat: float, lon: float, radius_km: float, year: Optional[int] = None):
+    if radius_km <= 0:
+        raise HTTPException(status_code=400, detail="radius_km must be positive.")
+    return await aggregate_geometry(circle(lon, lat, radius_km), year)
+
+# Trend series and growth rankings of any geography node (see solar_germany.analytics);
+# a pinned snapshot's index is derived from its parent's
+def trends_for(snapshot: Optional[str]):
+    if snapshot:
+        try:
+            return snapshot_trends(snapshot)
+        except ValueError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+    if solar_data is None:
+        raise HTTPException(status_code=500, detail="Solar data is not available.")
+    return trend_index(solar_data, data_version)
+
+def check_choice(name: str, value: str, allowed: list):
+    if value not in allowed:
+        raise HTTPException(status_code=400, detail=f"{name} must be one of {', '.join(allowed)}.")
+
+def trend_series_records(metric: str, node: tuple, snapshot: Optional[str]) -> list:
+    series = trends_for(snapshot).series(node).xs(metric, axis=1, level=1)
+    if series.empty:
+        raise HTTPException(status_code=404, detail="No data found for the given area.")
+    return json.loads(series.reset_index().to_json(orient="records"))
+
+@app.get("/trends/series")
+async def get_trend_series(metric: str = "NumberOfModules", state: Optional[str] = None,
+                           administrative_region: Optional[str] = None, city: Optional[str] = None,
+                           snapshot: Optional[str] = None):
+    check_choice("metric", metric, TREND_METRICS)
+    if (administrative_region and not state) or (city and not administrative_region):
+        raise HTTPException(status_code=400, detail="A region needs its state, a district its region.")
+    node = tuple(value for value in (state, administrative_region, city) if value)
+    return await run_cpu(trend_series_records, metric, node, snapshot)
+
+def top_records(level: str, metric: str, year: int, kind: str, n: int, within: tuple, min_base: float,
+                snapshot: Optional[str]) -> list:
+    ranked = trends_for(snapshot).top(level, metric, year, kind, n, within, min_base)
+    return json.loads(ranked.to_json(orient="records"))
+
+@app.get("/trends/top")
+async def get_top_growing(year: int, level: str = "City", metric: str = "NumberOfModules", kind: str = "Growth",
+                          n: int = 10, state: Optional[str] = None, administrative_region: Optional[str] = None,
+                          min_base: float = 0, snapshot: Optional[str] = None):
+    check_choice("level", level, GEOGRAPHY_LEVELS)
+    check_choice("metric", metric, TREND_METRICS)
+    check_choice("kind", kind, KINDS)
+    if not 1 <= n <= 1000:
+        raise HTTPException(status_code=400, detail="n must be between 1 and 1000.")
+    within = tuple(value for value in (state, administrative_region) if value)
+    if (administrative_region and not state) or len(within) >= LEVELS.index(level):
+        raise HTTPException(status_code=400, detail="state and administrative_region must be above the ranked level.")
+    return await run_cpu(top_records, level, metric, year, kind, n, within, min_base, snapshot)
+
+# Pre-generated vector tiles (see solar_germany.tiles), served from the local tile cache
+@app.get("/tiles/{level}/{z}/{x}/{y}.pbf")
+async def get_tile(level: str, z: int, x: int, y: int):
+    try:
+        tile = await asyncio.to_thread(read_tile, level, z, x, y)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    if not tile:
+        return Response(status_code=204)
+    return Response(content=tile, media_type="application/vnd.mapbox-vector-tile",
+                    headers={"Cache-Control": "public, max-age=86400"})
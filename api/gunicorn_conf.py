@@ -0,0 +1,45 @@
+import gc
+import glob
+import os
+import tempfile
+
+from solar_germany.params import API_WORKERS
+
+# Multi-worker serving: gunicorn api.fast:app -c api/gunicorn_conf.py
+#
+# The app is imported and the current bundle (data, indexes, cube and model)
+# loaded once in the master, then the workers are forked from it. The data
+# is memory-mapped and the rest is only read, so the workers share those
+# pages instead of each holding its own copy. Without a bundle, every worker
+# downloads the data from GCS in its own lifespan as before.
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8000)}"
+workers = API_WORKERS
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = 120
+
+# Every process writes its metrics to files here, and GET /metrics aggregates
+# them (see solar_germany.metrics). Set before the app, and so
+# prometheus_client, is imported. The metric files (*.db) of the previous run
+# are removed on every start; anything else in the directory is left alone,
+# as it may be one the operator chose.
+metrics_dir = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "solar_germany_metrics"))
+os.makedirs(metrics_dir, exist_ok=True)
+for metrics_file in glob.glob(os.path.join(metrics_dir, "*.db")):
+    os.remove(metrics_file)
+
+
+def on_starting(server):
+    from api.fast import preload
+
+    preload()
+    # Keep the garbage collector from writing to (and so copying) the preloaded objects' pages
+    gc.freeze()
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    # Drop the live gauges of a worker that exited
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,205 @@
+import argparse
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import requests
+
+# Local load test of the API: python -m api.loadtest --workers 1 2 4
+#
+# For every worker count, gunicorn is started with api/gunicorn_conf.py on a
+# local port and driven by `--concurrency` client threads for `--duration`
+# seconds with a mix of /filter, /geojson and /predict requests. Filter and
+# prediction payloads are drawn from rows of the served dataset. The report
+# gives throughput, error rate and latency percentiles per worker count and
+# endpoint, plus the memory held by the server's processes (PSS, where /proc
+# is available), which shows how much the workers share.
+
+DEFAULT_MIX = {"filter": 6, "geojson": 2, "predict": 2}
+PERCENTILES = [50, 90, 99]
+PREDICT_COLUMNS = ["State", "AdministrativeRegion", "City", "MainOrientation", "FeedInType",
+                   "AssignedActivePowerInverter", "Location", "NumberOfModules"]
+
+
+def start_server(workers: int, port: int) -> subprocess.Popen:
+    env = {**os.environ, "API_WORKERS": str(workers), "PORT": str(port)}
+    return subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "api.fast:app", "-c", "api/gunicorn_conf.py", "--bind", f"127.0.0.1:{port}"],
+        env=env,
+        start_new_session=True,
+    )
+
+
+def stop_server(server: subprocess.Popen) -> None:
+    server.send_signal(signal.SIGTERM)
+    try:
+        server.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        os.killpg(server.pid, signal.SIGKILL)
+        server.wait()
+
+
+def wait_until_ready(base_url: str, server: subprocess.Popen, timeout: float = 180) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with code {server.returncode}")
+        try:
+            if requests.get(f"{base_url}/data?limit=1", timeout=2).ok:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"Server not ready after {timeout:.0f}s")
+
+
+def memory_mb(pid: int) -> float:
+    """
+    :return: Proportional set size of a process and its children, in MB
+        (shared pages are split between the processes sharing them); NaN
+        without /proc.
+    """
+    def children(parent):
+        try:
+            task_dir = Path(f"/proc/{parent}/task")
+            return [int(child) for task in task_dir.iterdir() for child in task.joinpath("children").read_text().split()]
+        except OSError:
+            return []
+
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        pending.extend(children(current))
+        try:
+            rollup = Path(f"/proc/{current}/smaps_rollup").read_text()
+        except OSError:
+            return float("nan")
+        total += next(int(line.split()[1]) for line in rollup.splitlines() if line.startswith("Pss:"))
+    return total / 1024
+
+
+def scenario(base_url: str, sample_rows: int = 500) -> dict:
+    """
+    :return: Filter and prediction payloads drawn from the served dataset.
+    """
+    rows = requests.get(f"{base_url}/data?limit={sample_rows}&format=json", timeout=60).json()
+    return {
+        "filter": [
+            {"state": row["State"], "year": int(row["CommissioningYear"]),
+             "administrative_region": row["AdministrativeRegion"]}
+            for row in rows
+        ],
+        "predict": [[{column: row[column] for column in PREDICT_COLUMNS}] for row in rows],
+    }
+
+
+def send(session: requests.Session, base_url: str, kind: str, payloads: dict) -> int:
+    if kind == "filter":
+        response = session.post(f"{base_url}/filter", json=random.choice(payloads["filter"]), timeout=60)
+    elif kind == "geojson":
+        response = session.get(f"{base_url}/geojson", timeout=60)
+    else:
+        response = session.post(f"{base_url}/predict", json=random.choice(payloads["predict"]), timeout=60)
+    return response.status_code
+
+
+def run_load(base_url: str, mix: dict, concurrency: int, duration: float) -> list:
+    """
+    Drive the server from `concurrency` threads for `duration` seconds.
+
+    :return: (kind, latency in seconds, status code) of every request; status
+        0 for requests that failed without a response.
+    """
+    payloads = scenario(base_url)
+    kinds, weights = list(mix), list(mix.values())
+    results = []
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client(seed: int):
+        rng = random.Random(seed)
+        session = requests.Session()
+        local = []
+        while time.monotonic() < deadline:
+            kind = rng.choices(kinds, weights)[0]
+            started = time.perf_counter()
+            try:
+                status = send(session, base_url, kind, payloads)
+            except requests.RequestException:
+                status = 0
+            local.append((kind, time.perf_counter() - started, status))
+        with lock:
+            results.extend(local)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(client, range(concurrency)))
+    return results
+
+
+def summarize(results: list, duration: float) -> dict:
+    def stats(selected):
+        latencies = np.array([latency for _, latency, _ in selected]) * 1000
+        errors = sum(1 for _, _, status in selected if status != 200)
+        summary = {"requests": len(selected), "rps": len(selected) / duration,
+                   "error_rate": errors / len(selected) if selected else 0.0}
+        for percentile in PERCENTILES:
+            summary[f"p{percentile}_ms"] = float(np.percentile(latencies, percentile)) if selected else float("nan")
+        return summary
+
+    return {
+        "all": stats(results),
+        **{kind: stats([result for result in results if result[0] == kind]) for kind in sorted({r[0] for r in results})},
+    }
+
+
+def print_report(report: list) -> None:
+    header = f"{'workers':>7} {'endpoint':>8} {'req/s':>8} {'errors':>7} " + " ".join(f"{f'p{p} ms':>8}" for p in PERCENTILES)
+    print(header)
+    print("-" * len(header))
+    for entry in report:
+        for endpoint, stats in entry["endpoints"].items():
+            print(f"{entry['workers']:>7} {endpoint:>8} {stats['rps']:>8.1f} {stats['error_rate']:>7.1%} "
+                  + " ".join(f"{stats[f'p{p}_ms']:>8.1f}" for p in PERCENTILES))
+        print(f"{'':>7} {'memory':>8} {entry['memory_mb']:>8.0f} MB (PSS, all processes)")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m api.loadtest", description="Load test the API per worker count.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="worker counts to test")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent client threads")
+    parser.add_argument("--duration", type=float, default=20, help="seconds of load per worker count")
+    parser.add_argument("--port", type=int, default=8765, help="local port to serve on")
+    parser.add_argument("--mix", type=json.loads, default=DEFAULT_MIX,
+                        help='request weights, e.g. \'{"filter": 6, "geojson": 2, "predict": 2}\'')
+    parser.add_argument("--output", help="optional JSON file to write the report to")
+    args = parser.parse_args(argv)
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    report = []
+    for workers in args.workers:
+        print(f"Starting {workers} worker(s)...")
+        server = start_server(workers, args.port)
+        try:
+            wait_until_ready(base_url, server)
+            results = run_load(base_url, args.mix, args.concurrency, args.duration)
+            report.append({"workers": workers, "endpoints": summarize(results, args.duration),
+                           "memory_mb": memory_mb(server.pid)})
+        finally:
+            stop_server(server)
+
+    print_report(report)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,19 @@
 import streamlit as st
-import plotly.express as px
 import pandas as pd
-import json
-import plotly.graph_objects as go
-import joblib
-import pickle
-from PIL import Image
 import base64
-from io import BytesIO
-from pydantic import BaseModel
-from google.cloud import storage
 import os
-from io import StringIO
-import dask.dataframe as dd
-import shapely
-from fastapi import HTTPException
 from pathlib import Path
-import pandas as pd
-from typing import Optional
-from colorama import Fore, Style
-from datetime import datetime
 
-from solar_germany.params import LOCAL_DATA_PATH, CHUNK_SIZE
-from solar_germany.processing import preprocess_solar_data, load_processed_data, load_geojson_from_gcs
-from solar_germany.processing import load_geojson_from_gcs
+# Plotly (see solar_germany.figures) and the model (xgboost) are imported where
+# they are first used, so the page can render before those heavy modules are loaded
+from solar_germany.params import LOCAL_DATA_PATH, CHUNK_SIZE, FEED_IN_TYPES, METRICS_PORT, TREND_MIN_BASE
+from solar_germany.processing import preprocess_solar_data, load_processed_data, load_geojson_from_gcs, dataset_version
+from solar_germany import analytics, figures, views
+from solar_germany.snapshots import list_snapshots, load_snapshot, compare_snapshots
+from solar_germany.bundle import current_bundle, load_bundle
+from solar_germany.jobs import JobRunner, QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED
+from solar_germany.explain import explain_cached
+from solar_germany.prediction import model_version, predict_cached
 
 
 
@@ -72,9 +62,15 @@ card_style = """
 
 
 
-# Load model (ensure that your model path is correct)
+# Load model (ensure that your model path is correct) once per process, on the first prediction
 model_path = os.getenv("MODEL_PATH", "./model/xgb_full_pipeline.pkl")
-model = joblib.load(model_path)
+
+# Keyed by the model version too, so a model file replaced in place is loaded again
+@st.cache_resource(max_entries=2)
+def get_model(model_path: str, version: str):
+    import joblib
+
+    return joblib.load(model_path)
 
 # Streamlit UI setup
 st.set_page_config(layout="wide", page_title="SolarGermany - Empowering a Sustainable Future")
@@ -186,6 +182,17 @@ year_range = st.sidebar.select_slider(
 # Unpack the selected range
 min_year, max_year = year_range
 
+# Pin a MaStR snapshot, if any have been registered (newest first)
+snapshots = {manifest["snapshot_id"]: manifest for manifest in reversed(list_snapshots())}
+snapshot = None
+if snapshots:
+    snapshot = st.sidebar.selectbox("Select MaStR Snapshot", ["Processed data"] + list(snapshots))
+    snapshot = None if snapshot == "Processed data" else snapshot
+
+# Show sample-based estimates first and refine them to the exact figures
+fast_preview = st.sidebar.toggle("Fast preview", value=True,
+                                 help="Draw charts from a stratified sample first, then replace them with exact results.")
+
 # Initialize session state for state
 if 'state' not in st.session_state:
     st.session_state.state = "All States"  # Default state value
@@ -198,23 +205,115 @@ st.sidebar.markdown(
     unsafe_allow_html=True
 )
 
+# Preprocessing runs as a background job shared by every session; identical
+# ranges requested from several sessions are processed once
+@st.cache_resource
+def get_job_runner() -> JobRunner:
+    return JobRunner()
+
+job_runner = get_job_runner()
+
+# Exact charts behind the fast preview are built on their own runner, so a
+# long preprocessing run never holds them up
+@st.cache_resource
+def get_refine_runner() -> JobRunner:
+    return JobRunner()
+
+refine_runner = get_refine_runner()
+
+def build_exact_pies(data, data_version, year, state, administrative_region, progress) -> None:
+    # Puts the exact pies into the chart cache, where the next run picks them up
+    for column in ('FeedInType', 'Location'):
+        figures.distribution_pie(data, data_version, year, state, administrative_region, column)
+        progress({"message": f"{column} counted"})
+
+@st.fragment(run_every="1s")
+def refine_status(key: tuple):
+    # Reload the page once the exact results are ready, replacing the estimates
+    job = refine_runner.get(key)
+    if job is not None and job.finished:
+        st.rerun(scope="app")
+
+# Preprocessing, cache and model metrics of this process, scrapable on METRICS_PORT (see solar_germany.metrics)
+@st.cache_resource
+def start_metrics_server(port: int) -> None:
+    from prometheus_client import start_http_server
+
+    start_http_server(port)
+
+if METRICS_PORT:
+    start_metrics_server(METRICS_PORT)
+preprocess_key = ("preprocess", min_year, max_year)
+
 # Preprocess Data Button
 if st.sidebar.button("Retrieve and Preprocess Data"):
-    with st.spinner("Preprocessing data..."):
-        preprocess_solar_data(min_year=min_year, max_year=max_year, chunk_size=CHUNK_SIZE)
+    job_runner.submit(preprocess_key, preprocess_solar_data, min_year=min_year, max_year=max_year, chunk_size=CHUNK_SIZE)
+
+@st.fragment(run_every="2s")
+def preprocess_job_status():
+    job = job_runner.get(preprocess_key)
+    if job.finished:
+        # Reload the whole page so the new data is picked up
+        st.rerun(scope="app")
+
+    progress = job.progress
+    if job.status == QUEUED:
+        st.info("Preprocessing is queued...")
+    else:
+        st.info(f"Preprocessing data... {progress.get('message', 'Starting')} ({progress.get('rows', 0):,} rows)")
+    if st.button("Cancel Preprocessing"):
+        job_runner.cancel(preprocess_key)
+
+preprocess_job = job_runner.get(preprocess_key)
+with st.sidebar:
+    if preprocess_job is not None and preprocess_job.status in (QUEUED, RUNNING):
+        preprocess_job_status()
+    elif preprocess_job is not None and preprocess_job.status == SUCCEEDED:
         st.success("Data preprocessing completed!")
+    elif preprocess_job is not None and preprocess_job.status == FAILED:
+        st.error(f"Data preprocessing failed: {preprocess_job.error}")
+
+# A baked bundle (see solar_germany.bundle) is loaded once per process and
+# serves its year range without touching BigQuery or GCS
+bundle = st.cache_resource(load_bundle)(current_bundle()) if current_bundle() else None
+
+# A year range inside the bundle's is sliced once per process and shared by
+# every session and rerun, instead of copying the mapped data on each rerun
+@st.cache_resource(max_entries=4)
+def bundle_years(_data: pd.DataFrame, data_version: str, min_year: int, max_year: int) -> pd.DataFrame:
+    return _data[_data["CommissioningYear"].between(min_year, max_year)]
+
+bundle_covers_range = (
+    bundle is not None
+    and bundle["manifest"]["min_year"] <= min_year
+    and max_year <= bundle["manifest"]["max_year"]
+)
 
 # Load GeoJSON data for Germany (static, loaded once)
-germany_geojson = load_geojson_from_gcs("solar_germany", "states.geo.json")
+if bundle is not None and bundle["states_geojson"] is not None:
+    germany_geojson = bundle["states_geojson"]
+else:
+    germany_geojson = st.cache_data(load_geojson_from_gcs)("solar_germany", "states.geo.json")
 
 # Check if the processed data exists and load it
 processed_data_path = Path(LOCAL_DATA_PATH).joinpath(f"processed_solar_data_{min_year}_{max_year}.csv")
 
 # Ensure the data is loaded only after preprocessing
-if os.path.exists(processed_data_path):
-    data = load_processed_data(processed_data_path)
+if snapshot:
+    data = st.cache_data(max_entries=2)(load_snapshot)(snapshot, min_year, max_year)
+    data_version = f"snapshot:{snapshot}:{min_year}:{max_year}"
+elif bundle_covers_range:
+    data = bundle["data"]
+    data_version = bundle["data_version"]
+    if (min_year, max_year) != (bundle["manifest"]["min_year"], bundle["manifest"]["max_year"]):
+        data = bundle_years(data, data_version, min_year, max_year)
+        data_version = f"{data_version}:{min_year}:{max_year}"
+elif os.path.exists(processed_data_path):
+    data = st.cache_data(load_processed_data)(processed_data_path, dataset_version(processed_data_path))
+    data_version = dataset_version(processed_data_path)
 else:
     data = pd.DataFrame()  # Empty dataframe to avoid further errors
+    data_version = None
 
 
 st.markdown("""
@@ -235,35 +334,20 @@ if not data.empty:
     # Year Slider
     year = st.sidebar.slider("Select a Year", min_value=int(min_year), max_value=int(max_year), value=int(max_year))
 
-    # Filter data by year
-    filtered_data = data[data['CommissioningYear'] == year]
-
-    # Group data by state
-    df_grouped = filtered_data.groupby('State').agg({'NumberOfModules': 'sum'}).reset_index()
-
-    # Sort the states alphabetically
-    states_sorted = sorted(df_grouped['State'].unique()) if not df_grouped.empty else []
-
     # State selection (if there is data)
-    state_list = sorted(data['State'].unique()) if not data.empty else []
+    state_list = views.state_options(data, data_version)
     state = st.sidebar.selectbox("Select a State", state_list)
 
-    # Filter data for the selected state
-    state_data = filtered_data[filtered_data['State'] == state] if state else pd.DataFrame()
-
     # Administrative Region selection
     administrative_region = None
-    if not state_data.empty:
-        administrative_regions_sorted = sorted(state_data['AdministrativeRegion'].unique())
+    administrative_regions_sorted = views.region_options(data, data_version, year, state) if state else []
+    if administrative_regions_sorted:
         administrative_region = st.sidebar.selectbox("Select an Administrative Region", administrative_regions_sorted)
 
     # Display city options only when both state and administrative region are selected
     city_sorted = []
     if state and administrative_region:
-        city_filtered_data = filtered_data[
-            (filtered_data['State'] == state) & (filtered_data['AdministrativeRegion'] == administrative_region)
-        ]
-        city_sorted = sorted(city_filtered_data['City'].unique())
+        city_sorted = views.district_options(data, data_version, year, state, administrative_region)
 
     city = st.sidebar.selectbox("Select District", options=city_sorted)
 
@@ -304,12 +388,17 @@ st.sidebar.markdown(
 st.markdown("""
 <style>
     /* Style for the tab list container */
-    .stTabs [data-baseweb="tab-list"] {
+    .stRadio [role="radiogroup"] {
         gap: 6px; /* Increased space between tabs for better separation */
     }
 
+    /* Hide the radio circles so the options look like tabs */
+    .stRadio [role="radiogroup"] label > div:first-child {
+        display: none;
+    }
+
     /* Style for individual tabs */
-    .stTabs [data-baseweb="tab"] {
+    .stRadio [role="radiogroup"] label {
         height: 55px; /* Slightly taller tabs for a more spacious design */
         white-space: pre-wrap; /* Allow text wrapping */
         background-color: #f8f8ff; /* Subtle light gray background for unselected tabs */
@@ -324,7 +413,7 @@ st.markdown("""
     }
 
     /* Highlight style for the selected tab */
-    .stTabs [aria-selected="true"] {
+    .stRadio [role="radiogroup"] label:has(input:checked) {
         background-color: #FFFFFF; /* Crisp white background for selected tab */
         color: #1A1A1A; /* Darker text color for better emphasis */
         border-bottom: 3px solid #FF4B4B; /* Bold accent border for selected tab */
@@ -332,7 +421,7 @@ st.markdown("""
     }
 
     /* Hover effect for tabs */
-    .stTabs [data-baseweb="tab"]:hover {
+    .stRadio [role="radiogroup"] label:hover {
         background-color: #E8EBF1; /* Gentle hover color for tabs */
         color: #2A2A2A; /* Slightly darker text on hover */
         transform: translateY(-2px); /* Subtle lift effect on hover */
@@ -346,7 +435,7 @@ st.markdown("""
 st.markdown("""
     <style>
         /* Reduce the gap above the main tabs container */
-        .stTabs {
+        .stRadio {
             margin-top: -100px;  /* Adjust this value to reduce the gap further */
             padding-top: 0px;  /* Remove any additional padding at the top */
         }
@@ -360,13 +449,15 @@ st.markdown("""
 
 
 
-# Tabs for better organization
-tab1, tab2, tab3, tab4 = st.tabs(["Overview", "State Insights", "Regional Focus", "Solar Power Forecast"])
+# Views for better organization. Unlike st.tabs, only the selected view is
+# executed on a rerun, so the other views cost nothing.
+VIEWS = ["Overview", "State Insights", "Regional Focus", "Solar Power Forecast"]
+active_view = st.radio("View", VIEWS, horizontal=True, key="active_view", label_visibility="collapsed")
 
 
 
 # Tab 1: Always visible content
-with tab1:
+if active_view == "Overview":
     st.markdown(card_style, unsafe_allow_html=True)
 
     # Welcome Card (always shown)
@@ -445,18 +536,19 @@ with tab1:
 
 
 if data.empty:
-    with tab2:
+    if active_view == "State Insights":
         st.warning("No data available. Please click 'Retrieve and Preprocess Data' in the sidebar to load data.")
 
 else:
-    with tab2:
-
+    if active_view == "State Insights":
         st.markdown("""""", unsafe_allow_html=True)
 
+        insights = views.state_insights(data, data_version, year, state)
+
         # Summary metrics
-        total_modules = filtered_data['NumberOfModules'].sum()
-        total_power = filtered_data['GrossPower'].sum()
-        avg_efficiency = filtered_data['Efficiency'].mean()
+        total_modules = insights["total_modules"]
+        total_power = insights["total_power"]
+        avg_efficiency = insights["avg_efficiency"]
 
 
         # Create a styled card for metrics in a three-column layout
@@ -494,194 +586,92 @@ else:
         st.subheader("\U0001F5FA\ufe0f Solar Panel Modul Distribution by States")
 
 
-        # Create a choropleth map with a solar-themed color scale
-        fig = px.choropleth(
-            df_grouped,
-            geojson=germany_geojson,
-            locations='State',
-            featureidkey='properties.name',
-            color='NumberOfModules',
-            color_continuous_scale=["white", "gold", "orange"],  # Custom color scale
-            title=f"Number of Modules by State in Germany (Year: {year})"
-        )
-
-
-
-        # Adjust map layout for stability and visibility
-        fig.update_geos(
-            fitbounds="locations",
-            visible=True,
-            projection_scale=1,
-            countrycolor="white",
-            showcoastlines=False,
-            showframe=False,
-            showland=True,
-            landcolor="white",
-            showlakes=False,
-            showrivers=False,
-            showcountries=False,
-            subunitcolor="white",
-            showsubunits=False
-        )
-
-
-        fig.update_layout(
-            margin={"r": 0, "t": 50, "l": 0, "b": 0},
-            height=700,
-            dragmode=False,
-            hovermode=False,
-        )
-
-        # Highlight the selected state
-        if state:
-            state_value = df_grouped.loc[df_grouped['State'] == state, 'NumberOfModules'].values[0]
-
-            highlighted_geojson = {
-                "type": "FeatureCollection",
-                "features": [
-                    feature
-                    for feature in germany_geojson["features"]
-                    if feature["properties"]["name"] == state
-                ]
-            }
-
-            # Overlay the selected state using its corresponding color from the map's scale
-            fig.add_choropleth(
-                geojson=highlighted_geojson,
-                locations=[state],
-                featureidkey="properties.name",
-                z=[state_value],  # Match the value from the data
-                colorscale=["white", "gold", "orange"],
-                zmin=df_grouped['NumberOfModules'].min(),  # Min value for normalization
-                zmax=df_grouped['NumberOfModules'].max(),  # Max value for normalization
-                marker=dict(line=dict(width=3, color="blue")),  # Blue outline for the selected state
-                showscale=False  # Hide the additional scale for this overlay
-            )
-
-        # Display the map
-        st.plotly_chart(fig, use_container_width=True)
+        # Choropleth with the selected state outlined, built once per year and state
+        st.plotly_chart(figures.from_payload(
+            figures.state_map(data, data_version, year, state, geojson=germany_geojson)
+        ), use_container_width=True)
 
 
 
-        if state_data.empty:
+        if not administrative_region:
             st.write("Please select a state to view details.")
-        elif administrative_region:
-            # Filter data for the selected administrative region
-            district_data = state_data[state_data['AdministrativeRegion'] == administrative_region]
-
-            # Key Metrics for the selected region
-            total_power_region = district_data['GrossPower'].sum()
-            avg_efficiency_region = district_data['Efficiency'].mean()
-            total_modules_region = district_data['NumberOfModules'].sum()
-
-
-        # Data for Germany (Overall)
-        germany_data = data.groupby('CommissioningYear').agg({'NumberOfModules': 'sum'}).reset_index()
-        germany_data['CumulativeModules'] = germany_data['NumberOfModules'].cumsum()
-
-        # Data for the selected state
-        state_data_full = data[data['State'] == state].groupby('CommissioningYear').agg({'NumberOfModules': 'sum'}).reset_index()
-        state_data_full['CumulativeModules'] = state_data_full['NumberOfModules'].cumsum()
-
 
         # Combined plot for Germany and the selected state
-        fig_combined = go.Figure()
-
-        # Germany's data (Annual Number of Modules and Cumulative Trend)
-        fig_combined.add_trace(go.Bar(
-            x=germany_data['CommissioningYear'],
-            y=germany_data['NumberOfModules'],
-            name='Germany - Annual Number of Modules',
-            marker_color='Orange'  # Blue color for Germany
-        ))
-        fig_combined.add_trace(go.Scatter(
-            x=germany_data['CommissioningYear'],
-            y=germany_data['CumulativeModules'],
-            mode='lines',
-            name='Germany - Cumulative Trend',
-            line=dict(color='Orange', width=2)  # Orange line for Germany
-        ))
-
-        # State's data (Annual Number of Modules and Cumulative Trend)
-        fig_combined.add_trace(go.Bar(
-            x=state_data_full['CommissioningYear'],
-            y=state_data_full['NumberOfModules'],
-            name=f'{state} - Annual Number of Modules',
-            marker_color='Gold'  # Green color for selected state
-        ))
-        fig_combined.add_trace(go.Scatter(
-            x=state_data_full['CommissioningYear'],
-            y=state_data_full['CumulativeModules'],
-            mode='lines',
-            name=f'{state} - Cumulative Trend',
-            line=dict(color='Gold', width=2)  # Red line for selected state
-        ))
-
-        # Update layout for combined plot
-        fig_combined.update_layout(
-            title=f"Number of Modules Over Time: Germany vs. {state}",
-            xaxis_title="Year",
-            yaxis_title="Number of Modules",
-            barmode='overlay',  # Overlay bars for better comparison
-            plot_bgcolor='white',  # White background for clarity
-            template='plotly_white',  # Clean white template for aesthetics
-            dragmode=False,
-            hovermode=False,
-            yaxis=dict(
-                type='log',  # Apply logarithmic scale to y-axis
-                autorange=True,  # Auto range for logarithmic scale
-            )
-        )
+        st.plotly_chart(figures.from_payload(figures.state_trend(data, data_version, state)), use_container_width=True)
+
+        # Districts of the state whose cumulative module count grew the most in the year
+        st.subheader(f"Fastest Growing Districts in {state} ({year})")
+        growing = analytics.fastest_growing(data, data_version, 'City', 'NumberOfModules', year, 10,
+                                            within=(state,), min_base=TREND_MIN_BASE)
+        if growing.empty:
+            st.write("Not enough data to rank districts for this year.")
+        else:
+            st.dataframe(growing[['City', 'Growth', 'Annual', 'Cumulative']].rename(columns={
+                'City': 'District', 'Annual': 'New Modules', 'Cumulative': 'Total Modules',
+            }).style.format({'Growth': '{:.1%}', 'New Modules': '{:,.0f}', 'Total Modules': '{:,.0f}'}),
+                hide_index=True, use_container_width=True)
 
-        # Display the combined plot
-        st.plotly_chart(fig_combined, use_container_width=True)
+        # Changes against the previous release when a snapshot is pinned
+        if snapshot and snapshots[snapshot]["parent"]:
+            parent = snapshots[snapshot]["parent"]
+            with st.expander(f"Changes since snapshot {parent}"):
+                st.dataframe(compare_snapshots(parent, snapshot)["change"], use_container_width=True)
 
 
 
 if data.empty:
-    with tab3:
+    if active_view == "Regional Focus":
         st.warning("No data available. Please click 'Retrieve and Preprocess Data' in the sidebar to load data.")
 
 
 else:
     # Tab 1: Interactive Map
-    with tab3:
-
+    if active_view == "Regional Focus":
         st.markdown("""""", unsafe_allow_html=True)
 
-        # City-level metrics table
-        city_grouped = district_data.groupby('City').agg({
-            'GrossPower': 'sum',
-            'NetRatedPower': 'sum',
-            'NumberOfModules': 'sum',
-            'Efficiency': 'mean',
-        }).reset_index()
-
-        # Rename "City" to "District"
-        city_grouped.rename(columns={'City': 'District'}, inplace=True)
-        city_data=city_grouped[city_grouped['District']==city]
-
-
-            # Conditional display based on state and district selection
-        if state and administrative_region and city:
-            city_data = city_filtered_data[city_filtered_data['City'] == city]
-            total_power_city = city_data['GrossPower'].sum()
-            avg_efficiency_city = city_data['Efficiency'].mean()
-            total_modules_city = city_data['NumberOfModules'].sum()
-        else:
-            city_data = pd.DataFrame()  # No data for city metrics if not selected
-            total_power_city = 0
-            avg_efficiency_city = 0
-            total_modules_city = 0
-
-
-        # Create a styled card for metrics in a three-column layout
-        col1, col2, col3 = st.columns(3)
-
+        # Lay out the metric cards and the two pie charts up front, so the
+        # charts can show an estimate while the exact counts are computed
+        card_col1, card_col2, card_col3 = st.columns(3)
         st.markdown(card_style, unsafe_allow_html=True)
+        pie_col1, pie_col2 = st.columns(2)
+        feed_chart, location_chart = pie_col1.empty(), pie_col2.empty()
+
+        # The exact pies scan the rows, so with the fast preview on they are
+        # built by a background job while the estimates are shown
+        pies_key = ("category_pies", data_version, year, state, administrative_region)
+        exact_ready = True
+        if fast_preview:
+            pies_job = refine_runner.get(pies_key)
+            if pies_job is None or pies_job.status == CANCELLED:
+                pies_job = refine_runner.submit(pies_key, build_exact_pies, data, data_version, year, state,
+                                                administrative_region)
+            # A failed job is not retried in the background; the pies below are then built in this run
+            exact_ready = pies_job.status in (SUCCEEDED, FAILED)
+
+        if not exact_ready:
+            feed_chart.plotly_chart(figures.from_payload(figures.distribution_pie(
+                data, data_version, year, state, administrative_region, 'FeedInType', estimate=True
+            )), use_container_width=True)
+            location_chart.plotly_chart(figures.from_payload(figures.distribution_pie(
+                data, data_version, year, state, administrative_region, 'Location', estimate=True
+            )), use_container_width=True)
+            st.caption("Feed-in Type and Location are estimated from a sample; the exact counts follow shortly.")
+            refine_status(pies_key)
+
+        focus = views.regional_focus(data, data_version, year, state, administrative_region, city)
+
+        # Key Metrics for the selected region
+        total_power_region = focus["total_power_region"]
+        avg_efficiency_region = focus["avg_efficiency_region"]
+        total_modules_region = focus["total_modules_region"]
+
+        # Key Metrics for the selected district (zero if not selected)
+        total_power_city = focus["total_power_city"]
+        avg_efficiency_city = focus["avg_efficiency_city"]
+        total_modules_city = focus["total_modules_city"]
 
         # Populate each column with a metric card
-        with col1:
+        with card_col1:
             st.markdown(f"""
                 <div class="metric-card">
                     <div class="metric-title">Total Modules over {administrative_region} in {year}</div>
@@ -689,7 +679,7 @@ else:
                 </div>
             """, unsafe_allow_html=True)
 
-        with col2:
+        with card_col2:
             st.markdown(f"""
                 <div class="metric-card">
                     <div class="metric-title">Total Gross Power (MW)</div>
@@ -697,7 +687,7 @@ else:
                 </div>
             """, unsafe_allow_html=True)
 
-        with col3:
+        with card_col3:
             st.markdown(f"""
                 <div class="metric-card">
                     <div class="metric-title">Average Efficiency</div>
@@ -707,64 +697,14 @@ else:
 
         st.markdown(card_style, unsafe_allow_html=True)
 
-
-        # Pie charts for Feed-in Types and Location Distribution
-        feed_in_summary = district_data['FeedInType'].value_counts().reset_index()
-        feed_in_summary.columns = ['FeedInType', 'Count']
-        location_summary = district_data['Location'].value_counts().reset_index()
-        location_summary.columns = ['Location', 'Count']
-
-
-        # Create two columns for side-by-side charts
-        col1, col2 = st.columns(2)
-
-        # Feed-In Types Pie Chart
-        with col1:
-            fig_feed = px.pie(
-                feed_in_summary,
-                names='FeedInType',
-                values='Count',
-                title=f"Feed-In Type Distribution for {administrative_region}",
-                hole=0.4,
-                color_discrete_sequence=px.colors.sequential.Sunset
-            )
-            fig_feed.update_traces(textinfo='percent', textfont_size=14)
-            fig_feed.update_layout(
-                legend=dict(yanchor="top", y=0.99, xanchor="left", x=0.01),
-                template="plotly_white",  # Set template for a clean look
-                margin=dict(t=40, b=40, l=40, r=40),  # Adjust margins
-                showlegend=True,  # Keep legend visible
-                hovermode=False,  # Disable hover interaction
-                dragmode=False  # Disable zoom and pan
-            )
-            st.plotly_chart(fig_feed, use_container_width=True)
-
-        # Location Distribution Pie Chart
-        with col2:
-            fig_location = px.pie(
-                location_summary,
-                names='Location',
-                values='Count',
-                title=f"Location Distribution for {administrative_region}",
-                hole=0.4,
-                color_discrete_sequence=px.colors.sequential.Sunset
-            )
-            fig_location.update_traces(textinfo='percent', textfont_size=14)
-            fig_location.update_layout(
-                legend=dict(
-                    yanchor="top",
-                    y=0.99,
-                    xanchor="left",
-                    x=1.0
-                ),
-                template="plotly_white",  # Set template for a clean look
-                margin=dict(t=40, b=40, l=40, r=40),  # Adjust margins
-                showlegend=True,  # Keep legend visible
-                hovermode=False,  # Disable hover interaction
-                dragmode=False  # Disable zoom and pan
-            )
-
-            st.plotly_chart(fig_location, use_container_width=True)
+        # The exact Feed-in Type and Location pies, from the chart cache once the background job built them
+        if exact_ready:
+            feed_chart.plotly_chart(figures.from_payload(figures.distribution_pie(
+                data, data_version, year, state, administrative_region, 'FeedInType'
+            )), use_container_width=True)
+            location_chart.plotly_chart(figures.from_payload(figures.distribution_pie(
+                data, data_version, year, state, administrative_region, 'Location'
+            )), use_container_width=True)
 
 
 
@@ -802,97 +742,19 @@ else:
         # Metric selection for the district
         metric = st.selectbox("Select Metric", options=["NumberOfModules", "GrossPower", "NetRatedPower"])
 
-        # Filter data for the selected city and metric
-        city_data = data[(data['State'] == state) &
-                        (data['AdministrativeRegion'] == administrative_region) &
-                        (data['City'] == city)]
-
-        # Group data by CommissioningYear for selected city
-        city_data = city_data.groupby('CommissioningYear').agg({metric: 'sum'}).reset_index()
-        city_data['CumulativeMetric'] = city_data[metric].cumsum()
-
-        # Data for Germany (Overall) based on selected metric
-        germany_data = data.groupby('CommissioningYear').agg({metric: 'sum'}).reset_index()
-        germany_data['CumulativeMetric'] = germany_data[metric].cumsum()
-
-        # Data for selected state and region
-        state_data = data[data['State'] == state].groupby('CommissioningYear').agg({metric: 'sum'}).reset_index()
-        state_data['CumulativeMetric'] = state_data[metric].cumsum()
-
-        region_data = data[data['AdministrativeRegion'] == administrative_region].groupby('CommissioningYear').agg({metric: 'sum'}).reset_index()
-        region_data['CumulativeMetric'] = region_data[metric].cumsum()
-
-        # Combined plot for Germany, selected state, region, and city based on the metric
-        fig_combined = go.Figure()
-
-        # Apply color scale for bar chart
-        color_scale = 'sunset_r'
-
-        # City bar chart for the selected metric
-        fig_combined.add_trace(go.Bar(
-            x=city_data['CommissioningYear'],
-            y=city_data[metric],
-            name=f'{city} - Annual {metric}',
-            marker=dict(
-                color=city_data[metric],
-                colorscale=color_scale,
-                colorbar=dict(title=metric)
-            )
-        ))
-
-        # Add cumulative trend as a line
-        fig_combined.add_trace(go.Scatter(
-            x=city_data['CommissioningYear'],
-            y=city_data['CumulativeMetric'],
-            mode='lines',
-            name=f'{city} - Cumulative Trend',
-            line=dict(color='black', width=2)
-        ))
-
-        # Layout for the combined plot
-        fig_combined.update_layout(
-            title=f"{metric} Over Time: {city}",
-            xaxis_title="Year",
-            yaxis_title=metric,
-            barmode='stack',
-            plot_bgcolor='white',
-            template='plotly_white',
-            dragmode=False,
-            hovermode=False,
-            xaxis=dict(
-                tickmode='array',
-                tickvals=city_data['CommissioningYear'],
-                ticktext=[str(year) for year in city_data['CommissioningYear']]
-            ),
-            yaxis=dict(
-                type='log',  # Logarithmic scale
-                autorange=True,
-            ),
-            coloraxis_colorbar=dict(
-                title=metric,
-                tickvals=[min(city_data[metric]), max(city_data[metric])],
-                ticktext=[f"{min(city_data[metric]):.2f}", f"{max(city_data[metric]):.2f}"]
-            ),
-            legend=dict(
-                orientation='h',
-                yanchor="bottom",
-                y=1.02,
-                xanchor="center",
-                x=0.5
-            )
-        )
-
-        # Display combined plot
-        st.plotly_chart(fig_combined, use_container_width=True)
+        # Yearly and cumulative metric for the selected district
+        st.plotly_chart(figures.from_payload(
+            figures.district_trend(data, data_version, state, administrative_region, city, metric)
+        ), use_container_width=True)
 
 if data.empty:
-    with tab4:
+    if active_view == "Solar Power Forecast":
         st.warning("No data available. Please click 'Retrieve and Preprocess Data' in the sidebar to load data.")
 
 
 else:
     # Tab 1: Interactive Map
-    with tab4:
+    if active_view == "Solar Power Forecast":
         # Solar Panel Prediction Tool Card
         st.markdown("""
             <div class="info-card">
@@ -907,9 +769,7 @@ else:
             </div>
         """, unsafe_allow_html=True)
 
-        # Create a separate dataset for state and administrative region, ignoring the year filter
-        state_region_data = data[(data['State'] == state) & (data['AdministrativeRegion'] == administrative_region)] if state and administrative_region else pd.DataFrame()
-
+        options = views.forecast_options(data, data_version)
 
         if "predict_button_clicked" not in st.session_state:
             st.session_state.predict_button_clicked = False
@@ -921,13 +781,13 @@ else:
 
         with col1:
             # Step 3: Select Main Orientation
-            orientations = sorted(data['MainOrientation'].unique())
+            orientations = options["orientations"]
             main_orientation_selected = st.selectbox("Select Main Orientation", options=orientations)
 
             # Step 4: Radio Button for Feed-In Type
             feed_in_type_selected = st.radio(
                 "Select Feed-In Type",
-                options=["Full Feed-in", "Partial Feed-in"],
+                options=FEED_IN_TYPES,
                 index=0  # Default to "Full Feed-in"
             )
 
@@ -958,20 +818,20 @@ else:
             )
 
         # Step 7: Select Location Type
-        locations = sorted(data['Location'].unique())
+        locations = options["locations"]
         location_selected = st.selectbox("Select Location Type", options=locations)
 
         # Grouped input feature set for prediction
-        input_features = pd.DataFrame({
-            'State': [state],
-            'Administrative Region': [administrative_region],
-            'City': [city],
-            'MainOrientation': [main_orientation_selected],
-            'FeedInType': [feed_in_type_selected],
-            'AssignedActivePowerInverter': [assigned_power],
-            'Location': [location_selected],
-            'NumberOfModules': [num_modules],
-        })
+        input_features = {
+            'State': state,
+            'Administrative Region': administrative_region,
+            'City': city,
+            'MainOrientation': main_orientation_selected,
+            'FeedInType': feed_in_type_selected,
+            'AssignedActivePowerInverter': assigned_power,
+            'Location': location_selected,
+            'NumberOfModules': num_modules,
+        }
 
         # Clear Button & Predict Button
         st.markdown('<hr>', unsafe_allow_html=True)
@@ -980,14 +840,18 @@ else:
         # Predict Button
         if st.button("Predict", key="predict_button", use_container_width=True):
             st.session_state.predict_button_clicked = True
-            st.session_state.active_tab = "tab4"
 
             with st.spinner("Predicting... Please wait."):
                 try:
-                    # Load the model (make sure your path is correct)
-                    model = joblib.load("./model/xgb_full_pipeline.pkl")
-                    predictions = model.predict(input_features)
-                    gross_power, net_rated_power = predictions[0]
+                    # Use the bundled model if there is one
+                    if bundle is not None and bundle["model"] is not None:
+                        model, version = bundle["model"], bundle["model_version"]
+                    else:
+                        version = model_version(model_path)
+                        model = get_model(model_path, version)
+                    # Configurations predicted before, by any session, come from the prediction cache
+                    prediction = predict_cached(model, version, [input_features])[0]
+                    gross_power, net_rated_power = prediction["GrossPower"], prediction["NetRatedPower"]
 
                     # Display the results (if prediction is successful)
                     col1, col2 = st.columns(2)
@@ -1007,6 +871,21 @@ else:
                             </div>
                         """, unsafe_allow_html=True)
 
+                    # What drives the forecast: SHAP contributions and sensitivity sweeps, scored in one batch
+                    with st.expander("What drives this forecast"):
+                        explanation = explain_cached(model, version, [input_features])[0]
+                        contributions = pd.DataFrame(explanation["contributions"])
+                        st.caption(
+                            "Contribution of each input, in MW, relative to the model's average prediction "
+                            f"({explanation['base_value']['GrossPower']:.2f} MW gross)."
+                        )
+                        st.bar_chart(contributions, horizontal=True, stack=False)
+                        sweep_columns = st.columns(len(explanation["sensitivity"]))
+                        for sweep_column, (feature, sweep) in zip(sweep_columns, explanation["sensitivity"].items()):
+                            with sweep_column:
+                                st.caption(f"Forecast (MW) as {feature} changes")
+                                st.line_chart(pd.DataFrame(sweep).set_index(feature))
+
                     # Reset the button state after prediction
                     st.session_state.predict_button_clicked = False  # Reset button color after prediction
 
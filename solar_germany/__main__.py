@@ -0,0 +1,5 @@
+import sys
+
+from solar_germany.cli import main
+
+sys.exit(main())
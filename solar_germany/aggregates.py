@@ -0,0 +1,204 @@
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from solar_germany.cache import memoize
+from solar_germany.dictionary import decode_index
+from solar_germany.params import METRIC_COLUMNS
+from solar_germany.sketches import quantiles, sketch_from_frame
+
+
+# Derived aggregates of the processed dataset.
+#
+# All functions take the processed frame plus its version string and are
+# memoized in the shared process-wide cache (see solar_germany.cache), so the
+# same selection is only aggregated once no matter how many sessions ask.
+
+GEOGRAPHY_LEVELS = ['State', 'AdministrativeRegion', 'City']
+
+# Besides the metric sums, the cube holds the sufficient statistics of the
+# ratio metrics, so they can be rolled up from any set of cells: efficiency
+# is sum(GrossPower) / sum(NetRatedPower) (capacity weighted), and the plain
+# mean of per-unit ratios is EfficiencySum / Installations.
+STATISTIC_COLUMNS = ['Installations', 'EfficiencySum']
+CUBE_COLUMNS = METRIC_COLUMNS + STATISTIC_COLUMNS
+
+
+@memoize
+def geography_cube(data: pd.DataFrame, data_version: str) -> pd.DataFrame:
+    """
+    Sum every metric per district and commissioning year in a single pass.
+
+    The result is sorted by (State, AdministrativeRegion, City,
+    CommissioningYear) and is small compared to the raw data, so every
+    geography level and metric can be sliced out of it without another scan.
+
+    :param data: The processed solar dataset.
+    :param data_version: Version string of the processed dataset.
+    :return: Frame indexed by geography and year with one column per metric.
+    """
+    return cube_from_frame(data)
+
+
+def cube_from_frame(frame):
+    """
+    Group a pandas or dask frame into the geography cube.
+
+    With a dask frame the result is lazy; computing it reduces the data
+    partition by partition, holding only the (small) per-group sums.
+
+    :param frame: Processed rows, as a pandas or dask DataFrame.
+    :return: The cube, or a lazy dask result for a dask input.
+    """
+    frame = frame.assign(Installations=1, EfficiencySum=frame['Efficiency'])
+    cube = frame.groupby(GEOGRAPHY_LEVELS + ['CommissioningYear'], sort=True, observed=True)[CUBE_COLUMNS].sum()
+    # Group on the dictionary codes, but index the cube by plain names so cubes
+    # of different datasets (e.g. snapshots) align
+    return decode_index(cube) if isinstance(cube, pd.DataFrame) else cube
+
+
+def efficiency(totals):
+    """
+    Capacity-weighted efficiency of rolled-up cube cells.
+
+    :param totals: A cube row, or a frame of them, with GrossPower and
+        NetRatedPower sums.
+    :return: GrossPower / NetRatedPower (NaN where there is no capacity).
+    """
+    net = totals['NetRatedPower']
+    if np.ndim(net) == 0:
+        return totals['GrossPower'] / net if net else float('nan')
+    return totals['GrossPower'] / net.where(net != 0)
+
+
+def mean_efficiency(totals):
+    """
+    :return: The unweighted mean of the per-unit efficiencies of rolled-up cube cells.
+    """
+    count = totals['Installations']
+    if np.ndim(count) == 0:
+        return totals['EfficiencySum'] / count if count else float('nan')
+    return totals['EfficiencySum'] / count.where(count != 0)
+
+
+@memoize
+def modules_by_state(data: pd.DataFrame, data_version: str, year: int) -> pd.DataFrame:
+    """
+    Sum the number of modules per state for one commissioning year.
+
+    :param data: The processed solar dataset.
+    :param data_version: Version string of the processed dataset.
+    :param year: Commissioning year to aggregate.
+    :return: Frame with `State` and `NumberOfModules` columns.
+    """
+    cube = geography_cube(data, data_version)
+    in_year = cube[cube.index.get_level_values('CommissioningYear') == year]
+    return in_year.groupby(level='State')[['NumberOfModules']].sum().reset_index()
+
+
+@memoize
+def year_summary(data: pd.DataFrame, data_version: str, year: int) -> dict:
+    """
+    Summarise all units commissioned in one year.
+
+    :param data: The processed solar dataset.
+    :param data_version: Version string of the processed dataset.
+    :param year: Commissioning year to summarise.
+    :return: Total modules, total gross power and average efficiency.
+    """
+    totals = rollup(data, data_version, years=(year, year))
+    return {
+        "total_modules": totals['NumberOfModules'],
+        "total_power": totals['GrossPower'],
+        "avg_efficiency": totals['Efficiency'],
+    }
+
+
+@memoize
+def gross_power_sketch(data: pd.DataFrame, data_version: str) -> pd.Series:
+    """
+    Quantile sketch of GrossPower per district and commissioning year.
+
+    :param data: The processed solar dataset.
+    :param data_version: Version string of the processed dataset.
+    :return: Counts indexed by geography, CommissioningYear and Bucket (see
+        solar_germany.sketches).
+    """
+    return sketch_from_frame(data, 'GrossPower', GEOGRAPHY_LEVELS + ['CommissioningYear'])
+
+
+def _cell_mask(index: pd.MultiIndex, years: Optional[tuple], states, regions, cities) -> np.ndarray:
+    """
+    :return: Which cells of a cube-like index fall in the selection.
+    """
+    mask = np.ones(len(index), dtype=bool)
+    if years is not None:
+        year_values = index.get_level_values('CommissioningYear')
+        mask &= (year_values >= years[0]) & (year_values <= years[1])
+    for level, values in (('State', states), ('AdministrativeRegion', regions), ('City', cities)):
+        if values is not None:
+            mask &= index.get_level_values(level).isin(list(values))
+    return mask
+
+
+@memoize
+def rollup(
+    data: pd.DataFrame,
+    data_version: str,
+    years: Optional[tuple] = None,
+    states: Optional[tuple] = None,
+    regions: Optional[tuple] = None,
+    cities: Optional[tuple] = None,
+    qs: tuple = (0.5,),
+) -> dict:
+    """
+    Totals, efficiencies and GrossPower quantiles of any selection, merged
+    from the pre-aggregated cube and sketches without touching raw rows.
+
+    :param data: The processed solar dataset.
+    :param data_version: Version string of the processed dataset.
+    :param years: Optional inclusive (first, last) commissioning year range.
+    :param states: Optional states to include.
+    :param regions: Optional administrative regions to include.
+    :param cities: Optional districts to include.
+    :param qs: GrossPower quantiles to estimate, e.g. (0.5, 0.9).
+    :return: The metric sums and statistics, "Efficiency" (capacity
+        weighted), "MeanEfficiency" and "GrossPowerQuantiles".
+    """
+    cube = geography_cube(data, data_version)
+    cells = cube[_cell_mask(cube.index, years, states, regions, cities)]
+    totals = {column: cells[column].sum().item() for column in CUBE_COLUMNS}
+
+    sketch = gross_power_sketch(data, data_version)
+    sketch = sketch[_cell_mask(sketch.index, years, states, regions, cities)]
+
+    return {
+        **totals,
+        "Efficiency": efficiency(totals),
+        "MeanEfficiency": mean_efficiency(totals),
+        "GrossPowerQuantiles": quantiles(sketch, qs),
+    }
+
+
+@memoize
+def city_totals(data: pd.DataFrame, data_version: str, year: int, state: str, administrative_region: str) -> pd.DataFrame:
+    """
+    Aggregate the districts of an administrative region for one year.
+
+    :param data: The processed solar dataset.
+    :param data_version: Version string of the processed dataset.
+    :param year: Commissioning year to aggregate.
+    :param state: State of the administrative region.
+    :param administrative_region: Administrative region to break down.
+    :return: Frame with one row per `District` and its power, module and
+        efficiency figures.
+    """
+    cube = geography_cube(data, data_version)
+    cells = cube[_cell_mask(cube.index, (year, year), [state], [administrative_region], None)]
+    city_grouped = cells.groupby(level='City')[['GrossPower', 'NetRatedPower', 'NumberOfModules']].sum()
+    city_grouped['Efficiency'] = efficiency(city_grouped)
+    city_grouped = city_grouped.reset_index()
+
+    # Rename "City" to "District"
+    return city_grouped.rename(columns={'City': 'District'})
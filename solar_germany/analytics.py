@@ -0,0 +1,293 @@
+import threading
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from solar_germany.aggregates import GEOGRAPHY_LEVELS, geography_cube
+from solar_germany.cache import memoize
+from solar_germany.params import METRIC_COLUMNS
+
+
+# Trend analytics over every geography node.
+#
+# A `TrendIndex` holds, for each level (Germany, state, region, district),
+# dense [kind, node, year, metric] arrays of the series below, plus the rank
+# of every node per (kind, year, metric). Charts read a node's series
+# directly and "top N fastest growing" queries walk the precomputed ranks,
+# neither touching raw rows nor re-running group-bys and cumulative sums.
+#
+#   Annual        sum of the units commissioned in the year
+#   Cumulative    running total up to and including the year
+#   Growth        year-over-year growth of the cumulative total
+#   AnnualGrowth  year-over-year growth of the annual sum
+#
+# New data (e.g. a new commissioning year, or a snapshot's delta) is added
+# with `apply`, which only recomputes the years from the first one it touches.
+# A new version of the processed data is derived from the last index built,
+# as long as it only adds to or changes that index's cells.
+
+TREND_METRICS = METRIC_COLUMNS + ['Installations']
+KINDS = ['Annual', 'Cumulative', 'Growth', 'AnnualGrowth']
+LEVELS = ['Germany'] + GEOGRAPHY_LEVELS
+
+
+def _growth(values: np.ndarray, previous: np.ndarray) -> np.ndarray:
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(previous > 0, values / previous - 1, np.nan)
+
+
+def _ranks(values: np.ndarray) -> np.ndarray:
+    # Node positions by descending value per (kind, year, metric); NaN last
+    return np.argsort(-values, axis=1, kind='stable')
+
+
+class TrendIndex:
+    """
+    Annual, cumulative and growth series of every geography node and metric.
+
+    Nodes are tuples of geography values: () for Germany, (state,),
+    (state, region) and (state, region, district). Instances are shared
+    through the derived-results cache and never modified; `apply` returns a
+    new index.
+
+    :param cube: A geography cube (see aggregates.geography_cube), or None
+        for an empty index.
+    """
+
+    def __init__(self, cube: Optional[pd.DataFrame] = None):
+        self.years = np.array([], dtype=int)
+        self._nodes = [[] for _ in LEVELS]
+        self._positions = [{} for _ in LEVELS]
+        self._values = [np.zeros((len(KINDS), 0, 0, len(TREND_METRICS))) for _ in LEVELS]
+        self._ranks = [np.zeros((len(KINDS), 0, 0, len(TREND_METRICS)), dtype=np.intp) for _ in LEVELS]
+        if cube is not None and len(cube):
+            self._add(cube)
+
+    def __sizeof__(self) -> int:
+        return sum(values.nbytes for values in self._values) + sum(ranks.nbytes for ranks in self._ranks)
+
+    def _copy(self) -> "TrendIndex":
+        index = TrendIndex()
+        index.years = self.years
+        index._nodes = [list(nodes) for nodes in self._nodes]
+        index._positions = [dict(positions) for positions in self._positions]
+        index._values = list(self._values)
+        index._ranks = list(self._ranks)
+        return index
+
+    def apply(self, delta: pd.DataFrame) -> "TrendIndex":
+        """
+        Add cube cells (e.g. a new commissioning year, or the difference
+        between two snapshots' cubes, removals negative) to the series.
+
+        Only the years from the earliest one in `delta` on are recomputed;
+        adding a year after the last one touches that year alone.
+
+        :param delta: Cube-like frame indexed by geography and year.
+        :return: The updated index.
+        """
+        index = self._copy()
+        if len(delta):
+            index._add(delta)
+        return index
+
+    def _add(self, cells: pd.DataFrame) -> None:
+        cell_years = cells.index.get_level_values('CommissioningYear').to_numpy()
+        first_year = int(cell_years.min())
+        years = np.arange(min([first_year] + self.years[:1].tolist()),
+                          max([int(cell_years.max())] + self.years[-1:].tolist()) + 1)
+        # Years added before the current first one shift every column
+        prepended = len(self.years) > 0 and years[0] < self.years[0]
+        start = 0 if prepended or not len(self.years) else int(first_year - years[0])
+        offset = int(self.years[0] - years[0]) if len(self.years) else 0
+
+        for depth in range(len(LEVELS)):
+            levels = GEOGRAPHY_LEVELS[:depth]
+            sums = cells.groupby(level=levels + ['CommissioningYear'])[TREND_METRICS].sum()
+            keys = list(zip(*(sums.index.get_level_values(level) for level in levels))) if depth else [()] * len(sums)
+
+            nodes, positions = self._nodes[depth], self._positions[depth]
+            known_nodes = len(nodes)
+            for key in dict.fromkeys(keys):
+                if key not in positions:
+                    positions[key] = len(nodes)
+                    nodes.append(key)
+
+            old_values, old_ranks = self._values[depth], self._ranks[depth]
+            annual = np.zeros((len(nodes), len(years), len(TREND_METRICS)))
+            annual[:known_nodes, offset:offset + old_values.shape[2]] = old_values[0]
+            node_positions = np.fromiter((positions[key] for key in keys), dtype=np.intp, count=len(keys))
+            year_positions = sums.index.get_level_values('CommissioningYear').to_numpy() - years[0]
+            np.add.at(annual, (node_positions, year_positions), sums.to_numpy(dtype=float))
+
+            # The series before the first touched year are kept, unless nodes were added
+            kept = min(start, old_values.shape[2]) if len(nodes) == known_nodes else 0
+            values = np.empty((len(KINDS),) + annual.shape)
+            values[0] = annual
+            if kept:
+                values[1:, :, :kept] = old_values[1:, :, :kept]
+                # Continue the running totals from the last kept year
+                running = np.concatenate([values[1, :, kept - 1:kept], annual[:, kept:]], axis=1)
+                values[1, :, kept:] = np.cumsum(running, axis=1)[:, 1:]
+            else:
+                values[1] = np.cumsum(annual, axis=1)
+                values[2:, :, 0] = np.nan
+            first = max(kept, 1)
+            values[2, :, first:] = _growth(values[1, :, first:], values[1, :, first - 1:-1])
+            values[3, :, first:] = _growth(annual[:, first:], annual[:, first - 1:-1])
+
+            ranks = np.empty(values.shape, dtype=np.intp)
+            if kept:
+                ranks[:, :, :kept] = old_ranks[:, :, :kept]
+            ranks[:, :, kept:] = _ranks(values[:, :, kept:])
+
+            self._values[depth], self._ranks[depth] = values, ranks
+        self.years = years
+
+    def series(self, node: tuple = ()) -> pd.DataFrame:
+        """
+        :param node: Geography values, e.g. ("Bayern", "Oberbayern").
+        :return: Frame indexed by CommissioningYear with (kind, metric)
+            columns; empty for unknown nodes.
+        """
+        depth = len(node)
+        position = self._positions[depth].get(tuple(node))
+        columns = pd.MultiIndex.from_product([KINDS, TREND_METRICS])
+        if position is None:
+            return pd.DataFrame(columns=columns, index=pd.Index([], name='CommissioningYear'))
+        values = self._values[depth][:, position]  # kind, year, metric
+        return pd.DataFrame(
+            values.transpose(1, 0, 2).reshape(len(self.years), -1),
+            index=pd.Index(self.years, name='CommissioningYear'),
+            columns=columns,
+        )
+
+    def top(self, level: str, metric: str, year: int, kind: str = 'Growth', n: int = 10,
+            within: tuple = (), min_base: float = 0) -> pd.DataFrame:
+        """
+        Rank the nodes of a level, e.g. the fastest growing districts.
+
+        :param level: "State", "AdministrativeRegion" or "City".
+        :param metric: One of TREND_METRICS.
+        :param year: Commissioning year to rank.
+        :param kind: One of KINDS.
+        :param n: Number of nodes to return.
+        :param within: Optional parent node, e.g. ("Bayern",) for the
+            districts of Bavaria.
+        :param min_base: For the growth kinds, the smallest previous-year
+            value (cumulative or annual) a node needs to be ranked, so tiny
+            bases do not dominate.
+        :return: Frame with the level columns, the value and the previous
+            year's Cumulative and Annual values, best first; NaN values are
+            left out.
+        """
+        depth = LEVELS.index(level)
+        if year not in self.years:
+            return pd.DataFrame(columns=GEOGRAPHY_LEVELS[:depth] + [kind, 'Cumulative', 'Annual'])
+        k, y, m = KINDS.index(kind), int(year - self.years[0]), TREND_METRICS.index(metric)
+        values, nodes = self._values[depth], self._nodes[depth]
+
+        order = self._ranks[depth][k, :, y, m]
+        order = order[~np.isnan(values[k, order, y, m])]
+        if within:
+            order = order[[nodes[position][:len(within)] == tuple(within) for position in order]]
+        if min_base and kind in ('Growth', 'AnnualGrowth') and y > 0:
+            base = values[1 if kind == 'Growth' else 0, order, y - 1, m]
+            order = order[base >= min_base]
+        order = order[:n]
+
+        frame = pd.DataFrame([nodes[position] for position in order], columns=GEOGRAPHY_LEVELS[:depth])
+        frame[kind] = values[k, order, y, m]
+        frame['Cumulative'] = values[1, order, y, m]
+        frame['Annual'] = values[0, order, y, m]
+        return frame
+
+
+# The cube and index of the last dataset version built
+_latest = {}
+_latest_lock = threading.Lock()
+
+
+@memoize
+def trend_index(data: pd.DataFrame, data_version: str) -> TrendIndex:
+    """
+    Build the trend index of a dataset from its geography cube.
+
+    If every cell of the previously built version's cube is still present
+    (e.g. the data gained a commissioning year), the index is derived from
+    the previous one by applying the difference of the cubes, so only the
+    years from the first changed one are recomputed. Otherwise, e.g. for a
+    narrower year range, it is built from scratch.
+
+    :param data: The processed solar dataset.
+    :param data_version: Version string of the processed dataset.
+    :return: The shared, read-only index.
+    """
+    cube = geography_cube(data, data_version)
+    with _latest_lock:
+        previous_cube, previous = _latest.get("cube"), _latest.get("index")
+
+    if previous is not None and previous_cube.index.isin(cube.index).all():
+        delta = cube.sub(previous_cube, fill_value=0)
+        index = previous.apply(delta[(delta != 0).any(axis=1)])
+    else:
+        index = TrendIndex(cube)
+
+    with _latest_lock:
+        _latest.update(cube=cube, index=index)
+    return index
+
+
+@memoize
+def yearly_series(data: pd.DataFrame, data_version: str, metric: str, node: tuple = ()) -> pd.DataFrame:
+    """
+    Yearly and cumulative values of a metric for one node, for charting.
+
+    :param data: The processed solar dataset.
+    :param data_version: Version string of the processed dataset.
+    :param metric: One of TREND_METRICS.
+    :param node: Geography values; () for the whole of Germany.
+    :return: Frame with `CommissioningYear`, `metric` and `CumulativeMetric`,
+        limited to the years with units at that node.
+    """
+    series = trend_index(data, data_version).series(node)
+    series = series[series[('Annual', 'Installations')] != 0]
+    return pd.DataFrame({
+        'CommissioningYear': series.index,
+        metric: series[('Annual', metric)].to_numpy(),
+        'CumulativeMetric': series[('Cumulative', metric)].to_numpy(),
+    })
+
+
+@memoize
+def fastest_growing(data: pd.DataFrame, data_version: str, level: str, metric: str, year: int, n: int = 10,
+                    within: tuple = (), kind: str = 'Growth', min_base: float = 0) -> pd.DataFrame:
+    """
+    Top `n` nodes of a level by year-over-year growth (see `TrendIndex.top`).
+
+    :param data: The processed solar dataset.
+    :param data_version: Version string of the processed dataset.
+    """
+    return trend_index(data, data_version).top(level, metric, year, kind, n, within, min_base)
+
+
+@lru_cache(maxsize=8)
+def snapshot_trends(snapshot_id: str) -> TrendIndex:
+    """
+    The trend index of a snapshot, derived from its parent's by applying the
+    difference of their cubes, so a release that adds a commissioning year
+    only computes that year.
+
+    :param snapshot_id: A registered snapshot.
+    :return: The snapshot's index.
+    """
+    from solar_germany.snapshots import read_cube, read_manifest
+
+    parent = read_manifest(snapshot_id).get("parent")
+    cube = read_cube(snapshot_id)
+    if parent is None:
+        return TrendIndex(cube)
+    delta = cube.sub(read_cube(parent), fill_value=0)
+    return snapshot_trends(parent).apply(delta[(delta != 0).any(axis=1)])
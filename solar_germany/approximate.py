@@ -0,0 +1,208 @@
+import math
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from solar_germany.cache import memoize
+from solar_germany.params import HLL_PRECISION, METRIC_COLUMNS, SAMPLE_PER_STRATUM
+
+# Approximate answers for fast previews.
+#
+# A stratified sample keeps up to SAMPLE_PER_STRATUM random rows of every
+# State x CommissioningYear stratum, together with the stratum's size. Sums,
+# counts and category counts over any selection are estimated from it with the
+# stratified (Horvitz-Thompson) estimator and a 95% confidence interval;
+# strata small enough to be sampled whole contribute exactly. Distinct counts
+# come from HyperLogLog sketches kept per stratum, which merge by taking the
+# maximum of their registers.
+
+STRATA = ['State', 'CommissioningYear']
+Z_95 = 1.959964
+
+
+@memoize
+def stratified_sample(data: pd.DataFrame, data_version: str) -> pd.DataFrame:
+    """
+    Draw the stratified sample of a dataset.
+
+    :param data: The processed solar dataset.
+    :param data_version: Version string of the processed dataset.
+    :return: The sampled rows with `StratumSize` and `StratumSampleSize`
+        columns; the same rows for the same data version.
+    """
+    rng = np.random.default_rng(0)
+    shuffled = data.iloc[rng.permutation(len(data))]
+    groups = shuffled.groupby(STRATA, sort=False, observed=True)
+    sample = shuffled[groups.cumcount().to_numpy() < SAMPLE_PER_STRATUM]
+
+    sizes = data.groupby(STRATA, observed=True).size().rename('StratumSize')
+    sample_sizes = sample.groupby(STRATA, observed=True).size().rename('StratumSampleSize')
+    return sample.join(sizes, on=STRATA).join(sample_sizes, on=STRATA).reset_index(drop=True)
+
+
+def _mask(frame: pd.DataFrame, years: Optional[tuple], states, regions, cities) -> np.ndarray:
+    mask = np.ones(len(frame), dtype=bool)
+    if years is not None:
+        mask &= frame['CommissioningYear'].between(years[0], years[1]).to_numpy()
+    for column, values in (('State', states), ('AdministrativeRegion', regions), ('City', cities)):
+        if values is not None:
+            mask &= frame[column].isin(list(values)).to_numpy()
+    return mask
+
+
+def _estimate(sample: pd.DataFrame, values: np.ndarray) -> dict:
+    """
+    Stratified estimate of the population total of `values` (0 outside the
+    selection), with its 95% confidence interval.
+    """
+    frame = pd.DataFrame({
+        'z': values,
+        'N': sample['StratumSize'].to_numpy(),
+        'n': sample['StratumSampleSize'].to_numpy(),
+    })
+    keys = [sample[column] for column in STRATA]
+    strata = frame.groupby(keys, observed=True).agg(
+        mean=('z', 'mean'), var=('z', 'var'), N=('N', 'first'), n=('n', 'first')
+    )
+    strata['var'] = strata['var'].fillna(0)
+
+    estimate = float((strata['N'] * strata['mean']).sum())
+    variance = float((strata['N'] ** 2 * (1 - strata['n'] / strata['N']) * strata['var'] / strata['n']).sum())
+    margin = Z_95 * math.sqrt(variance)
+    return {'estimate': estimate, 'ci_low': max(estimate - margin, 0.0), 'ci_high': estimate + margin}
+
+
+def estimate_totals(
+    data: pd.DataFrame,
+    data_version: str,
+    years: Optional[tuple] = None,
+    states: Optional[tuple] = None,
+    regions: Optional[tuple] = None,
+    cities: Optional[tuple] = None,
+) -> dict:
+    """
+    Estimate the number of installations and every metric sum of a selection.
+
+    :param data: The processed solar dataset.
+    :param data_version: Version string of the processed dataset.
+    :param years: Optional inclusive (first, last) commissioning year range.
+    :param states: Optional states to include.
+    :param regions: Optional administrative regions to include.
+    :param cities: Optional districts to include.
+    :return: "Installations" and each metric, as {"estimate", "ci_low", "ci_high"}.
+    """
+    sample = stratified_sample(data, data_version)
+    mask = _mask(sample, years, states, regions, cities)
+    totals = {'Installations': _estimate(sample, mask.astype(float))}
+    for metric in METRIC_COLUMNS:
+        totals[metric] = _estimate(sample, np.where(mask, sample[metric].to_numpy(dtype=float), 0.0))
+    return totals
+
+
+def estimate_category_counts(
+    data: pd.DataFrame,
+    data_version: str,
+    column: str,
+    years: Optional[tuple] = None,
+    states: Optional[tuple] = None,
+    regions: Optional[tuple] = None,
+    cities: Optional[tuple] = None,
+) -> pd.DataFrame:
+    """
+    Estimate how many installations of a selection fall in each category.
+
+    :param column: Category column, e.g. "FeedInType".
+    :return: Frame with `column`, `Count` (estimate), `CountLow` and `CountHigh`.
+    """
+    sample = stratified_sample(data, data_version)
+    mask = _mask(sample, years, states, regions, cities)
+    rows = []
+    for category in sample.loc[mask, column].dropna().unique():
+        estimate = _estimate(sample, (mask & (sample[column] == category).to_numpy()).astype(float))
+        rows.append({column: category, 'Count': estimate['estimate'],
+                     'CountLow': estimate['ci_low'], 'CountHigh': estimate['ci_high']})
+    frame = pd.DataFrame(rows, columns=[column, 'Count', 'CountLow', 'CountHigh'])
+    return frame.sort_values('Count', ascending=False).reset_index(drop=True)
+
+
+def preview_rows(data: pd.DataFrame, data_version: str, limit: int, **filters) -> tuple:
+    """
+    Sampled rows of a selection, each weighted by how many rows it stands for.
+
+    :param limit: Maximum number of rows to return.
+    :param filters: years, states, regions and/or cities, as for `estimate_totals`.
+    :return: The rows with a `SampleWeight` column, and the estimated number
+        of rows in the whole selection.
+    """
+    sample = stratified_sample(data, data_version)
+    mask = _mask(sample, filters.get('years'), filters.get('states'), filters.get('regions'), filters.get('cities'))
+    rows = sample[mask].head(limit)
+    rows = rows.assign(SampleWeight=rows['StratumSize'] / rows['StratumSampleSize'])
+    return rows.drop(columns=['StratumSize', 'StratumSampleSize']), _estimate(sample, mask.astype(float))
+
+
+# --- HyperLogLog distinct counts --------------------------------------------
+
+def _hll_registers(values: pd.Series, precision: int = HLL_PRECISION) -> tuple:
+    """
+    :return: The register index and rank of every value.
+    """
+    hashes = pd.util.hash_pandas_object(values, index=False).to_numpy(dtype=np.uint64)
+    registers = (hashes >> np.uint64(64 - precision)).astype(np.int64)
+    rest = (hashes << np.uint64(precision)).astype(np.uint64)
+    highest_bit = np.minimum(np.floor(np.log2(np.maximum(rest, 1).astype(float))), 63).astype(np.int64)
+    ranks = np.where(rest == 0, 64 - precision + 1, 64 - highest_bit)
+    return registers, np.minimum(ranks, 64 - precision + 1).astype(np.uint8)
+
+
+@memoize
+def distinct_sketch(data: pd.DataFrame, data_version: str, column: str) -> pd.DataFrame:
+    """
+    HyperLogLog registers of a column per State x CommissioningYear stratum.
+
+    :param column: Column whose distinct values are counted, e.g. "City".
+    :return: Frame indexed by the strata with one uint8 column per register.
+    """
+    values = data[column].astype(str).where(data[column].notna())
+    registers, ranks = _hll_registers(values.fillna(''))
+    frame = pd.DataFrame({'State': data['State'].to_numpy(), 'CommissioningYear': data['CommissioningYear'].to_numpy(),
+                          'Register': registers, 'Rank': ranks})[values.notna().to_numpy()]
+    sketch = frame.groupby(STRATA + ['Register'], observed=True)['Rank'].max().unstack('Register', fill_value=0)
+    return sketch.reindex(columns=range(1 << HLL_PRECISION), fill_value=0).astype(np.uint8)
+
+
+def estimate_distinct(
+    data: pd.DataFrame,
+    data_version: str,
+    column: str,
+    years: Optional[tuple] = None,
+    states: Optional[tuple] = None,
+) -> dict:
+    """
+    Estimate the number of distinct values of a column in a selection.
+
+    :param column: Column to count, e.g. "City".
+    :param years: Optional inclusive (first, last) commissioning year range.
+    :param states: Optional states to include.
+    :return: {"estimate", "ci_low", "ci_high"}, the interval being 1.96
+        standard errors (1.04 / sqrt(registers)).
+    """
+    sketch = distinct_sketch(data, data_version, column)
+    index = sketch.index
+    mask = np.ones(len(sketch), dtype=bool)
+    if years is not None:
+        year_values = index.get_level_values('CommissioningYear')
+        mask &= (year_values >= years[0]) & (year_values <= years[1])
+    if states is not None:
+        mask &= index.get_level_values('State').isin(list(states))
+
+    registers = sketch[mask].to_numpy().max(axis=0) if mask.any() else np.zeros(sketch.shape[1], dtype=np.uint8)
+    m = len(registers)
+    estimate = (0.7213 / (1 + 1.079 / m)) * m ** 2 / np.sum(np.power(2.0, -registers.astype(float)))
+    zeros = int(np.count_nonzero(registers == 0))
+    if estimate <= 2.5 * m and zeros:
+        estimate = m * math.log(m / zeros)
+
+    margin = Z_95 * 1.04 / math.sqrt(m) * estimate
+    return {'estimate': float(estimate), 'ci_low': max(estimate - margin, 0.0), 'ci_high': estimate + margin}
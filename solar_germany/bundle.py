@@ -0,0 +1,265 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+from colorama import Fore, Style
+
+from solar_germany.aggregates import geography_cube
+from solar_germany import dictionary
+from solar_germany.cache import seed
+from solar_germany.metrics import timed
+from solar_germany.prediction import model_version
+from solar_germany.storage import write_dataset
+from solar_germany.params import (BUCKET_NAME, BUNDLE_PATH, DISTRICT_PROPERTIES, DISTRICTS_GEOJSON_FILE,
+                                  GEOJSON_SIMPLIFY_TOLERANCE, LOCAL_DATA_PATH, MODEL_PATH, STATE_PROPERTIES,
+                                  STATES_GEOJSON_FILE)
+
+
+# Ready-to-serve artifact bundles.
+#
+# `bake_bundle` runs at build time and writes everything a fresh instance
+# needs into BUNDLE_PATH/<version>/:
+#
+#   data.arrow         processed rows as an uncompressed Arrow IPC file, with
+#                      the string columns dictionary-encoded
+#   dictionary.json    the codes of those columns (see solar_germany.dictionary)
+#   data.parquet/      the same rows, block-indexed for filtered reads (see storage)
+#   cube.parquet       the geography cube (see aggregates.geography_cube)
+#   states.geo.json    simplified state polygons
+#   districts.geo.json simplified district polygons (if available)
+#   indexes.pkl        the spatial indexes over both polygon sets
+#   model.pkl          the prediction pipeline
+#   manifest.json      version, data version, year range, row count and file list
+#
+# A bundle is baked into BUNDLE_PATH/<version>.partial/ and renamed into place
+# once complete, so a failed bake never leaves a bundle that looks usable.
+# BUNDLE_PATH/CURRENT names the bundle to serve. `load_bundle` memory-maps the
+# Arrow file and seeds the derived-results cache with the cube, so startup
+# never touches BigQuery or GCS.
+
+
+def bundle_dir(version: str) -> Path:
+    """
+    :return: The directory holding a bundle's files.
+    """
+    return Path(BUNDLE_PATH).joinpath(version)
+
+
+def current_bundle() -> Optional[str]:
+    """
+    :return: The version of the bundle to serve, or None if none was baked.
+    """
+    pointer = Path(BUNDLE_PATH).joinpath("CURRENT")
+    if not pointer.is_file():
+        return None
+    version = pointer.read_text().strip()
+    return version if bundle_dir(version).joinpath("manifest.json").is_file() else None
+
+
+def simplify_geojson(geojson: dict, tolerance: float = GEOJSON_SIMPLIFY_TOLERANCE) -> dict:
+    """
+    Simplify every polygon of a FeatureCollection for display.
+
+    :param geojson: A GeoJSON FeatureCollection in lon/lat coordinates.
+    :param tolerance: Maximum deviation from the original outline, in degrees.
+    :return: The same collection with simplified geometries.
+    """
+    from shapely.geometry import mapping, shape
+
+    features = []
+    for feature in geojson["features"]:
+        if feature.get("geometry"):
+            geometry = shape(feature["geometry"]).simplify(tolerance, preserve_topology=True)
+            feature = {**feature, "geometry": mapping(geometry)}
+        features.append(feature)
+    return {**geojson, "features": features}
+
+
+def _write_arrow(data: pd.DataFrame, path: Path) -> None:
+    """
+    Write a frame as an uncompressed Arrow IPC file, so it can be memory-mapped.
+    """
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(data, preserve_index=False)
+    with pa.OSFile(str(path), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+
+def _string_dtype():
+    # Arrow-backed strings with NaN semantics, like pandas' default object strings
+    try:
+        return pd.StringDtype("pyarrow", na_value=float("nan"))  # pandas >= 2.3
+    except TypeError:
+        return pd.StringDtype("pyarrow_numpy")
+
+
+def _read_arrow(path: Path) -> pd.DataFrame:
+    """
+    Memory-map an Arrow IPC file and expose it as a frame.
+
+    Numeric columns and any plain (Arrow-backed) string columns point into
+    the mapped file rather than being copied, so processes serving the same
+    bundle share one copy of the data through the page cache. Dictionary
+    columns become categoricals.
+    """
+    import pyarrow as pa
+
+    string_dtype = _string_dtype()
+    with pa.memory_map(str(path), "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+    return table.to_pandas(split_blocks=True, types_mapper={pa.string(): string_dtype, pa.large_string(): string_dtype}.get)
+
+
+def bake_bundle(min_year: int = 2000, max_year: int = 2024, model_path: str = MODEL_PATH) -> dict:
+    """
+    Build a versioned bundle from the processed data of a year range and make
+    it the current one.
+
+    The year range is preprocessed first if its processed CSV is missing.
+
+    :param min_year: First commissioning year.
+    :param max_year: Last commissioning year.
+    :param model_path: Path of the trained prediction pipeline.
+    :return: The manifest of the new bundle.
+    """
+    from solar_germany.clients import load_blob_json
+    from solar_germany.processing import preprocess_solar_data
+    from solar_germany.spatial import SpatialIndex
+
+    print(Fore.MAGENTA + f"\n ⭐️ Baking bundle for {min_year}-{max_year}" + Style.RESET_ALL)
+
+    processed_data_path = Path(LOCAL_DATA_PATH).joinpath(f"processed_solar_data_{min_year}_{max_year}.csv")
+    if not processed_data_path.is_file():
+        preprocess_solar_data(min_year=min_year, max_year=max_year)
+    data = dictionary.read_csv(processed_data_path)
+
+    # The content hash is the data version, which keys the derived caches, so
+    # it stays the same across rebuilds of the same data. Each bake still gets
+    # its own directory, named by the bake time and the hash.
+    data_version = hashlib.sha256(pd.util.hash_pandas_object(data, index=False).to_numpy().tobytes()).hexdigest()[:12]
+    created_at = datetime.now()
+    version = f"{created_at:%Y%m%d%H%M%S}-{data_version}"
+    target_dir = bundle_dir(version)
+    partial_dir = target_dir.with_name(version + ".partial")
+    shutil.rmtree(partial_dir, ignore_errors=True)
+    partial_dir.mkdir(parents=True)
+
+    try:
+        _write_arrow(data, partial_dir.joinpath("data.arrow"))
+        dictionary.save(partial_dir.joinpath("dictionary.json"))
+        write_dataset([data], partial_dir.joinpath("data.parquet"))
+        print(f"Data: {len(data)} rows")
+
+        geography_cube(data, data_version).to_parquet(partial_dir.joinpath("cube.parquet"))
+        print("Geography cube written")
+
+        geojson = {"states": load_blob_json(BUCKET_NAME, STATES_GEOJSON_FILE)}
+        try:
+            geojson["districts"] = load_blob_json(BUCKET_NAME, DISTRICTS_GEOJSON_FILE)
+        except Exception as e:
+            print(f"District polygons not available: {str(e)}")
+
+        indexes = {}
+        for name, level_properties in (("states", STATE_PROPERTIES), ("districts", DISTRICT_PROPERTIES)):
+            if name in geojson:
+                simplified = simplify_geojson(geojson[name])
+                partial_dir.joinpath(f"{name}.geo.json").write_text(json.dumps(simplified))
+                # Index the original outlines, so lookups keep their precision
+                indexes[name] = SpatialIndex(geojson[name], level_properties)
+        with open(partial_dir.joinpath("indexes.pkl"), "wb") as file:
+            pickle.dump(indexes, file, protocol=pickle.HIGHEST_PROTOCOL)
+        print("GeoJSON and spatial indexes written")
+
+        if Path(model_path).is_file():
+            shutil.copyfile(model_path, partial_dir.joinpath("model.pkl"))
+            print("Model copied")
+        else:
+            print(Fore.YELLOW + f"Model not found at {model_path}, bundle has no model" + Style.RESET_ALL)
+
+        manifest = {
+            "version": version,
+            "data_version": data_version,
+            "created_at": created_at.isoformat(),
+            "min_year": min_year,
+            "max_year": max_year,
+            "rows": int(len(data)),
+            "files": sorted(path.name for path in partial_dir.iterdir()),
+        }
+        partial_dir.joinpath("manifest.json").write_text(json.dumps(manifest, indent=2))
+    except BaseException:
+        shutil.rmtree(partial_dir, ignore_errors=True)
+        raise
+
+    # Publish the complete bundle
+    shutil.rmtree(target_dir, ignore_errors=True)
+    os.replace(partial_dir, target_dir)
+    Path(BUNDLE_PATH).joinpath("CURRENT").write_text(version)
+
+    print(Fore.GREEN + f"✅ Bundle {version} saved to {target_dir}" + Style.RESET_ALL)
+    return manifest
+
+
+@timed("bundle_load")
+def load_bundle(version: Optional[str] = None) -> dict:
+    """
+    Load a baked bundle.
+
+    The data is memory-mapped rather than parsed, and the geography cube is
+    put into the derived-results cache under the bundle's data version.
+
+    :param version: Bundle to load; defaults to the current one.
+    :return: The manifest, data, data version, block-indexed dataset path,
+        cube, GeoJSON, spatial indexes, model and model version (None for
+        artifacts the bundle does not have).
+    :raises ValueError: If the bundle does not exist.
+    """
+    version = version or current_bundle()
+    if version is None or not bundle_dir(version).joinpath("manifest.json").is_file():
+        raise ValueError(f"Unknown bundle: {version}")
+
+    source_dir = bundle_dir(version)
+    manifest = json.loads(source_dir.joinpath("manifest.json").read_text())
+
+    if source_dir.joinpath("dictionary.json").is_file():
+        dictionary.load(source_dir.joinpath("dictionary.json"))
+    data = dictionary.encode(_read_arrow(source_dir.joinpath("data.arrow")))
+    # Bundles baked before the data version was recorded are keyed by their version
+    data_version = manifest.get("data_version", version)
+    cube = pd.read_parquet(source_dir.joinpath("cube.parquet"))
+    seed(geography_cube, data_version, cube)
+
+    def read_json(name):
+        path = source_dir.joinpath(name)
+        return json.loads(path.read_text()) if path.is_file() else None
+
+    with open(source_dir.joinpath("indexes.pkl"), "rb") as file:
+        indexes = pickle.load(file)
+
+    model = model_digest = None
+    if source_dir.joinpath("model.pkl").is_file():
+        import joblib
+
+        model = joblib.load(source_dir.joinpath("model.pkl"))
+        model_digest = model_version(source_dir.joinpath("model.pkl"))
+
+    return {
+        "manifest": manifest,
+        "data": data,
+        "data_version": data_version,
+        "dataset_path": source_dir.joinpath("data.parquet") if source_dir.joinpath("data.parquet").is_dir() else None,
+        "cube": cube,
+        "states_geojson": read_json("states.geo.json"),
+        "districts_geojson": read_json("districts.geo.json"),
+        "state_index": indexes.get("states"),
+        "district_index": indexes.get("districts"),
+        "model": model,
+        "model_version": model_digest,
+    }
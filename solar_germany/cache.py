@@ -0,0 +1,150 @@
+import sys
+import threading
+from functools import wraps
+
+import pandas as pd
+from cachetools import LRUCache
+
+from solar_germany.metrics import CACHE_LOOKUPS
+from solar_germany.params import DERIVED_CACHE_MAX_BYTES
+
+
+def sizeof(value) -> int:
+    """
+    Estimate the memory held by a cached value.
+
+    :param value: A DataFrame, Series, container of them, or a plain value.
+    :return: Approximate size in bytes.
+    """
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sizeof(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(sizeof(v) for v in value)
+    return sys.getsizeof(value)
+
+
+# One cache per process, shared by every Streamlit session (and the API).
+# Bounded by the estimated bytes of its entries, least recently used first out.
+derived_cache = LRUCache(maxsize=DERIVED_CACHE_MAX_BYTES, getsizeof=sizeof)
+_lock = threading.RLock()
+_key_locks = {}
+_stats = {"hits": 0, "misses": 0}
+_hit, _miss = CACHE_LOOKUPS.labels("derived", "hit"), CACHE_LOOKUPS.labels("derived", "miss")
+
+
+def memoize(func):
+    """
+    Memoize a function of the form ``func(data, data_version, *filters)``.
+
+    Results are keyed by the function name, the dataset version and the filter
+    values; the frame itself is never hashed. Cached results are shared across
+    sessions and must be treated as read-only by callers.
+    """
+    @wraps(func)
+    def wrapper(data, data_version, *args, **kwargs):
+        key = (func.__name__, data_version, args, tuple(sorted(kwargs.items())))
+        with _lock:
+            try:
+                value = derived_cache[key]
+                _stats["hits"] += 1
+                _hit.inc()
+                return value
+            except KeyError:
+                _stats["misses"] += 1
+                _miss.inc()
+
+        value = func(data, data_version, *args, **kwargs)
+
+        with _lock:
+            try:
+                derived_cache[key] = value
+            except ValueError:
+                pass  # Larger than the whole cache, don't keep it
+        return value
+
+    return wrapper
+
+
+def seed(func, data_version: str, value, *args, **kwargs) -> None:
+    """
+    Store a precomputed result of a memoized function, e.g. one loaded from a
+    baked bundle, so the first caller does not have to compute it.
+
+    :param func: The memoized function.
+    :param data_version: Version string of the dataset the value belongs to.
+    :param value: The result of ``func(data, data_version, *args, **kwargs)``.
+    """
+    key = (func.__name__, data_version, args, tuple(sorted(kwargs.items())))
+    with _lock:
+        try:
+            derived_cache[key] = value
+        except ValueError:
+            pass
+
+
+def get_or_compute(key: tuple, compute):
+    """
+    Return the value cached under `key`, computing it with `compute()` on a
+    miss. Concurrent callers asking for the same missing key wait for the
+    first one instead of computing it again.
+
+    :param key: Cache key; must not collide with `memoize` keys.
+    :param compute: Zero-argument function producing the value.
+    :return: The cached or freshly computed value.
+    """
+    with _lock:
+        try:
+            value = derived_cache[key]
+            _stats["hits"] += 1
+            _hit.inc()
+            return value
+        except KeyError:
+            key_lock = _key_locks.setdefault(key, threading.Lock())
+
+    with key_lock:
+        with _lock:
+            try:
+                value = derived_cache[key]
+                _stats["hits"] += 1
+                _hit.inc()
+                return value
+            except KeyError:
+                _stats["misses"] += 1
+                _miss.inc()
+
+        try:
+            value = compute()
+            with _lock:
+                try:
+                    derived_cache[key] = value
+                except ValueError:
+                    pass  # Larger than the whole cache, don't keep it
+        finally:
+            with _lock:
+                _key_locks.pop(key, None)
+    return value
+
+
+def cache_info() -> dict:
+    """
+    Report the effectiveness and size of the derived-results cache.
+
+    :return: Hits, misses, number of entries and bytes currently held.
+    """
+    with _lock:
+        return {
+            **_stats,
+            "entries": len(derived_cache),
+            "bytes": derived_cache.currsize,
+            "max_bytes": derived_cache.maxsize,
+        }
+
+
+def clear_cache() -> None:
+    """Drop every cached derived result."""
+    with _lock:
+        derived_cache.clear()
@@ -0,0 +1,97 @@
+import argparse
+import os
+import sys
+
+from solar_germany.params import CHUNK_SIZE, EXECUTION_MODE, MODEL_PATH, PREDICT_CHUNK_SIZE
+
+
+# Headless entry point: `python -m solar_germany <command>`.
+#
+#   ingest   query and preprocess a year range (same as the app's sidebar button)
+#   build    build derived artifacts: the geography cube, the block-indexed
+#            dataset, vector tiles or a bundle
+#   predict  score a CSV of candidate installations in parallel
+#
+# Every command only imports what it needs, so `--help` stays instant.
+
+BUILD_TARGETS = ["cube", "dataset", "tiles", "bundle"]
+
+
+def ingest(args: argparse.Namespace) -> None:
+    from solar_germany.processing import preprocess_solar_data
+
+    preprocess_solar_data(
+        min_year=args.min_year,
+        max_year=args.max_year,
+        chunk_size=args.chunk_size,
+        execution_mode=args.mode,
+    )
+
+
+def build(args: argparse.Namespace) -> None:
+    for target in args.targets:
+        if target == "cube":
+            from solar_germany.processing import build_geography_cube
+
+            build_geography_cube(args.min_year, args.max_year, execution_mode=args.mode)
+        elif target == "dataset":
+            from solar_germany.processing import build_dataset
+
+            build_dataset(args.min_year, args.max_year)
+        elif target == "tiles":
+            from solar_germany.tiles import build_tiles
+
+            build_tiles(args.min_year, args.max_year)
+        elif target == "bundle":
+            from solar_germany.bundle import bake_bundle
+
+            bake_bundle(args.min_year, args.max_year, model_path=args.model)
+
+
+def predict(args: argparse.Namespace) -> None:
+    from solar_germany.prediction import predict_file
+
+    predict_file(args.input, args.output, model_path=args.model, chunk_size=args.chunk_size, workers=args.workers)
+
+
+def add_year_range(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--min-year", type=int, default=2000, help="first commissioning year (default: 2000)")
+    parser.add_argument("--max-year", type=int, default=2024, help="last commissioning year (default: 2024)")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="solar_germany", description="SolarGermany batch jobs")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest_command = commands.add_parser("ingest", help="query and preprocess a year range")
+    add_year_range(ingest_command)
+    ingest_command.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="rows per BigQuery page")
+    ingest_command.add_argument("--mode", choices=["pandas", "dask"], default=EXECUTION_MODE, help="execution mode")
+    ingest_command.set_defaults(func=ingest)
+
+    build_command = commands.add_parser("build", help="build derived artifacts from processed data")
+    build_command.add_argument("targets", nargs="+", choices=BUILD_TARGETS, help="artifacts to build, in order")
+    add_year_range(build_command)
+    build_command.add_argument("--mode", choices=["pandas", "dask"], default=EXECUTION_MODE, help="execution mode for the cube")
+    build_command.add_argument("--model", default=MODEL_PATH, help="prediction pipeline to bundle")
+    build_command.set_defaults(func=build)
+
+    predict_command = commands.add_parser("predict", help="score a CSV of candidate installations")
+    predict_command.add_argument("input", help="CSV with the model's input columns")
+    predict_command.add_argument("output", help="CSV to write, the input plus predicted columns")
+    predict_command.add_argument("--model", default=MODEL_PATH, help="prediction pipeline")
+    predict_command.add_argument("--chunk-size", type=int, default=PREDICT_CHUNK_SIZE, help="rows per chunk")
+    predict_command.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes")
+    predict_command.set_defaults(func=predict)
+
+    return parser
+
+
+def main(argv: list = None) -> int:
+    args = build_parser().parse_args(argv)
+    args.func(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
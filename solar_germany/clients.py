@@ -0,0 +1,93 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from solar_germany.params import GCP_PROJECT, HTTP_POOL_SIZE, STREAM_CHUNK_SIZE
+from solar_germany.streaming import PrefetchReader, load_json
+
+
+# One set of Google Cloud clients per process.
+#
+# The clients are thread-safe and share a single authorized HTTP session whose
+# connection pool is sized for the process' concurrency, instead of every call
+# building a new client (and a new TLS connection) of its own.
+
+_io_executor = ThreadPoolExecutor(max_workers=HTTP_POOL_SIZE, thread_name_prefix="gcp-io")
+_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def http_session():
+    """
+    :return: The authorized HTTP session shared by all Google Cloud clients.
+    """
+    import google.auth
+    from google.auth.transport.requests import AuthorizedSession
+    from requests.adapters import HTTPAdapter
+
+    credentials, _ = google.auth.default(scopes=["https://www.googleapis.com/auth/cloud-platform"])
+    session = AuthorizedSession(credentials)
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+    session.mount("https://", adapter)
+    return session
+
+
+def storage_client():
+    """
+    :return: The shared Google Cloud Storage client.
+    """
+    with _lock:
+        return _storage_client()
+
+
+def bigquery_client(project: str = GCP_PROJECT):
+    """
+    :param project: GCP project to bill queries to.
+    :return: The shared BigQuery client for that project.
+    """
+    with _lock:
+        return _bigquery_client(project)
+
+
+@lru_cache(maxsize=None)
+def _storage_client():
+    from google.cloud import storage
+
+    return storage.Client(project=GCP_PROJECT, _http=http_session())
+
+
+@lru_cache(maxsize=None)
+def _bigquery_client(project: str):
+    from google.cloud import bigquery
+
+    return bigquery.Client(project=project, _http=http_session())
+
+
+def get_blob(bucket_name: str, blob_name: str):
+    """
+    :return: A handle on a GCS object, using the shared client.
+    """
+    return storage_client().bucket(bucket_name).blob(blob_name)
+
+
+def open_blob(bucket_name: str, blob_name: str) -> PrefetchReader:
+    """
+    Open a GCS object for streaming: it is downloaded in ranged chunks on the
+    shared I/O pool, ahead of the reader (see solar_germany.streaming).
+
+    :param bucket_name: Name of the GCS bucket.
+    :param blob_name: Name of the object in the bucket.
+    :return: A binary file-like reader; close it when done.
+    """
+    source = get_blob(bucket_name, blob_name).open("rb", chunk_size=STREAM_CHUNK_SIZE)
+    return PrefetchReader(source, executor=_io_executor)
+
+
+def load_blob_json(bucket_name: str, blob_name: str) -> dict:
+    """
+    Stream and parse a JSON object (e.g. a GeoJSON FeatureCollection) from GCS.
+
+    :return: The parsed object.
+    """
+    with open_blob(bucket_name, blob_name) as stream:
+        return load_json(stream)
@@ -0,0 +1,56 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from solar_germany.params import CPU_QUEUE_LIMIT, CPU_WORKERS
+
+
+class Overloaded(Exception):
+    """Raised when a BoundedExecutor has no room for another task."""
+
+
+class BoundedExecutor:
+    """
+    Run CPU-heavy work (pandas filtering, serialization) off the event loop.
+
+    At most `max_workers` tasks run at once and at most `max_queue` more wait
+    for a worker. Anything beyond that is rejected straight away with
+    `Overloaded`, so a burst of slow requests turns into fast 503s instead of
+    an ever-growing queue that starves every other request on the instance.
+    """
+
+    def __init__(self, max_workers: int = CPU_WORKERS, max_queue: int = CPU_QUEUE_LIMIT):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="cpu")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    async def run(self, func, *args):
+        """
+        Run `func(*args)` on a worker thread and await its result.
+
+        :raises Overloaded: If all workers are busy and the queue is full.
+        """
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                raise Overloaded(f"{self._in_flight} tasks already in flight")
+            self._in_flight += 1
+
+        try:
+            future = self._executor.submit(func, *args)
+        except BaseException:
+            self._release()
+            raise
+        # A task counts until its thread is done with it, even if the awaiting
+        # request is cancelled (e.g. the client disconnects) while it runs
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def _release(self, future=None) -> None:
+        with self._lock:
+            self._in_flight -= 1
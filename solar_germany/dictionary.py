@@ -0,0 +1,135 @@
+import json
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+from solar_germany.params import STRING_COLUMNS
+
+
+# Shared dictionary encoding of the repeated string columns.
+#
+# Geography and category strings (State, AdministrativeRegion, City and the
+# category columns) repeat across millions of rows. In memory they are kept
+# as pandas categoricals whose categories come from one process-wide
+# dictionary per column: every value gets a compact integer code the first
+# time it is seen and keeps it, so every frame encoded in the process uses
+# the same codes. Equality and `isin` filters then compare integer codes
+# instead of Python strings, and a column costs 1-2 bytes per row.
+#
+# The dictionary only grows; values are appended in sorted order per batch,
+# so a dictionary learnt from one dataset is in lexical order. Bundles store
+# it (dictionary.json) so a loaded bundle keeps the codes it was baked with.
+
+CATEGORY_COLUMNS = STRING_COLUMNS
+
+_lock = threading.Lock()
+_values = {column: [] for column in CATEGORY_COLUMNS}
+_codes = {column: {} for column in CATEGORY_COLUMNS}
+_dtypes = {}
+
+
+def _append(column: str, values) -> None:
+    # Caller holds _lock; values not in the dictionary yet get the next codes
+    for value in values:
+        if value not in _codes[column]:
+            _codes[column][value] = len(_values[column])
+            _values[column].append(value)
+            _dtypes.pop(column, None)
+
+
+def learn(frame: pd.DataFrame) -> None:
+    """
+    Add the unseen values of a frame's category columns to the dictionary.
+    """
+    for column in CATEGORY_COLUMNS:
+        if column not in frame:
+            continue
+        series = frame[column]
+        values = series.cat.categories if isinstance(series.dtype, pd.CategoricalDtype) else series.dropna().unique()
+        with _lock:
+            _append(column, sorted((value for value in set(values) if value not in _codes[column]), key=str))
+
+
+def dtype(column: str) -> pd.CategoricalDtype:
+    """
+    :return: The categorical dtype holding the dictionary of a column.
+    """
+    with _lock:
+        if column not in _dtypes:
+            _dtypes[column] = pd.CategoricalDtype(list(_values[column]))
+        return _dtypes[column]
+
+
+def encode(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Dictionary-encode the category columns of a frame.
+
+    :param frame: Rows with string or categorical category columns.
+    :return: The frame with those columns as categoricals over the shared dictionary.
+    """
+    learn(frame)
+    encoded = {}
+    for column in CATEGORY_COLUMNS:
+        if column not in frame:
+            continue
+        series, target = frame[column], dtype(column)
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            if not series.cat.categories.equals(target.categories):
+                encoded[column] = series.cat.set_categories(target.categories)
+        else:
+            encoded[column] = series.astype(target)
+    return frame.assign(**encoded) if encoded else frame
+
+
+def decode(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    :return: The frame with categorical columns turned back into plain values
+        (e.g. for the prediction pipeline, which encodes strings itself).
+    """
+    decoded = {
+        column: frame[column].astype(frame[column].cat.categories.dtype)
+        for column in frame.columns
+        if isinstance(frame[column].dtype, pd.CategoricalDtype)
+    }
+    return frame.assign(**decoded) if decoded else frame
+
+
+def decode_index(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    :return: The frame with categorical index levels turned back into plain
+        values, so it aligns with frames built from other dictionaries.
+    """
+    index = frame.index
+    if isinstance(index, pd.MultiIndex):
+        levels = [level.astype(level.categories.dtype) if isinstance(level, pd.CategoricalIndex) else level
+                  for level in (index.get_level_values(i) for i in range(index.nlevels))]
+        return frame.set_axis(pd.MultiIndex.from_arrays(levels, names=index.names), axis=0)
+    if isinstance(index, pd.CategoricalIndex):
+        return frame.set_axis(index.astype(index.categories.dtype), axis=0)
+    return frame
+
+
+def read_csv(file_path, **kwargs) -> pd.DataFrame:
+    """
+    Read a processed CSV straight into encoded category columns, without
+    materializing a Python string per row.
+    """
+    dtypes = {column: "category" for column in CATEGORY_COLUMNS}
+    return encode(pd.read_csv(file_path, dtype={**dtypes, **kwargs.pop("dtype", {})}, **kwargs))
+
+
+def save(path: Path) -> None:
+    with _lock:
+        Path(path).write_text(json.dumps(_values, ensure_ascii=False))
+
+
+def load(path: Path) -> None:
+    """
+    Learn a saved dictionary, keeping its order for values not seen yet.
+    """
+    saved = json.loads(Path(path).read_text())
+    with _lock:
+        for column, values in saved.items():
+            if column in _codes:
+                _append(column, values)
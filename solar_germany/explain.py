@@ -0,0 +1,195 @@
+import copy
+import threading
+
+import numpy as np
+import pandas as pd
+from cachetools import TTLCache
+
+from solar_germany.metrics import CACHE_LOOKUPS, MODEL_LATENCY, MODEL_ROWS
+from solar_germany.params import (
+    EXPLANATION_CACHE_SIZE,
+    MODEL_FEATURES,
+    MODEL_TARGETS,
+    PREDICTION_CACHE_TTL,
+    PREDICTION_KEY_DECIMALS,
+    SENSITIVITY_FACTORS,
+    SENSITIVITY_FEATURES,
+)
+from solar_germany.prediction import canonical_features, model_input
+
+
+# Explanations of forecasts.
+#
+# For a configuration, `explain_cached` returns
+#
+#   contributions  how much each input moves each prediction away from the
+#                  model's base value (XGBoost's native SHAP values, exact
+#                  for tree models; one-hot columns are summed back into the
+#                  input they encode)
+#   sensitivity    the predictions with one of SENSITIVITY_FEATURES scaled by
+#                  each of SENSITIVITY_FACTORS, the other inputs unchanged
+#
+# Every row of a request, the configurations and all their sweep points, is
+# preprocessed once and scored by a single `pred_contribs` call per booster.
+# A row's prediction is its base value plus its contributions, so the sweeps
+# come out of that same call. Results are cached like predictions: per model
+# version and canonical configuration.
+
+explanation_cache = TTLCache(maxsize=EXPLANATION_CACHE_SIZE, ttl=PREDICTION_CACHE_TTL)
+_cache_lock = threading.Lock()
+_hit, _miss = CACHE_LOOKUPS.labels("explanation", "hit"), CACHE_LOOKUPS.labels("explanation", "miss")
+
+
+def _model_parts(model) -> tuple:
+    """
+    Split a fitted pipeline into its preprocessing and its boosters.
+
+    :return: The preprocessing steps (None if there are none) and a list of
+        (booster, iteration range) pairs, one per target or a single
+        multi-output one.
+    :raises ValueError: If the model has no XGBoost regressor.
+    """
+    steps = getattr(model, "steps", None)
+    preprocess, regressor = (model[:-1] if len(steps) > 1 else None, steps[-1][1]) if steps else (None, model)
+    # MultiOutputRegressor fits one regressor per target
+    estimators = getattr(regressor, "estimators_", [regressor])
+    if not all(hasattr(estimator, "get_booster") for estimator in estimators):
+        raise ValueError("Only XGBoost models can be explained.")
+
+    boosters = []
+    for estimator in estimators:
+        # Score with the trees `predict` uses, which stop at the best iteration after early stopping
+        try:
+            iteration_range = (0, estimator.best_iteration + 1)
+        except AttributeError:
+            iteration_range = (0, 0)
+        boosters.append((estimator.get_booster(), iteration_range))
+    return preprocess, boosters
+
+
+def _source_feature(column: str) -> str:
+    # "cat__Administrative Region_Oberbayern" -> "Administrative Region"
+    name = column.split("__", 1)[-1]
+    for feature in sorted(MODEL_FEATURES, key=len, reverse=True):
+        if name == feature or name.startswith(feature + "_"):
+            return feature
+    return name
+
+
+def contributions(model, frame: pd.DataFrame) -> tuple:
+    """
+    SHAP contributions of every input column to every prediction.
+
+    :param model: The fitted pipeline.
+    :param frame: Candidate installations.
+    :return: An array [row, target, feature] of contributions, with the base
+        value as its last feature, and the feature names (MODEL_FEATURES
+        first, then any model column not traced back to one of them).
+    """
+    import xgboost
+
+    preprocess, boosters = _model_parts(model)
+    inputs = model_input(frame)
+    with MODEL_LATENCY.time():
+        matrix = preprocess.transform(inputs) if preprocess is not None else inputs
+        shap = []
+        for booster, iteration_range in boosters:
+            values = booster.predict(xgboost.DMatrix(matrix, enable_categorical=True),
+                                     pred_contribs=True, iteration_range=iteration_range)
+            shap.append(values[:, None, :] if values.ndim == 2 else values)
+        shap = np.concatenate(shap, axis=1)
+    MODEL_ROWS.inc(len(frame))
+
+    if preprocess is None:
+        columns = list(inputs.columns)
+    else:
+        try:
+            columns = list(preprocess.get_feature_names_out())
+        except (AttributeError, ValueError):
+            columns = boosters[0][0].feature_names or [f"f{i}" for i in range(shap.shape[2] - 1)]
+
+    # Sum the model's columns into the inputs they were derived from
+    sources = [_source_feature(str(column)) for column in columns]
+    features = MODEL_FEATURES + [source for source in dict.fromkeys(sources) if source not in MODEL_FEATURES]
+    grouping = np.zeros((len(columns) + 1, len(features) + 1))
+    grouping[np.arange(len(columns)), [features.index(source) for source in sources]] = 1
+    grouping[-1, -1] = 1
+    return shap @ grouping, features
+
+
+def sweep_values(feature: str, value: float) -> list:
+    """
+    :return: The values `feature` is swept over around `value`: `value` times
+        each of SENSITIVITY_FACTORS, whole numbers for NumberOfModules.
+    """
+    values = np.asarray(SENSITIVITY_FACTORS) * value
+    values = np.round(values) if feature == "NumberOfModules" else np.round(values, PREDICTION_KEY_DECIMALS)
+    return sorted(set(float(v) + 0.0 for v in values))
+
+
+def _explain_rows(configurations: list) -> tuple:
+    # The rows to score for each configuration: itself first, then its sweep points
+    rows, sweeps = [], []
+    for features in configurations:
+        points = []
+        rows.append(features)
+        for feature in SENSITIVITY_FEATURES:
+            position = MODEL_FEATURES.index(feature)
+            if features[position] is None:
+                continue
+            for value in sweep_values(feature, features[position]):
+                points.append((feature, value, len(rows)))
+                rows.append(features[:position] + (value,) + features[position + 1:])
+        sweeps.append(points)
+    return rows, sweeps
+
+
+def explain_cached(model, version: str, installations: list) -> list:
+    """
+    Explain the predictions for installations, answering repeated
+    configurations from the explanation cache. The misses and all their
+    sweep points are scored in one batch.
+
+    :param model: The fitted pipeline.
+    :param version: Version of the model (see prediction.model_version).
+    :param installations: Feature values by column, one dict per installation.
+    :return: One dict per installation, in order, with the "prediction",
+        "base_value" and "contributions" per target and the "sensitivity"
+        sweeps per feature.
+    """
+    keys = [(version, canonical_features(features)) for features in installations]
+    with _cache_lock:
+        results = {key: explanation_cache.get(key) for key in keys}
+    misses = [key for key, result in results.items() if result is None]
+    missed = sum(1 for key in keys if results[key] is None)
+    _miss.inc(missed)
+    _hit.inc(len(keys) - missed)
+
+    if misses:
+        rows, sweeps = _explain_rows([features for _, features in misses])
+        shap, features = contributions(model, pd.DataFrame(rows, columns=MODEL_FEATURES))
+        predictions = shap.sum(axis=2)
+
+        computed, start = {}, 0
+        for key, points in zip(misses, sweeps):
+            sensitivity = {feature: [] for feature in SENSITIVITY_FEATURES}
+            for feature, value, row in points:
+                sensitivity[feature].append(
+                    {feature: value, **{target: float(p) for target, p in zip(MODEL_TARGETS, predictions[row])}}
+                )
+            computed[key] = {
+                "prediction": {target: float(p) for target, p in zip(MODEL_TARGETS, predictions[start])},
+                "base_value": {target: float(shap[start, t, -1]) for t, target in enumerate(MODEL_TARGETS)},
+                "contributions": {
+                    target: {feature: float(shap[start, t, f]) for f, feature in enumerate(features)}
+                    for t, target in enumerate(MODEL_TARGETS)
+                },
+                "sensitivity": sensitivity,
+            }
+            start += 1 + len(points)
+        results.update(computed)
+        with _cache_lock:
+            explanation_cache.update(computed)
+
+    # Copies, so callers cannot alter the cached results
+    return [copy.deepcopy(results[key]) for key in keys]
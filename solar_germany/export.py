@@ -0,0 +1,79 @@
+from typing import Optional
+
+import pandas as pd
+
+
+# Tabular response formats for bulk export.
+#
+# Arrow IPC and Parquet are written straight from the frame's columns and
+# returned as a memoryview over the Arrow buffer, so the payload is never
+# converted to per-cell Python objects (as JSON records are) or copied again.
+
+JSON = "application/json"
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+PARQUET = "application/vnd.apache.parquet"
+
+FORMATS = {"json": JSON, "arrow": ARROW_STREAM, "parquet": PARQUET}
+
+
+def negotiate(accept: Optional[str], format: Optional[str] = None) -> str:
+    """
+    Pick the response media type for a tabular endpoint.
+
+    :param accept: The request's Accept header.
+    :param format: Optional explicit override: "json", "arrow" or "parquet".
+    :return: One of JSON, ARROW_STREAM or PARQUET; JSON if nothing else fits.
+    :raises ValueError: If `format` is not a supported format name.
+    """
+    if format:
+        if format not in FORMATS:
+            raise ValueError(f"Unsupported format {format!r}, use one of {', '.join(FORMATS)}")
+        return FORMATS[format]
+
+    preferences = []
+    for position, item in enumerate((accept or "").split(",")):
+        media_type, *params = [part.strip() for part in item.split(";")]
+        quality = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        # q=0 means "not acceptable"; a malformed quality is treated the same
+        if quality > 0:
+            preferences.append((-quality, position, media_type))
+
+    for _, _, media_type in sorted(preferences):
+        if media_type in FORMATS.values():
+            return media_type
+    return JSON
+
+
+def serialize(frame: pd.DataFrame, media_type: str):
+    """
+    Encode a frame in the negotiated format.
+
+    :param frame: Rows to return.
+    :param media_type: One of JSON, ARROW_STREAM or PARQUET.
+    :return: The encoded payload (bytes or a memoryview over an Arrow buffer).
+    """
+    if media_type == JSON:
+        return frame.to_json(orient="records").encode()
+
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    sink = pa.BufferOutputStream()
+
+    if media_type == ARROW_STREAM:
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+    elif media_type == PARQUET:
+        import pyarrow.parquet as pq
+
+        pq.write_table(table, sink, compression="zstd")
+    else:
+        raise ValueError(f"Unsupported media type {media_type!r}")
+
+    return memoryview(sink.getvalue())
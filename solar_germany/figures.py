@@ -0,0 +1,302 @@
+from functools import wraps
+
+import pandas as pd
+
+from solar_germany import approximate, views
+from solar_germany.analytics import yearly_series
+from solar_germany.cache import get_or_compute
+
+
+# Serialized chart payloads for the dashboard.
+#
+# Every chart of the app is built here and cached as plotly figure JSON in the
+# shared derived-results cache, keyed by (chart, dataset version, filters).
+# A figure is constructed and serialized at most once per key, however many
+# sessions ask for it; a rerun only decodes the payload (see `from_payload`).
+# plotly itself is imported on first use, so this module stays light.
+
+COLOR_SCALE = ["white", "gold", "orange"]
+
+# Inputs that are fixed for a dataset version and left out of the cache keys
+UNKEYED_INPUTS = ("geojson",)
+
+
+def figure_cache(func):
+    """
+    Cache the JSON of a figure builder ``func(data, data_version, *filters, **kwargs)``.
+
+    The key is the builder's name, the dataset version, the filters and the
+    keyword arguments other than UNKEYED_INPUTS.
+    """
+    @wraps(func)
+    def wrapper(data, data_version, *filters, **kwargs):
+        keyed = tuple(sorted((name, value) for name, value in kwargs.items() if name not in UNKEYED_INPUTS))
+        key = ("figure", func.__name__, data_version, filters, keyed)
+        return get_or_compute(key, lambda: func(data, data_version, *filters, **kwargs).to_json())
+
+    return wrapper
+
+
+def from_payload(payload: str):
+    """
+    Decode a cached payload into a figure, without re-validating it.
+
+    :param payload: Figure JSON produced by one of the builders below.
+    :return: A plotly Figure.
+    """
+    import plotly.io as pio
+
+    return pio.from_json(payload, skip_invalid=True)
+
+
+@figure_cache
+def state_map(data: pd.DataFrame, data_version: str, year: int, state: str, geojson: dict = None):
+    """
+    Choropleth of the number of modules per state, with the selected state outlined.
+
+    :param year: Selected commissioning year.
+    :param state: Selected state.
+    :param geojson: State polygons, with the state name in `properties.name`.
+    """
+    import plotly.express as px
+
+    df_grouped = views.state_insights(data, data_version, year, state)["df_grouped"]
+
+    # Create a choropleth map with a solar-themed color scale
+    fig = px.choropleth(
+        df_grouped,
+        geojson=geojson,
+        locations='State',
+        featureidkey='properties.name',
+        color='NumberOfModules',
+        color_continuous_scale=COLOR_SCALE,
+        title=f"Number of Modules by State in Germany (Year: {year})"
+    )
+
+    # Adjust map layout for stability and visibility
+    fig.update_geos(
+        fitbounds="locations",
+        visible=True,
+        projection_scale=1,
+        countrycolor="white",
+        showcoastlines=False,
+        showframe=False,
+        showland=True,
+        landcolor="white",
+        showlakes=False,
+        showrivers=False,
+        showcountries=False,
+        subunitcolor="white",
+        showsubunits=False
+    )
+
+    fig.update_layout(
+        margin={"r": 0, "t": 50, "l": 0, "b": 0},
+        height=700,
+        dragmode=False,
+        hovermode=False,
+    )
+
+    # Highlight the selected state
+    if state in df_grouped['State'].values:
+        state_value = df_grouped.loc[df_grouped['State'] == state, 'NumberOfModules'].values[0]
+
+        highlighted_geojson = {
+            "type": "FeatureCollection",
+            "features": [
+                feature
+                for feature in geojson["features"]
+                if feature["properties"]["name"] == state
+            ]
+        }
+
+        # Overlay the selected state using its corresponding color from the map's scale
+        fig.add_choropleth(
+            geojson=highlighted_geojson,
+            locations=[state],
+            featureidkey="properties.name",
+            z=[state_value],  # Match the value from the data
+            colorscale=COLOR_SCALE,
+            zmin=df_grouped['NumberOfModules'].min(),  # Min value for normalization
+            zmax=df_grouped['NumberOfModules'].max(),  # Max value for normalization
+            marker=dict(line=dict(width=3, color="blue")),  # Blue outline for the selected state
+            showscale=False  # Hide the additional scale for this overlay
+        )
+    return fig
+
+
+@figure_cache
+def state_trend(data: pd.DataFrame, data_version: str, state: str):
+    """
+    Annual and cumulative number of modules of Germany and a state, on a log scale.
+
+    :param state: Selected state.
+    """
+    import plotly.graph_objects as go
+
+    cumulative = {'CumulativeMetric': 'CumulativeModules'}
+    germany_data = yearly_series(data, data_version, 'NumberOfModules').rename(columns=cumulative)
+    state_data_full = yearly_series(data, data_version, 'NumberOfModules', (state,)).rename(columns=cumulative)
+
+    fig = go.Figure()
+
+    # Germany's data (Annual Number of Modules and Cumulative Trend)
+    fig.add_trace(go.Bar(
+        x=germany_data['CommissioningYear'],
+        y=germany_data['NumberOfModules'],
+        name='Germany - Annual Number of Modules',
+        marker_color='Orange'
+    ))
+    fig.add_trace(go.Scatter(
+        x=germany_data['CommissioningYear'],
+        y=germany_data['CumulativeModules'],
+        mode='lines',
+        name='Germany - Cumulative Trend',
+        line=dict(color='Orange', width=2)
+    ))
+
+    # State's data (Annual Number of Modules and Cumulative Trend)
+    fig.add_trace(go.Bar(
+        x=state_data_full['CommissioningYear'],
+        y=state_data_full['NumberOfModules'],
+        name=f'{state} - Annual Number of Modules',
+        marker_color='Gold'
+    ))
+    fig.add_trace(go.Scatter(
+        x=state_data_full['CommissioningYear'],
+        y=state_data_full['CumulativeModules'],
+        mode='lines',
+        name=f'{state} - Cumulative Trend',
+        line=dict(color='Gold', width=2)
+    ))
+
+    fig.update_layout(
+        title=f"Number of Modules Over Time: Germany vs. {state}",
+        xaxis_title="Year",
+        yaxis_title="Number of Modules",
+        barmode='overlay',  # Overlay bars for better comparison
+        plot_bgcolor='white',
+        template='plotly_white',
+        dragmode=False,
+        hovermode=False,
+        yaxis=dict(
+            type='log',  # Apply logarithmic scale to y-axis
+            autorange=True,
+        )
+    )
+    return fig
+
+
+@figure_cache
+def distribution_pie(data: pd.DataFrame, data_version: str, year: int, state: str,
+                     administrative_region: str, column: str, estimate: bool = False):
+    """
+    Donut chart of the installations of a region per category.
+
+    :param year: Selected commissioning year.
+    :param state: Selected state.
+    :param administrative_region: Selected administrative region.
+    :param column: "FeedInType" or "Location".
+    :param estimate: Draw it from the stratified sample (see `approximate`)
+        instead of the exact counts.
+    """
+    import plotly.express as px
+
+    if estimate:
+        summary = approximate.estimate_category_counts(
+            data, data_version, column, years=(year, year), states=(state,), regions=(administrative_region,)
+        )
+    else:
+        summary = views.category_counts(data, data_version, year, state, administrative_region, column)
+
+    label = "Feed-In Type" if column == 'FeedInType' else column
+    fig = px.pie(
+        summary,
+        names=column,
+        values='Count',
+        title=f"{label} Distribution for {administrative_region}" + (" (estimate)" if estimate else ""),
+        hole=0.4,
+        color_discrete_sequence=px.colors.sequential.Sunset
+    )
+    fig.update_traces(textinfo='percent', textfont_size=14)
+    fig.update_layout(
+        legend=dict(yanchor="top", y=0.99, xanchor="left", x=0.01 if column == 'FeedInType' else 1.0),
+        template="plotly_white",  # Set template for a clean look
+        margin=dict(t=40, b=40, l=40, r=40),  # Adjust margins
+        showlegend=True,  # Keep legend visible
+        hovermode=False,  # Disable hover interaction
+        dragmode=False  # Disable zoom and pan
+    )
+    return fig
+
+
+@figure_cache
+def district_trend(data: pd.DataFrame, data_version: str, state: str, administrative_region: str,
+                   city: str, metric: str):
+    """
+    Annual and cumulative values of a metric for a district, on a log scale.
+
+    :param state: Selected state.
+    :param administrative_region: Selected administrative region.
+    :param city: Selected district.
+    :param metric: "NumberOfModules", "GrossPower" or "NetRatedPower".
+    """
+    import plotly.graph_objects as go
+
+    city_data = yearly_series(data, data_version, metric, (state, administrative_region, city))
+
+    fig = go.Figure()
+
+    # City bar chart for the selected metric
+    fig.add_trace(go.Bar(
+        x=city_data['CommissioningYear'],
+        y=city_data[metric],
+        name=f'{city} - Annual {metric}',
+        marker=dict(
+            color=city_data[metric],
+            colorscale='sunset_r',
+            colorbar=dict(title=metric)
+        )
+    ))
+
+    # Add cumulative trend as a line
+    fig.add_trace(go.Scatter(
+        x=city_data['CommissioningYear'],
+        y=city_data['CumulativeMetric'],
+        mode='lines',
+        name=f'{city} - Cumulative Trend',
+        line=dict(color='black', width=2)
+    ))
+
+    fig.update_layout(
+        title=f"{metric} Over Time: {city}",
+        xaxis_title="Year",
+        yaxis_title=metric,
+        barmode='stack',
+        plot_bgcolor='white',
+        template='plotly_white',
+        dragmode=False,
+        hovermode=False,
+        xaxis=dict(
+            tickmode='array',
+            tickvals=city_data['CommissioningYear'],
+            ticktext=[str(year) for year in city_data['CommissioningYear']]
+        ),
+        yaxis=dict(
+            type='log',  # Logarithmic scale
+            autorange=True,
+        ),
+        coloraxis_colorbar=dict(
+            title=metric,
+            tickvals=[min(city_data[metric]), max(city_data[metric])],
+            ticktext=[f"{min(city_data[metric]):.2f}", f"{max(city_data[metric]):.2f}"]
+        ),
+        legend=dict(
+            orientation='h',
+            yanchor="bottom",
+            y=1.02,
+            xanchor="center",
+            x=0.5
+        )
+    )
+    return fig
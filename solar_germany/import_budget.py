@@ -0,0 +1,88 @@
+import json
+import subprocess
+import sys
+
+from colorama import Fore, Style
+
+from solar_germany.params import IMPORT_BUDGET_SECONDS
+
+
+# Import-time budget of the data layer.
+#
+# Each module is imported in a fresh interpreter, timed, and checked for
+# heavy UI, web, cloud and model dependencies, which must only be imported
+# lazily where they are used. Run with `make import_budget`; exits non-zero
+# if a module is over budget or imports one of HEAVY_MODULES.
+
+CORE_MODULES = [
+    "solar_germany.aggregates",
+    "solar_germany.analytics",
+    "solar_germany.approximate",
+    "solar_germany.bundle",
+    "solar_germany.cache",
+    "solar_germany.cli",
+    "solar_germany.clients",
+    "solar_germany.concurrency",
+    "solar_germany.dictionary",
+    "solar_germany.explain",
+    "solar_germany.export",
+    "solar_germany.figures",
+    "solar_germany.jobs",
+    "solar_germany.metrics",
+    "solar_germany.prediction",
+    "solar_germany.processing",
+    "solar_germany.sketches",
+    "solar_germany.snapshots",
+    "solar_germany.spatial",
+    "solar_germany.storage",
+    "solar_germany.streaming",
+    "solar_germany.tiles",
+    "solar_germany.validation",
+    "solar_germany.views",
+]
+HEAVY_MODULES = ["streamlit", "fastapi", "google.cloud", "dask", "shapely", "plotly", "xgboost", "joblib", "sklearn"]
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "heavy": [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+
+def measure(module: str) -> dict:
+    """
+    Import a module in a fresh interpreter.
+
+    :param module: Dotted module name.
+    :return: The import time in seconds and the heavy modules it pulled in.
+    """
+    output = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def check_import_budget(modules: list = CORE_MODULES, budget: float = IMPORT_BUDGET_SECONDS) -> bool:
+    """
+    Measure every module against the budget and report the results.
+
+    :return: True if every module is within budget and imports nothing heavy.
+    """
+    ok = True
+    for module in modules:
+        result = measure(module)
+        within = result["seconds"] <= budget and not result["heavy"]
+        ok &= within
+        color = Fore.GREEN if within else Fore.RED
+        heavy = f" (imports {', '.join(result['heavy'])})" if result["heavy"] else ""
+        print(color + f"{result['seconds']:6.3f}s {module}{heavy}" + Style.RESET_ALL)
+
+    print((Fore.GREEN + "✅ Import budget met" if ok else Fore.RED + f"❌ Import budget of {budget}s exceeded") + Style.RESET_ALL)
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if check_import_budget() else 1)
@@ -0,0 +1,175 @@
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Optional
+
+from solar_germany.params import JOB_HISTORY, JOB_WORKERS
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    """Raised inside a job's progress callback once it has been cancelled."""
+
+
+class Job:
+    """
+    One unit of background work and its observable state.
+
+    The work function receives a `progress` callback as keyword argument; it
+    should call it regularly with a dict describing how far it got. The
+    callback is also where a cancelled job stops: it raises `JobCancelled`.
+    A finished job lets go of its arguments, but holds its result until it is
+    evicted (see JobRunner), so results should be small.
+    """
+
+    def __init__(self, key: tuple, func: Callable, args: tuple, kwargs: dict):
+        self.key = key
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.status = QUEUED
+        self.progress = {}
+        self.error = None
+        self.result = None
+        self.created_at = datetime.now()
+        self.started_at = None
+        self.finished_at = None
+        self._cancel = threading.Event()
+        self._future = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    def report(self, progress: dict) -> None:
+        """
+        Record the job's progress; raises JobCancelled if it was cancelled.
+        """
+        self.progress = dict(progress)
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def cancel(self) -> None:
+        """
+        Cancel the job: straight away if it is still queued, otherwise at its
+        next progress report.
+        """
+        self._cancel.set()
+        if self._future is not None and self._future.cancel():
+            self.status = CANCELLED
+            self.finished_at = datetime.now()
+            self._release()
+
+    def _release(self) -> None:
+        # Arguments can be large (e.g. a whole data frame); a finished job no longer needs them
+        self.args, self.kwargs = (), {}
+
+    def run(self) -> None:
+        if self._cancel.is_set():
+            self.status = CANCELLED
+            self.finished_at = datetime.now()
+            self._release()
+            return
+
+        self.status = RUNNING
+        self.started_at = datetime.now()
+        try:
+            self.result = self.func(*self.args, progress=self.report, **self.kwargs)
+            self.status = SUCCEEDED
+        except JobCancelled:
+            self.status = CANCELLED
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            self.status = FAILED
+            traceback.print_exc()
+        finally:
+            self.finished_at = datetime.now()
+            self._release()
+
+    def to_dict(self) -> dict:
+        return {
+            "key": self.key,
+            "status": self.status,
+            "progress": self.progress,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class JobRunner:
+    """
+    Run long jobs (e.g. preprocessing a year range) on background threads.
+
+    At most `max_workers` jobs run at once, the rest wait in order. Submitting
+    a job whose key matches one that is queued or running returns the existing
+    job instead of starting a second one, so any number of sessions asking for
+    the same range share a single run. Only the `history` most recently
+    finished jobs are kept; older ones are evicted on the next submit or get.
+    """
+
+    def __init__(self, max_workers: int = JOB_WORKERS, history: int = JOB_HISTORY):
+        self.max_workers = max_workers
+        self.history = history
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._jobs = {}
+
+    def submit(self, key: tuple, func: Callable, *args, **kwargs) -> Job:
+        """
+        Queue `func(*args, progress=..., **kwargs)` unless an identical job is
+        already queued or running.
+
+        :param key: Identifies identical jobs, e.g. ("preprocess", 2000, 2024).
+        :return: The new or the existing job.
+        """
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and not job.finished:
+                return job
+
+            job = Job(key, func, args, kwargs)
+            self._jobs[key] = job
+            job._future = self._executor.submit(job.run)
+            self._evict()
+            return job
+
+    def _evict(self) -> None:
+        # Forget the oldest finished jobs beyond `history`; queued and running ones stay
+        # (a job that is just finishing may not have its finished_at yet)
+        finished = sorted((job for job in self._jobs.values() if job.finished),
+                          key=lambda job: job.finished_at or datetime.max)
+        for job in finished[:max(len(finished) - self.history, 0)]:
+            del self._jobs[job.key]
+
+    def get(self, key: tuple) -> Optional[Job]:
+        """
+        :return: The latest job submitted under `key`, if any and not evicted.
+        """
+        with self._lock:
+            self._evict()
+            return self._jobs.get(key)
+
+    def cancel(self, key: tuple) -> None:
+        """
+        Cancel the latest job submitted under `key`, if it has not finished.
+        """
+        job = self.get(key)
+        if job is not None and not job.finished:
+            job.cancel()
+
+    def jobs(self) -> list:
+        """
+        :return: Every job's state, most recently created first.
+        """
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job.to_dict() for job in sorted(jobs, key=lambda job: job.created_at, reverse=True)]
@@ -0,0 +1,108 @@
+import os
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+
+from solar_germany.params import METRICS_LATENCY_BUCKETS, METRICS_ROW_BUCKETS, METRICS_STAGE_BUCKETS
+
+
+# Operational metrics in the Prometheus text format.
+#
+# Every metric of the project is defined here and updated in place by the
+# API, the data pipeline, the caches and the model calls. An update is a
+# lock and an addition (a write to a shared memory-mapped file under
+# gunicorn), cheap enough to stay enabled under load. The API serves them at
+# GET /metrics; the Streamlit app serves them on METRICS_PORT when set.
+#
+# Under gunicorn, PROMETHEUS_MULTIPROC_DIR is set (see api/gunicorn_conf.py)
+# and `render` aggregates the metrics of all workers.
+
+REQUESTS = Counter(
+    "solar_api_requests_total", "API requests by endpoint, method and status.",
+    ["endpoint", "method", "status"],
+)
+REQUEST_LATENCY = Histogram(
+    "solar_api_request_duration_seconds", "API request latency by endpoint and method.",
+    ["endpoint", "method"], buckets=METRICS_LATENCY_BUCKETS,
+)
+FILTER_ROWS = Histogram(
+    "solar_api_filter_result_rows", "Rows returned by /filter.", buckets=METRICS_ROW_BUCKETS,
+)
+
+STAGE_LATENCY = Histogram(
+    "solar_pipeline_stage_duration_seconds", "Duration of data pipeline stages.",
+    ["stage"], buckets=METRICS_STAGE_BUCKETS,
+)
+STAGE_ROWS = Counter("solar_pipeline_rows_total", "Rows handled by data pipeline stages.", ["stage"])
+
+DATASET_BYTES = Gauge(
+    "solar_dataset_memory_bytes", "Memory held by the loaded dataset.", ["source"], multiprocess_mode="max",
+)
+DATASET_ROWS = Gauge("solar_dataset_rows", "Rows of the loaded dataset.", ["source"], multiprocess_mode="max")
+
+MODEL_LATENCY = Histogram(
+    "solar_model_predict_duration_seconds", "Latency of prediction model calls.", buckets=METRICS_LATENCY_BUCKETS,
+)
+MODEL_ROWS = Counter("solar_model_predicted_rows_total", "Installations scored by the prediction model.")
+
+CACHE_LOOKUPS = Counter("solar_cache_lookups_total", "Cache lookups by cache and result.", ["cache", "result"])
+
+
+def timed(stage: str):
+    """
+    Time a pipeline stage, as a context manager or a decorator.
+
+    :param stage: Stage name, e.g. "validate".
+    """
+    return STAGE_LATENCY.labels(stage).time()
+
+
+def timed_chunks(chunks, stage: str):
+    """
+    Time the production of every chunk of an iterator (e.g. the pages of a
+    BigQuery result) and count its rows.
+
+    :param chunks: An iterator of DataFrames.
+    :param stage: Stage name, e.g. "fetch".
+    """
+    latency, rows = STAGE_LATENCY.labels(stage), STAGE_ROWS.labels(stage)
+    chunks = iter(chunks)
+    while True:
+        started = time.perf_counter()
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            return
+        latency.observe(time.perf_counter() - started)
+        rows.inc(len(chunk))
+        yield chunk
+
+
+def observe_request(endpoint: str, method: str, status: int, seconds: float) -> None:
+    REQUESTS.labels(endpoint, method, str(status)).inc()
+    REQUEST_LATENCY.labels(endpoint, method).observe(seconds)
+
+
+def observe_dataset(frame, source: str) -> None:
+    """
+    Record the size of a loaded dataset.
+
+    :param frame: The loaded rows.
+    :param source: Where they were loaded from, e.g. "bundle" or "gcs".
+    """
+    DATASET_BYTES.labels(source).set(int(frame.memory_usage(index=True, deep=True).sum()))
+    DATASET_ROWS.labels(source).set(len(frame))
+
+
+def render() -> tuple:
+    """
+    :return: The current metrics in the Prometheus text format and its
+        content type; aggregated over all worker processes under gunicorn.
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
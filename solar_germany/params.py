@@ -1,5 +1,106 @@
+import os
+
 CHUNK_SIZE = 500000
 LOCAL_DATA_PATH = "data"
 GCP_PROJECT = "wagon-bootcamp-project-438913"
 BQ_DATASET = "solargermany"
 COLUMN_NAMES = ["State", 'AdministrativeRegion', "City", "GrossPower", "MainOrientation", "NetRatedPower", "FeedInType", "AssignedActivePowerInverter", "NumberOfModules", "Location", "CommissioningYear", "Efficiency"]
+STRING_COLUMNS = ["State", "AdministrativeRegion", "City", "MainOrientation", "FeedInType", "Location"]
+DERIVED_CACHE_MAX_BYTES = 256 * 1024 ** 2
+METRIC_COLUMNS = ["NumberOfModules", "GrossPower", "NetRatedPower"]
+
+# "pandas" keeps a whole range in memory, "dask" works partition by partition
+EXECUTION_MODE = os.environ.get("EXECUTION_MODE", "pandas")
+DASK_BLOCKSIZE = os.environ.get("DASK_BLOCKSIZE", "64MB")
+SNAPSHOT_PATH = os.path.join(LOCAL_DATA_PATH, "snapshots")
+
+# Shared GCP clients and API concurrency limits
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", 32))
+STREAM_CHUNK_SIZE = 4 * 1024 ** 2  # bytes per ranged GCS download (see solar_germany.streaming)
+STREAM_PREFETCH_CHUNKS = 4  # chunks downloaded ahead of the parser
+CPU_WORKERS = int(os.environ.get("CPU_WORKERS", 2))
+CPU_QUEUE_LIMIT = int(os.environ.get("CPU_QUEUE_LIMIT", 16))
+
+# Background jobs (preprocessing runs) allowed to run at once per process
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 2))
+JOB_HISTORY = int(os.environ.get("JOB_HISTORY", 50))  # finished jobs kept per runner for status display
+
+# API worker processes under gunicorn (see api/gunicorn_conf.py)
+API_WORKERS = int(os.environ.get("API_WORKERS", os.cpu_count() or 1))
+
+# GeoJSON files in the bucket and the feature properties naming each level
+BUCKET_NAME = "solar_germany"
+STATES_GEOJSON_FILE = "states.geo.json"
+DISTRICTS_GEOJSON_FILE = "districts.geo.json"
+STATE_PROPERTIES = {"State": "name"}
+DISTRICT_PROPERTIES = {"State": "state", "AdministrativeRegion": "region", "City": "name"}
+
+# Vector tiles: cache location, extent and zoom range per map level
+TILE_PATH = os.path.join(LOCAL_DATA_PATH, "tiles")
+TILE_EXTENT = 4096
+TILE_LEVELS = {"state": (4, 7), "region": (6, 9), "district": (8, 11)}
+
+# Baked, ready-to-serve artifact bundles (see solar_germany.bundle)
+BUNDLE_PATH = os.path.join(LOCAL_DATA_PATH, "bundles")
+MODEL_PATH = os.path.join("model", "xgb_full_pipeline.pkl")
+GEOJSON_SIMPLIFY_TOLERANCE = 0.001  # degrees, about 100 m
+
+# Import-time budget of the data layer (see solar_germany.import_budget)
+IMPORT_BUDGET_SECONDS = float(os.environ.get("IMPORT_BUDGET_SECONDS", 1.5))
+
+# Input columns of the prediction pipeline and the targets it predicts, in order
+MODEL_FEATURES = ["State", "Administrative Region", "City", "MainOrientation", "FeedInType",
+                  "AssignedActivePowerInverter", "Location", "NumberOfModules"]
+MODEL_TARGETS = ["GrossPower", "NetRatedPower"]
+PREDICT_CHUNK_SIZE = 10000
+
+# Prediction result cache, shared by the app and the API (see solar_germany.prediction)
+PREDICTION_CACHE_SIZE = int(os.environ.get("PREDICTION_CACHE_SIZE", 10000))
+PREDICTION_CACHE_TTL = float(os.environ.get("PREDICTION_CACHE_TTL", 3600))  # seconds
+PREDICTION_KEY_DECIMALS = 3  # numeric features are rounded to this in cache keys
+
+# Forecast explanations (see solar_germany.explain): inputs swept and the factors they are scaled by
+EXPLANATION_CACHE_SIZE = int(os.environ.get("EXPLANATION_CACHE_SIZE", 1000))
+SENSITIVITY_FEATURES = ["NumberOfModules", "AssignedActivePowerInverter"]
+SENSITIVITY_FACTORS = [0.25, 0.5, 0.75, 1.0, 1.25, 1.5, 2.0]
+
+# Histogram buckets of the operational metrics (see solar_germany.metrics)
+METRICS_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)  # seconds
+METRICS_STAGE_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600)  # seconds
+METRICS_ROW_BUCKETS = (0, 1, 10, 100, 1000, 10_000, 100_000, 1_000_000, 10_000_000)
+METRICS_PORT = int(os.environ.get("METRICS_PORT", 0))  # Streamlit app only; 0 disables
+
+# Validation rules applied to every preprocessed chunk (see solar_germany.validation)
+REQUIRED_COLUMNS = ["State", "GrossPower", "NetRatedPower", "NumberOfModules", "CommissioningYear"]
+VALUE_RANGES = {
+    "GrossPower": (0, 1_000_000),  # kW
+    "NetRatedPower": (0, 1_000_000),  # kW
+    "AssignedActivePowerInverter": (0, 1_000_000),  # kW
+    "NumberOfModules": (1, 10_000_000),
+    "CommissioningYear": (1980, 2100),
+}
+EFFICIENCY_RANGE = (0.1, 10.0)  # GrossPower / NetRatedPower; outside is almost always a unit error
+VALID_STATES = [
+    "Baden-Württemberg", "Bayern", "Berlin", "Brandenburg", "Bremen", "Hamburg", "Hessen",
+    "Mecklenburg-Vorpommern", "Niedersachsen", "Nordrhein-Westfalen", "Rheinland-Pfalz",
+    "Saarland", "Sachsen", "Sachsen-Anhalt", "Schleswig-Holstein", "Thüringen",
+]
+FEED_IN_TYPES = ["Full Feed-in", "Partial Feed-in"]
+# Allowed values of categorical columns; a column without a fixed vocabulary is not listed
+CATEGORY_VOCABULARIES = {
+    "State": VALID_STATES,
+    "FeedInType": FEED_IN_TYPES,
+}
+
+# Relative accuracy of the GrossPower quantile sketches (see solar_germany.sketches)
+SKETCH_RELATIVE_ACCURACY = 0.01
+
+# Smallest previous-year total a district needs to be ranked by growth (see solar_germany.analytics)
+TREND_MIN_BASE = 1000
+
+# Approximate mode: rows sampled per State x year stratum and HyperLogLog precision
+SAMPLE_PER_STRATUM = 500
+HLL_PRECISION = 10  # 1024 registers, about 3% standard error
+
+# Processed dataset blocks (see solar_germany.storage): rows per Parquet row group
+DATASET_ROW_GROUP_SIZE = 10000
@@ -0,0 +1,249 @@
+import hashlib
+import math
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+
+import pandas as pd
+from cachetools import TTLCache
+from colorama import Fore, Style
+
+from solar_germany.dictionary import decode
+from solar_germany.metrics import CACHE_LOOKUPS, MODEL_LATENCY, MODEL_ROWS
+from solar_germany.params import (
+    MODEL_FEATURES,
+    MODEL_PATH,
+    MODEL_TARGETS,
+    PREDICT_CHUNK_SIZE,
+    PREDICTION_CACHE_SIZE,
+    PREDICTION_CACHE_TTL,
+    PREDICTION_KEY_DECIMALS,
+)
+
+
+def load_model(model_path: str = MODEL_PATH):
+    """
+    Load the prediction pipeline once per process and model version, so a
+    model file replaced in place is loaded again instead of being served
+    under the new version.
+
+    :param model_path: Path of the joblib-pickled pipeline.
+    :return: The fitted pipeline.
+    """
+    return _load_model(str(model_path), model_version(model_path))
+
+
+@lru_cache(maxsize=2)
+def _load_model(model_path: str, version: str):
+    import joblib
+
+    return joblib.load(model_path)
+
+
+@lru_cache(maxsize=8)
+def _file_digest(model_path: str, modified: int, size: int) -> str:
+    digest = hashlib.sha256()
+    with open(model_path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def model_version(model_path: str = MODEL_PATH) -> str:
+    """
+    :param model_path: Path of the joblib-pickled pipeline.
+    :return: A digest of the model file, hashed once per modification; the
+        same for a model and its copy in a baked bundle.
+    """
+    stat = os.stat(model_path)
+    return _file_digest(str(model_path), stat.st_mtime_ns, stat.st_size)
+
+
+def model_input(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Select the model's input columns from a frame.
+
+    Accepts the dataset's "AdministrativeRegion" spelling as well as the
+    pipeline's "Administrative Region".
+
+    :param frame: Candidate installations.
+    :return: The columns of MODEL_FEATURES, in order.
+    """
+    frame = frame.rename(columns={"AdministrativeRegion": "Administrative Region"})
+    missing = [column for column in MODEL_FEATURES if column not in frame.columns]
+    if missing:
+        raise ValueError(f"Missing input columns: {', '.join(missing)}")
+    return decode(frame[MODEL_FEATURES])
+
+
+def predict_frame(model, frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Predict gross and net rated power for every row of a frame.
+
+    :param model: The fitted pipeline.
+    :param frame: Candidate installations.
+    :return: One column per target in MODEL_TARGETS, aligned with `frame`.
+    """
+    with MODEL_LATENCY.time():
+        predictions = model.predict(model_input(frame))
+    MODEL_ROWS.inc(len(frame))
+    return pd.DataFrame(predictions, columns=MODEL_TARGETS, index=frame.index)
+
+
+# Prediction results, shared by every Streamlit session and API request of a
+# process. Popular configurations (the default sliders, big cities) are asked
+# for again and again; their predictions are kept for PREDICTION_CACHE_TTL
+# seconds, least recently used first out. Keys are the model version plus the
+# canonical feature tuple, so a new model never serves the old one's results.
+prediction_cache = TTLCache(maxsize=PREDICTION_CACHE_SIZE, ttl=PREDICTION_CACHE_TTL)
+_cache_lock = threading.Lock()
+_cache_stats = {"hits": 0, "misses": 0}
+_hit, _miss = CACHE_LOOKUPS.labels("prediction", "hit"), CACHE_LOOKUPS.labels("prediction", "miss")
+
+
+def _canonical(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, (int, float)) or hasattr(value, "item"):
+        value = round(float(value), PREDICTION_KEY_DECIMALS)
+        return value + 0.0  # Folds -0.0 into 0.0
+    return value
+
+
+def canonical_features(features: dict) -> tuple:
+    """
+    Canonical form of one installation's features: the values of
+    MODEL_FEATURES in order, strings stripped and numbers as floats rounded
+    to PREDICTION_KEY_DECIMALS, so 55, 55.0 and np.int64(55) share a key.
+
+    :param features: Feature values by column; "AdministrativeRegion" is
+        accepted for "Administrative Region".
+    :return: The canonical feature tuple.
+    :raises ValueError: If a feature is missing.
+    """
+    if "Administrative Region" not in features and "AdministrativeRegion" in features:
+        features = {**features, "Administrative Region": features["AdministrativeRegion"]}
+    missing = [column for column in MODEL_FEATURES if column not in features]
+    if missing:
+        raise ValueError(f"Missing input columns: {', '.join(missing)}")
+    return tuple(_canonical(features[column]) for column in MODEL_FEATURES)
+
+
+def predict_cached(model, version: str, installations: list) -> list:
+    """
+    Predict gross and net rated power for installations, answering repeated
+    configurations from the prediction cache. The misses are predicted in one
+    batch, each distinct configuration once.
+
+    :param model: The fitted pipeline.
+    :param version: Version of the model (see `model_version`).
+    :param installations: Feature values by column, one dict per installation.
+    :return: One {target: value} dict per installation, in order.
+    """
+    keys = [(version, canonical_features(features)) for features in installations]
+    results = {}
+    with _cache_lock:
+        for key in keys:
+            if key not in results:
+                results[key] = prediction_cache.get(key)
+        misses = [key for key, result in results.items() if result is None]
+        missed = sum(1 for key in keys if results[key] is None)
+        _cache_stats["misses"] += missed
+        _cache_stats["hits"] += len(keys) - missed
+    _miss.inc(missed)
+    _hit.inc(len(keys) - missed)
+
+    if misses:
+        frame = pd.DataFrame([features for _, features in misses], columns=MODEL_FEATURES)
+        predictions = predict_frame(model, frame)
+        computed = {
+            key: {target: float(value) for target, value in zip(MODEL_TARGETS, row)}
+            for key, row in zip(misses, predictions.itertuples(index=False))
+        }
+        results.update(computed)
+        with _cache_lock:
+            prediction_cache.update(computed)
+
+    # Copies, so callers cannot alter the cached results
+    return [dict(results[key]) for key in keys]
+
+
+def prediction_cache_info() -> dict:
+    """
+    Report the effectiveness and size of the prediction cache.
+
+    :return: Hits, misses, hit rate, number of entries and the bounds.
+    """
+    with _cache_lock:
+        lookups = _cache_stats["hits"] + _cache_stats["misses"]
+        return {
+            **_cache_stats,
+            "hit_rate": _cache_stats["hits"] / lookups if lookups else 0.0,
+            "entries": len(prediction_cache),
+            "max_entries": prediction_cache.maxsize,
+            "ttl_seconds": prediction_cache.ttl,
+        }
+
+
+def clear_prediction_cache() -> None:
+    """Drop every cached prediction."""
+    with _cache_lock:
+        prediction_cache.clear()
+
+
+def _predict_chunk(chunk: pd.DataFrame, model_path: str) -> pd.DataFrame:
+    # Runs in a worker process; the model is loaded there on first use
+    return chunk.join(predict_frame(load_model(model_path), chunk).add_prefix("Predicted"))
+
+
+def predict_file(
+    input_path: Path,
+    output_path: Path,
+    model_path: str = MODEL_PATH,
+    chunk_size: int = PREDICT_CHUNK_SIZE,
+    workers: int = os.cpu_count() or 1,
+) -> int:
+    """
+    Score a CSV of candidate installations and write it with the predictions
+    appended as extra columns ("PredictedGrossPower", "PredictedNetRatedPower").
+
+    The file is read in chunks that are scored by a pool of worker processes.
+    At most two chunks per worker are in flight, so memory stays bounded no
+    matter how large the file is, and results are written in input order.
+
+    :param input_path: CSV with the columns of MODEL_FEATURES.
+    :param output_path: CSV to write.
+    :param model_path: Path of the prediction pipeline.
+    :param chunk_size: Rows per chunk.
+    :param workers: Number of worker processes.
+    :return: Number of rows scored.
+    """
+    print(Fore.MAGENTA + f"\n ⭐️ Scoring {input_path} with {workers} workers" + Style.RESET_ALL)
+
+    output_path = Path(output_path)
+    output_path.unlink(missing_ok=True)
+    rows = 0
+
+    def write(future) -> None:
+        nonlocal rows
+        result = future.result()
+        result.to_csv(output_path, mode="a", header=not output_path.is_file(), index=False)
+        rows += len(result)
+        print(f"Scored {rows} rows")
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight = deque()
+        for chunk in pd.read_csv(input_path, chunksize=chunk_size):
+            if len(in_flight) >= 2 * workers:
+                write(in_flight.popleft())
+            in_flight.append(executor.submit(_predict_chunk, chunk, model_path))
+        while in_flight:
+            write(in_flight.popleft())
+
+    print(Fore.GREEN + f"✅ {rows} predictions saved to {output_path}" + Style.RESET_ALL)
+    return rows
@@ -1,18 +1,21 @@
 from pathlib import Path
 import pandas as pd
-from google.cloud import bigquery
-from typing import Optional
+from typing import Callable, Optional
 from colorama import Fore, Style
-from datetime import datetime
-from google.cloud import storage
-from solar_germany.params import CHUNK_SIZE, GCP_PROJECT, LOCAL_DATA_PATH, BQ_DATASET, COLUMN_NAMES
-from fastapi import HTTPException
-import json
-import streamlit as st
+from solar_germany.params import CHUNK_SIZE, GCP_PROJECT, LOCAL_DATA_PATH, BQ_DATASET, COLUMN_NAMES, STRING_COLUMNS, EXECUTION_MODE, DASK_BLOCKSIZE
+from solar_germany.aggregates import cube_from_frame
+from solar_germany import dictionary
+from solar_germany.metrics import STAGE_ROWS, timed, timed_chunks
+from solar_germany.clients import bigquery_client, load_blob_json
+from solar_germany.storage import write_dataset
+from solar_germany.validation import QualityStats, validate_chunk, with_reason_codes, with_reasons, count_reasons
 import os
 
 
-@st.cache_data
+# Data-layer only: no UI or web framework imports here, so batch jobs and the
+# API can use these functions without pulling in Streamlit. Callers add their
+# own caching (e.g. st.cache_data in app.py).
+
 def load_geojson_from_gcs(bucket_name: str, geojson_filename: str) -> dict:
     """
     Load a GeoJSON file from Google Cloud Storage.
@@ -22,32 +25,31 @@ def load_geojson_from_gcs(bucket_name: str, geojson_filename: str) -> dict:
     :return: The GeoJSON data as a Python dictionary.
     """
     try:
-        # Initialize the Google Cloud Storage client
-        client = storage.Client()
-
-        # Fetch the bucket by name (bucket_name must be provided here)
-        bucket = client.bucket(bucket_name)  # Correct method call
+        # Stream the file from the bucket with the shared storage client,
+        # parsing the features as they arrive instead of buffering the whole text
+        return load_blob_json(bucket_name, geojson_filename)
 
-        # Get the blob (file) from the bucket
-        blob = bucket.blob(geojson_filename)
+    except Exception as e:
+        raise RuntimeError(f"Failed to load GeoJSON from GCS: {str(e)}") from e
 
-        # Download the file contents as a string
-        geojson_data = blob.download_as_text()
+def preprocess_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+    """
+    Apply the row-wise preprocessing steps to one chunk (or dask partition).
 
-        # Parse the JSON data into a Python dictionary
-        geojson_dict = json.loads(geojson_data)
+    :param chunk: Raw rows as returned by BigQuery or the raw CSV cache.
+    :return: The processed rows.
+    """
+    chunk["Efficiency"] = chunk["GrossPower"] / chunk["NetRatedPower"]  # Example preprocessing
+    return chunk
 
-        return geojson_dict
 
-    except Exception as e:
-        # Raise an HTTPException if the file can't be loaded
-        raise HTTPException(status_code=500, detail=f"Failed to load GeoJSON from GCS: {str(e)}")
-
-@st.cache_resource
+@timed("preprocess_run")
 def preprocess_solar_data(
     min_year: int = 2000,
     max_year: int = 2024,
     chunk_size: int = CHUNK_SIZE,
+    execution_mode: str = EXECUTION_MODE,
+    progress: Optional[Callable[[dict], None]] = None,
 ) -> None:
     """
     Query and preprocess the solar energy dataset iteratively in chunks.
@@ -56,6 +58,16 @@ def preprocess_solar_data(
     - Query data from BigQuery if not available locally.
     - Save raw data to local cache.
     - Preprocess and save processed data iteratively.
+
+    With execution_mode="dask" the raw data is cached first and then
+    processed partition by partition, so memory use stays bounded by the
+    partition size rather than the size of the range.
+
+    Output files are written under a ".partial" name and only renamed once
+    complete, so an interrupted run never leaves a truncated file behind.
+
+    :param progress: Optional callback receiving {"chunks", "rows", "message"}
+        after every chunk; it may raise to abort the run (see solar_germany.jobs).
     """
 
     print(Fore.MAGENTA + "\n ⭐️ Preprocessing solar data by batch" + Style.RESET_ALL)
@@ -63,6 +75,9 @@ def preprocess_solar_data(
     # Paths for local storage
     raw_data_path = Path(LOCAL_DATA_PATH).joinpath(f"raw_solar_data_{min_year}_{max_year}.csv")
     processed_data_path = Path(LOCAL_DATA_PATH).joinpath(f"processed_solar_data_{min_year}_{max_year}.csv")
+    cube_data_path = Path(LOCAL_DATA_PATH).joinpath(f"geography_cube_{min_year}_{max_year}.parquet")
+    quarantine_data_path = Path(LOCAL_DATA_PATH).joinpath(f"quarantine_{min_year}_{max_year}.csv")
+    quality_path = Path(LOCAL_DATA_PATH).joinpath(f"quality_{min_year}_{max_year}.json")
 
     # Ensure the directory exists before saving data
     os.makedirs(LOCAL_DATA_PATH, exist_ok=True)
@@ -78,52 +93,277 @@ def preprocess_solar_data(
     # Check if raw data already exists locally
     raw_data_exists = raw_data_path.is_file()
 
+    def report(chunks: int, rows: int, message: str) -> None:
+        if progress is not None:
+            progress({"chunks": chunks, "rows": rows, "message": message})
+
+    if execution_mode == "dask":
+        if not raw_data_exists:
+            cache_raw_data(query, raw_data_path, chunk_size, progress=progress)
+        report(0, 0, "Processing out of core")
+        preprocess_out_of_core(raw_data_path, processed_data_path, cube_data_path, quarantine_data_path, quality_path)
+        report(0, 0, "Writing block-indexed dataset")
+        build_dataset(min_year, max_year, chunk_size)
+        return
+
+    partial_processed_path = _partial_path(processed_data_path)
+    partial_raw_path = _partial_path(raw_data_path)
+    partial_quarantine_path = _partial_path(quarantine_data_path)
+    for path in (partial_processed_path, partial_raw_path, partial_quarantine_path):
+        path.unlink(missing_ok=True)
+
     if raw_data_exists:
         print("Loading raw data from local CSV...")
         chunks = pd.read_csv(raw_data_path, chunksize=chunk_size)
     else:
         print("Querying data from BigQuery...")
-        client = bigquery.Client(project=GCP_PROJECT)
+        client = bigquery_client()
         chunks = client.query(query).result(page_size=chunk_size).to_dataframe_iterable()
+    chunks = timed_chunks(chunks, "fetch")
+
+    raw_rows = 0
+    processed_rows = 0
+    quality = QualityStats()
 
     for chunk_id, chunk in enumerate(chunks):
         print(f"Processing chunk {chunk_id + 1}... Initial rows: {len(chunk)}")
+        raw_rows += len(chunk)
+
+        # Save raw chunk if not already cached
+        if not raw_data_exists:
+            print(f"Caching raw chunk {chunk_id + 1} to {raw_data_path}")
+            chunk.to_csv(
+                partial_raw_path,
+                mode="a",
+                header=not partial_raw_path.is_file(),
+                index=False,
+            )
+
+        # Validate chunk, setting invalid rows aside
+        with timed("validate"):
+            chunk, quarantined, reasons = validate_chunk(chunk)
+        STAGE_ROWS.labels("quarantine").inc(len(quarantined))
+        quality.add(len(chunk) + len(quarantined), len(quarantined), reasons)
+        if len(quarantined):
+            quarantined.to_csv(
+                partial_quarantine_path,
+                mode="a",
+                header=not partial_quarantine_path.is_file(),
+                index=False,
+            )
 
         # Preprocess chunk
-        chunk["Efficiency"] = chunk["GrossPower"] / chunk["NetRatedPower"]  # Example preprocessing
-        print(f"After preprocessing chunk {chunk_id + 1}: {len(chunk)} rows")
+        with timed("preprocess"):
+            chunk = preprocess_chunk(chunk)
+        STAGE_ROWS.labels("preprocess").inc(len(chunk))
+        processed_rows += len(chunk)
+        print(f"After preprocessing chunk {chunk_id + 1}: {len(chunk)} rows ({len(quarantined)} quarantined)")
 
         # Save processed chunk to local CSV
         print(f"Saving processed chunk {chunk_id + 1} to {processed_data_path}")
-        chunk.to_csv(
-            processed_data_path,
-            mode="a",
-            header=not processed_data_path.is_file(),
-            index=False,
-        )
-
-        # Save raw chunk if not already cached
-        if not raw_data_exists:
-            print(f"Caching raw chunk {chunk_id + 1} to {raw_data_path}")
+        with timed("write"):
             chunk.to_csv(
-                raw_data_path,
+                partial_processed_path,
                 mode="a",
-                header=not raw_data_path.is_file(),
+                header=not partial_processed_path.is_file(),
                 index=False,
             )
 
+        report(chunk_id + 1, processed_rows, f"Processed chunk {chunk_id + 1}")
+
+    # Publish the complete files
+    if partial_processed_path.is_file():
+        os.replace(partial_processed_path, processed_data_path)
+    if not raw_data_exists and partial_raw_path.is_file():
+        os.replace(partial_raw_path, raw_data_path)
+    quarantine_data_path.unlink(missing_ok=True)
+    if partial_quarantine_path.is_file():
+        os.replace(partial_quarantine_path, quarantine_data_path)
+    quality.save(quality_path)
+    if processed_data_path.is_file():
+        report(chunk_id + 1, processed_rows, "Writing block-indexed dataset")
+        build_dataset(min_year, max_year, chunk_size)
+
+    print(Fore.GREEN + f"✅ Raw data saved to {raw_data_path}" + Style.RESET_ALL)
+    print(Fore.GREEN + f"✅ Processed data saved to {processed_data_path}" + Style.RESET_ALL)
+    print(Fore.GREEN + f"✅ Total rows in raw data: {raw_rows}" + Style.RESET_ALL)
+    print(Fore.GREEN + f"✅ Total rows in processed data: {processed_rows}" + Style.RESET_ALL)
+    print(Fore.GREEN + f"✅ Quarantined rows: {quality.rows_quarantined} (see {quality_path})" + Style.RESET_ALL)
+
+
+def _partial_path(path: Path) -> Path:
+    """
+    :return: Where `path` is written to until it is complete.
+    """
+    return path.with_name(path.name + ".partial")
+
+
+def cache_raw_data(
+    query: str,
+    raw_data_path: Path,
+    chunk_size: int = CHUNK_SIZE,
+    progress: Optional[Callable[[dict], None]] = None,
+) -> None:
+    """
+    Stream a BigQuery result page by page into the local raw CSV cache.
+
+    :param query: SQL query selecting the raw rows.
+    :param raw_data_path: Destination CSV file.
+    :param chunk_size: Number of rows fetched per page.
+    :param progress: Optional callback, as for `preprocess_solar_data`.
+    """
+    print("Querying data from BigQuery...")
+    client = bigquery_client()
+    pages = timed_chunks(client.query(query).result(page_size=chunk_size).to_dataframe_iterable(), "fetch")
+
+    partial_path = _partial_path(raw_data_path)
+    partial_path.unlink(missing_ok=True)
+    rows = 0
+    for page_id, page in enumerate(pages):
+        print(f"Caching raw chunk {page_id + 1} to {raw_data_path}")
+        page.to_csv(partial_path, mode="a", header=not partial_path.is_file(), index=False)
+        rows += len(page)
+        if progress is not None:
+            progress({"chunks": page_id + 1, "rows": rows, "message": f"Cached raw chunk {page_id + 1}"})
+
+    if partial_path.is_file():
+        os.replace(partial_path, raw_data_path)
+
+
+def read_csv_out_of_core(file_path: Path, columns: Optional[list] = None):
+    """
+    Open a CSV file as a lazy, partitioned dask DataFrame.
+
+    :param file_path: CSV file to read.
+    :param columns: Optional subset of columns to read.
+    :return: A dask DataFrame with one partition per DASK_BLOCKSIZE bytes.
+    """
+    import dask.dataframe as dd
+
+    dtypes = {column: "object" for column in STRING_COLUMNS if columns is None or column in columns}
+    return dd.read_csv(file_path, usecols=columns, dtype=dtypes, blocksize=DASK_BLOCKSIZE)
+
+
+@timed("build_cube")
+def build_geography_cube(min_year: int = 2000, max_year: int = 2024, execution_mode: str = EXECUTION_MODE) -> Path:
+    """
+    Aggregate the processed data of a year range into its geography cube file.
+
+    :param min_year: First commissioning year.
+    :param max_year: Last commissioning year.
+    :param execution_mode: "pandas" or "dask", as for `preprocess_solar_data`.
+    :return: Path of the written Parquet file.
+    """
+    processed_data_path = Path(LOCAL_DATA_PATH).joinpath(f"processed_solar_data_{min_year}_{max_year}.csv")
+    cube_data_path = Path(LOCAL_DATA_PATH).joinpath(f"geography_cube_{min_year}_{max_year}.parquet")
+
+    if execution_mode == "dask":
+        cube = cube_from_frame(read_csv_out_of_core(processed_data_path)).compute()
+    else:
+        cube = cube_from_frame(pd.read_csv(processed_data_path))
+    cube.sort_index().to_parquet(cube_data_path)
+
+    print(Fore.GREEN + f"✅ Geography cube saved to {cube_data_path}" + Style.RESET_ALL)
+    return cube_data_path
+
+
+@timed("build_dataset")
+def build_dataset(min_year: int = 2000, max_year: int = 2024, chunk_size: int = CHUNK_SIZE) -> Path:
+    """
+    Copy the processed CSV of a year range into a block-indexed Parquet
+    dataset (see solar_germany.storage), chunk by chunk.
+
+    :param min_year: First commissioning year.
+    :param max_year: Last commissioning year.
+    :param chunk_size: Rows per part file.
+    :return: Path of the dataset directory.
+    """
+    processed_data_path = Path(LOCAL_DATA_PATH).joinpath(f"processed_solar_data_{min_year}_{max_year}.csv")
+    dataset_path = Path(LOCAL_DATA_PATH).joinpath(f"processed_solar_data_{min_year}_{max_year}.parquet")
+
+    dtypes = {column: "string" for column in STRING_COLUMNS}
+    write_dataset(pd.read_csv(processed_data_path, chunksize=chunk_size, dtype=dtypes), dataset_path)
+
+    print(Fore.GREEN + f"✅ Block-indexed dataset saved to {dataset_path}" + Style.RESET_ALL)
+    return dataset_path
+
+
+@timed("preprocess_out_of_core")
+def preprocess_out_of_core(
+    raw_data_path: Path,
+    processed_data_path: Path,
+    cube_data_path: Path,
+    quarantine_data_path: Path,
+    quality_path: Path,
+) -> None:
+    """
+    Validate and preprocess the raw CSV cache and build the geography cube with dask.
+
+    Partitions are read, validated, processed and appended to the processed
+    CSV (or the quarantine file) one at a time while their per-group sums are
+    folded into the cube, so the whole range never has to fit in memory and
+    the raw file is only read once.
+
+    :param raw_data_path: Raw CSV cache to read.
+    :param processed_data_path: Processed CSV file to write.
+    :param cube_data_path: Parquet file to write the geography cube to.
+    :param quarantine_data_path: CSV file to write the invalid rows to.
+    :param quality_path: JSON file to write the quality statistics to.
+    """
+    import dask
+
+    raw = read_csv_out_of_core(raw_data_path)
+    print(f"Processing {raw.npartitions} partitions out of core...")
+
+    checked = raw.map_partitions(with_reason_codes)
+    processed = checked[checked["ReasonCodes"] == 0].drop(columns="ReasonCodes").map_partitions(preprocess_chunk)
+    quarantined = checked[checked["ReasonCodes"] != 0].map_partitions(with_reasons)
+
+    partial_path = _partial_path(processed_data_path)
+    partial_quarantine_path = _partial_path(quarantine_data_path)
+    write = processed.to_csv(partial_path, single_file=True, index=False, compute=False)
+    write_quarantine = quarantined.to_csv(partial_quarantine_path, single_file=True, index=False, compute=False)
+    _, _, cube, code_counts = dask.compute(
+        write, write_quarantine, cube_from_frame(processed), checked["ReasonCodes"].value_counts()
+    )
+    os.replace(partial_path, processed_data_path)
+    os.replace(partial_quarantine_path, quarantine_data_path)
+    cube.sort_index().to_parquet(cube_data_path)
+
+    quality = QualityStats()
+    quality.add(
+        int(code_counts.sum()),
+        int(code_counts[code_counts.index != 0].sum()),
+        count_reasons(code_counts.index.to_numpy(), code_counts.to_numpy()),
+    )
+    quality.save(quality_path)
+
     print(Fore.GREEN + f"✅ Raw data saved to {raw_data_path}" + Style.RESET_ALL)
     print(Fore.GREEN + f"✅ Processed data saved to {processed_data_path}" + Style.RESET_ALL)
-    print(Fore.GREEN + f"✅ Total rows in raw data: {pd.read_csv(raw_data_path).shape[0]}" + Style.RESET_ALL)
-    print(Fore.GREEN + f"✅ Total rows in processed data: {pd.read_csv(processed_data_path).shape[0]}" + Style.RESET_ALL)
+    print(Fore.GREEN + f"✅ Geography cube saved to {cube_data_path}" + Style.RESET_ALL)
+    print(Fore.GREEN + f"✅ Quarantined rows: {quality.rows_quarantined} (see {quality_path})" + Style.RESET_ALL)
 
 
 
 # Function to load processed data
-@st.cache_data
-def load_processed_data(file_path):
+def load_processed_data(file_path, version: Optional[str] = None):
+    # `version` (see dataset_version) only keys the caller's cache, so a rewritten file is reloaded
     try:
-        return pd.read_csv(file_path)
+        with timed("load_processed"):
+            data = dictionary.read_csv(file_path)
+        STAGE_ROWS.labels("load_processed").inc(len(data))
+        return data
     except FileNotFoundError:
-        st.error("Processed data not found. Please preprocess data first.")
+        print(Fore.RED + "Processed data not found. Please preprocess data first." + Style.RESET_ALL)
         return pd.DataFrame()
+
+
+def dataset_version(file_path) -> str:
+    """
+    Identify the current contents of a processed data file.
+
+    :param file_path: Path to the processed CSV file.
+    :return: A string that changes whenever the file is rewritten.
+    """
+    stat = Path(file_path).stat()
+    return f"{Path(file_path).name}:{stat.st_size}:{stat.st_mtime_ns}"
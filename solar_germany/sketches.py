@@ -0,0 +1,78 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from solar_germany.params import SKETCH_RELATIVE_ACCURACY
+
+
+# Mergeable quantile sketches.
+#
+# Values are counted in logarithmic buckets (as in DDSketch): bucket i holds
+# the values in (gamma^(i-1), gamma^i], with gamma = (1 + a) / (1 - a). A
+# sketch is just a count per bucket, so sketches of any set of partitions
+# merge by adding their counts, and every quantile read from the merged
+# counts is within relative error `a` of the exact one. Values <= 0 are
+# counted in a separate zero bucket.
+
+ZERO_BUCKET = np.iinfo(np.int32).min
+
+
+def _gamma(relative_accuracy: float) -> float:
+    return (1 + relative_accuracy) / (1 - relative_accuracy)
+
+
+def bucket_index(values, relative_accuracy: float = SKETCH_RELATIVE_ACCURACY) -> np.ndarray:
+    """
+    :param values: Values to sketch.
+    :return: The bucket of each value.
+    """
+    values = np.asarray(values, dtype=float)
+    buckets = np.full(len(values), ZERO_BUCKET, dtype=np.int32)
+    positive = values > 0
+    buckets[positive] = np.ceil(np.log(values[positive]) / math.log(_gamma(relative_accuracy)))
+    return buckets
+
+
+def bucket_value(buckets, relative_accuracy: float = SKETCH_RELATIVE_ACCURACY) -> np.ndarray:
+    """
+    :return: The representative value of each bucket (0 for the zero bucket).
+    """
+    buckets = np.asarray(buckets)
+    gamma = _gamma(relative_accuracy)
+    values = 2 * np.power(gamma, buckets.astype(float)) / (gamma + 1)
+    return np.where(buckets == ZERO_BUCKET, 0.0, values)
+
+
+def sketch_from_frame(frame: pd.DataFrame, column: str, by: list,
+                      relative_accuracy: float = SKETCH_RELATIVE_ACCURACY) -> pd.Series:
+    """
+    Sketch a column per group.
+
+    :param frame: Rows to sketch.
+    :param column: Column to sketch, e.g. "GrossPower".
+    :param by: Group columns.
+    :return: Counts indexed by the group columns plus `Bucket`.
+    """
+    buckets = pd.Series(bucket_index(frame[column], relative_accuracy), index=frame.index, name="Bucket")
+    keys = [frame[key] for key in by] + [buckets]
+    return frame.groupby(keys, sort=True, observed=True).size().rename("Count")
+
+
+def quantiles(sketch: pd.Series, qs, relative_accuracy: float = SKETCH_RELATIVE_ACCURACY) -> dict:
+    """
+    Read quantiles from a (merged) sketch.
+
+    :param sketch: Counts indexed by (at least) `Bucket`; other index levels
+        are merged.
+    :param qs: Quantiles to read, e.g. [0.5, 0.9].
+    :return: Quantile to approximate value; NaN for an empty sketch.
+    """
+    counts = sketch.groupby(level="Bucket").sum().sort_index()
+    total = counts.sum()
+    if total == 0:
+        return {q: float("nan") for q in qs}
+
+    cumulative = counts.cumsum().to_numpy()
+    values = bucket_value(counts.index.to_numpy(), relative_accuracy)
+    return {q: float(values[np.searchsorted(cumulative, q * (total - 1), side="right")]) for q in qs}
@@ -0,0 +1,278 @@
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+from colorama import Fore, Style
+
+from solar_germany.aggregates import GEOGRAPHY_LEVELS, cube_from_frame
+from solar_germany.clients import bigquery_client
+from solar_germany.dictionary import encode
+from solar_germany.params import CHUNK_SIZE, COLUMN_NAMES, GCP_PROJECT, BQ_DATASET, METRIC_COLUMNS, SNAPSHOT_PATH
+
+
+# Versioned MaStR snapshots.
+#
+# Every row gets a RowKey: a hash of its raw values combined with how many
+# identical rows came before it, so duplicates stay distinct. A snapshot only
+# stores the rows whose keys its parent did not have (`added.parquet`), the
+# full key set (`keys.parquet`), the cube cell of every stored row
+# (`cells.parquet`) and its geography cube. Registering a new release
+# therefore preprocesses and aggregates the delta only; unchanged rows are
+# hashed once and never touched again, and removed rows are looked up in the
+# parent's cells instead of being searched for in its ancestors.
+
+RAW_COLUMNS = [column for column in COLUMN_NAMES if column != "Efficiency"]
+CELL_COLUMNS = ["RowKey"] + GEOGRAPHY_LEVELS + ["CommissioningYear"] + METRIC_COLUMNS + ["Efficiency"]
+_OCCURRENCE_SALT = np.uint64(0x9E3779B97F4A7C15)
+
+
+def snapshot_dir(snapshot_id: str) -> Path:
+    """
+    :return: The directory holding a snapshot's files.
+    """
+    return Path(SNAPSHOT_PATH).joinpath(snapshot_id)
+
+
+def list_snapshots() -> list:
+    """
+    List the registered snapshots, oldest first.
+
+    :return: The manifest of every snapshot.
+    """
+    manifests = [
+        json.loads(path.read_text())
+        for path in Path(SNAPSHOT_PATH).glob("*/manifest.json")
+    ]
+    return sorted(manifests, key=lambda manifest: manifest["created_at"])
+
+
+def latest_snapshot() -> Optional[str]:
+    """
+    :return: The id of the most recently registered snapshot, if any.
+    """
+    snapshots = list_snapshots()
+    return snapshots[-1]["snapshot_id"] if snapshots else None
+
+
+def read_manifest(snapshot_id: str) -> dict:
+    """
+    :return: The manifest of a snapshot; raises ValueError if it is unknown.
+    """
+    manifest_path = snapshot_dir(snapshot_id).joinpath("manifest.json")
+    if not manifest_path.is_file():
+        raise ValueError(f"Unknown snapshot: {snapshot_id}")
+    return json.loads(manifest_path.read_text())
+
+
+def read_keys(snapshot_id: str) -> np.ndarray:
+    """
+    :return: The sorted RowKeys of every row in a snapshot.
+    """
+    return pd.read_parquet(snapshot_dir(snapshot_id).joinpath("keys.parquet"), columns=["RowKey"])["RowKey"].to_numpy()
+
+
+def read_cells(snapshot_id: str) -> pd.DataFrame:
+    """
+    :return: The RowKey and cube cell values (geography, year, metrics and
+        efficiency) of every row stored in a snapshot; quarantined rows have
+        no cell.
+    """
+    cells_path = snapshot_dir(snapshot_id).joinpath("cells.parquet")
+    if cells_path.is_file():
+        return pd.read_parquet(cells_path)
+
+    # Snapshots registered before cells were stored: rebuild them from the lineage
+    rows = _read_added(_lineage(snapshot_id), columns=CELL_COLUMNS)
+    live = np.isin(rows["RowKey"].to_numpy(), read_keys(snapshot_id))
+    return rows[live].drop_duplicates("RowKey").reset_index(drop=True)
+
+
+def read_cube(snapshot_id: str) -> pd.DataFrame:
+    """
+    :return: The geography cube of a snapshot (see aggregates.geography_cube).
+    """
+    return pd.read_parquet(snapshot_dir(snapshot_id).joinpath("cube.parquet"))
+
+
+def _lineage(snapshot_id: str) -> list:
+    """
+    :return: Snapshot ids from the base snapshot down to `snapshot_id`.
+    """
+    lineage = []
+    while snapshot_id is not None:
+        lineage.append(snapshot_id)
+        snapshot_id = read_manifest(snapshot_id)["parent"]
+    return lineage[::-1]
+
+
+def _read_added(snapshot_ids: list, columns: Optional[list] = None) -> pd.DataFrame:
+    """
+    :return: The rows added by each of the given snapshots, concatenated.
+    """
+    frames = [
+        pd.read_parquet(snapshot_dir(snapshot_id).joinpath("added.parquet"), columns=columns)
+        for snapshot_id in snapshot_ids
+    ]
+    return pd.concat(frames, ignore_index=True)
+
+
+def row_keys(chunk: pd.DataFrame, seen: pd.Series) -> tuple:
+    """
+    Compute the RowKey of every row in a chunk.
+
+    :param chunk: Raw rows.
+    :param seen: Number of times each content hash was seen in earlier chunks.
+    :return: The keys as a uint64 array, and `seen` updated with this chunk.
+    """
+    hashes = pd.util.hash_pandas_object(chunk[RAW_COLUMNS], index=False)
+    occurrence = hashes.groupby(hashes.to_numpy()).cumcount().to_numpy(dtype=np.uint64)
+    occurrence += seen.reindex(hashes.to_numpy(), fill_value=0).to_numpy(dtype=np.uint64)
+    seen = seen.add(hashes.value_counts(), fill_value=0).astype(np.uint64)
+
+    keys = pd.util.hash_array(hashes.to_numpy() ^ (occurrence * _OCCURRENCE_SALT))
+    return keys, seen
+
+
+def create_snapshot(snapshot_id: str, chunks: Iterable[pd.DataFrame], parent: Optional[str] = None) -> dict:
+    """
+    Register a new snapshot from a stream of raw chunks.
+
+    Only rows that are new compared to `parent` are preprocessed and stored;
+    the geography cube is updated from the parent's cube with the added and
+    removed rows instead of being rebuilt.
+
+    :param snapshot_id: Id of the new snapshot, e.g. "2024-10-01".
+    :param chunks: Raw rows of the complete release, in chunks.
+    :param parent: Snapshot to diff against; None registers a base snapshot.
+    :return: The manifest of the new snapshot.
+    """
+    from solar_germany.processing import preprocess_chunk
+    from solar_germany.validation import validate_chunk
+
+    print(Fore.MAGENTA + f"\n ⭐️ Registering snapshot {snapshot_id} (parent: {parent})" + Style.RESET_ALL)
+
+    target_dir = snapshot_dir(snapshot_id)
+    if target_dir.joinpath("manifest.json").is_file():
+        raise ValueError(f"Snapshot {snapshot_id} already exists")
+    target_dir.mkdir(parents=True, exist_ok=True)
+
+    parent_keys = read_keys(parent) if parent else np.array([], dtype=np.uint64)
+
+    seen = pd.Series(dtype=np.uint64)
+    new_keys = []
+    added = []
+    quarantined = 0
+    for chunk_id, chunk in enumerate(chunks):
+        chunk = chunk[RAW_COLUMNS].reset_index(drop=True)
+        keys, seen = row_keys(chunk, seen)
+        new_keys.append(keys)
+
+        # Invalid rows keep their key (so they are not re-checked by later
+        # snapshots) but are never stored or aggregated
+        is_new = ~np.isin(keys, parent_keys, assume_unique=True)
+        if is_new.any():
+            delta = chunk[is_new].assign(RowKey=keys[is_new])
+            delta, invalid, _ = validate_chunk(delta)
+            quarantined += len(invalid)
+            added.append(preprocess_chunk(delta))
+        print(f"Chunk {chunk_id + 1}: {len(chunk)} rows, {int(is_new.sum())} new")
+
+    new_keys = np.sort(np.concatenate(new_keys)) if new_keys else np.array([], dtype=np.uint64)
+    added = pd.concat(added, ignore_index=True) if added else pd.DataFrame(columns=COLUMN_NAMES + ["RowKey"])
+    removed_keys = np.setdiff1d(parent_keys, new_keys, assume_unique=True)
+
+    # Update the parent's cube with the delta instead of re-aggregating everything;
+    # removed rows are found by key in the parent's cells
+    cube = cube_from_frame(added)
+    cells = added[CELL_COLUMNS]
+    if parent:
+        parent_cells = read_cells(parent)
+        is_removed = np.isin(parent_cells["RowKey"].to_numpy(), removed_keys)
+        cube = read_cube(parent).add(cube, fill_value=0)
+        if is_removed.any():
+            cube = cube.sub(cube_from_frame(parent_cells[is_removed]), fill_value=0)
+        cube = cube[(cube != 0).any(axis=1)]
+        cells = pd.concat([parent_cells[~is_removed]] + ([cells] if len(cells) else []), ignore_index=True)
+
+    added.to_parquet(target_dir.joinpath("added.parquet"), index=False)
+    pd.DataFrame({"RowKey": new_keys}).to_parquet(target_dir.joinpath("keys.parquet"), index=False)
+    cells.to_parquet(target_dir.joinpath("cells.parquet"), index=False)
+    cube.sort_index().to_parquet(target_dir.joinpath("cube.parquet"))
+
+    manifest = {
+        "snapshot_id": snapshot_id,
+        "parent": parent,
+        "created_at": datetime.now().isoformat(),
+        "rows": int(len(new_keys)),
+        "added": int(len(added)),
+        "removed": int(len(removed_keys)),
+        "quarantined": quarantined,
+    }
+    target_dir.joinpath("manifest.json").write_text(json.dumps(manifest, indent=2))
+
+    print(Fore.GREEN + f"✅ Snapshot {snapshot_id}: {manifest['rows']} rows, "
+          f"{manifest['added']} added, {manifest['removed']} removed" + Style.RESET_ALL)
+    return manifest
+
+
+def snapshot_from_bigquery(snapshot_id: str, chunk_size: int = CHUNK_SIZE) -> dict:
+    """
+    Register the current contents of the BigQuery table as a new snapshot,
+    diffed against the latest registered one.
+
+    :param snapshot_id: Id of the new snapshot, e.g. "2024-10-01".
+    :param chunk_size: Number of rows fetched per page.
+    :return: The manifest of the new snapshot.
+    """
+    query = f"""
+        SELECT {",".join(RAW_COLUMNS)}
+        FROM `{GCP_PROJECT}.{BQ_DATASET}.SOLAR`
+        ORDER BY CommissioningYear
+    """
+    client = bigquery_client()
+    chunks = client.query(query).result(page_size=chunk_size).to_dataframe_iterable()
+    return create_snapshot(snapshot_id, chunks, parent=latest_snapshot())
+
+
+def load_snapshot(snapshot_id: str, min_year: Optional[int] = None, max_year: Optional[int] = None) -> pd.DataFrame:
+    """
+    Materialize the processed rows of a snapshot.
+
+    :param snapshot_id: Snapshot to load.
+    :param min_year: Optional first commissioning year to keep.
+    :param max_year: Optional last commissioning year to keep.
+    :return: The processed rows, in the same layout as the processed CSV.
+    """
+    rows = _read_added(_lineage(snapshot_id))
+    live = np.isin(rows["RowKey"].to_numpy(), read_keys(snapshot_id), assume_unique=False)
+    rows = rows[live].drop_duplicates("RowKey")
+
+    if min_year is not None:
+        rows = rows[rows["CommissioningYear"] >= min_year]
+    if max_year is not None:
+        rows = rows[rows["CommissioningYear"] <= max_year]
+    return encode(rows.drop(columns="RowKey").reset_index(drop=True))
+
+
+def compare_snapshots(base: str, target: str, level: str = "State") -> pd.DataFrame:
+    """
+    Compare two snapshots per geography level from their cubes alone.
+
+    :param base: Snapshot to compare from.
+    :param target: Snapshot to compare to.
+    :param level: Geography level to break the change down by.
+    :return: Frame indexed by `level` with base, target and change of every
+        metric.
+    """
+    base_totals = read_cube(base).groupby(level=level).sum()
+    target_totals = read_cube(target).groupby(level=level).sum()
+    comparison = pd.concat(
+        {"base": base_totals, "target": target_totals},
+        axis=1,
+    ).fillna(0)
+    for metric in METRIC_COLUMNS:
+        comparison[("change", metric)] = comparison[("target", metric)] - comparison[("base", metric)]
+    return comparison
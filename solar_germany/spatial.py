@@ -0,0 +1,139 @@
+import math
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from solar_germany.aggregates import geography_cube
+from solar_germany.params import METRIC_COLUMNS
+
+KM_PER_DEGREE_LAT = 110.574
+KM_PER_DEGREE_LON_AT_EQUATOR = 111.320
+
+# shapely is imported where it is used, so importing this module stays cheap
+# (see solar_germany.import_budget)
+
+
+class SpatialIndex:
+    """
+    STRtree over the polygons of one GeoJSON FeatureCollection.
+
+    Each feature is tagged with the geography levels it represents (e.g.
+    State, or State / AdministrativeRegion / City for districts), read from
+    its properties according to `level_properties`.
+    """
+
+    def __init__(self, geojson: dict, level_properties: dict):
+        """
+        :param geojson: A GeoJSON FeatureCollection in lon/lat coordinates.
+        :param level_properties: Geography level name to the feature property
+            holding it, e.g. {"State": "name"}.
+        """
+        import shapely
+        from shapely.geometry import shape
+        from shapely.strtree import STRtree
+
+        features = [feature for feature in geojson["features"] if feature.get("geometry")]
+        self.levels = list(level_properties)
+        self.geometries = np.array([shape(feature["geometry"]) for feature in features], dtype=object)
+        self.areas = pd.DataFrame([
+            {level: feature["properties"].get(prop) for level, prop in level_properties.items()}
+            for feature in features
+        ])
+        self.records = self.areas.to_dict(orient="records")
+        shapely.prepare(self.geometries)
+        self.tree = STRtree(self.geometries)
+
+    def locate(self, lon: float, lat: float) -> Optional[dict]:
+        """
+        Find the area containing a point.
+
+        :param lon: Longitude in degrees.
+        :param lat: Latitude in degrees.
+        :return: The area's geography levels, or None outside every polygon.
+        """
+        from shapely.geometry import Point
+
+        hits = self.tree.query(Point(lon, lat), predicate="intersects")
+        if len(hits) == 0:
+            return None
+        return dict(self.records[int(hits.min())])
+
+    def locate_many(self, lons, lats) -> pd.DataFrame:
+        """
+        Find the areas containing many points in one vectorized query.
+
+        :param lons: Longitudes in degrees.
+        :param lats: Latitudes in degrees.
+        :return: One row of geography levels per point (NaN if not found).
+        """
+        import shapely
+
+        points = shapely.points(np.asarray(lons, dtype=float), np.asarray(lats, dtype=float))
+        point_ids, area_ids = self.tree.query(points, predicate="intersects")
+
+        # Keep the first matching area for points on a shared border
+        first = pd.Series(area_ids).groupby(point_ids).min()
+        result = pd.DataFrame(index=range(len(points)), columns=self.levels)
+        result.loc[first.index, self.levels] = self.areas.iloc[first.to_numpy()].to_numpy()
+        return result
+
+    def intersecting(self, geometry) -> pd.DataFrame:
+        """
+        :param geometry: Query geometry in lon/lat coordinates.
+        :return: The geography levels of every area intersecting it.
+        """
+        hits = np.sort(self.tree.query(geometry, predicate="intersects"))
+        return self.areas.iloc[hits].reset_index(drop=True)
+
+
+def bounding_box(min_lon: float, min_lat: float, max_lon: float, max_lat: float):
+    """
+    :return: The bounding box as a polygon.
+    """
+    from shapely.geometry import box
+
+    return box(min_lon, min_lat, max_lon, max_lat)
+
+
+def circle(lon: float, lat: float, radius_km: float, resolution: int = 32):
+    """
+    Approximate a circle on the ground as an ellipse in lon/lat degrees.
+
+    Accurate to well under a percent for the radii and latitudes of Germany.
+
+    :param lon: Longitude of the centre in degrees.
+    :param lat: Latitude of the centre in degrees.
+    :param radius_km: Radius in kilometres.
+    :return: The circle as a polygon.
+    """
+    from shapely.affinity import scale
+    from shapely.geometry import Point
+
+    km_per_degree_lon = KM_PER_DEGREE_LON_AT_EQUATOR * math.cos(math.radians(lat))
+    unit_circle = Point(lon, lat).buffer(1.0, quad_segs=resolution // 4)
+    return scale(unit_circle, xfact=radius_km / km_per_degree_lon, yfact=radius_km / KM_PER_DEGREE_LAT)
+
+
+def aggregate_areas(data: pd.DataFrame, data_version: str, areas: pd.DataFrame, year: Optional[int] = None) -> dict:
+    """
+    Sum every metric over a set of areas using the geography cube.
+
+    :param data: The processed solar dataset.
+    :param data_version: Version string of the processed dataset.
+    :param areas: Geography levels of the areas, as returned by a SpatialIndex.
+    :param year: Optional commissioning year to restrict to.
+    :return: The matched areas with their totals, and the overall totals.
+    """
+    cube = geography_cube(data, data_version).reset_index()
+    if year is not None:
+        cube = cube[cube["CommissioningYear"] == year]
+
+    levels = [level for level in areas.columns if areas[level].notna().all()]
+    per_area = cube.groupby(levels)[METRIC_COLUMNS].sum()
+    matched = areas[levels].drop_duplicates().join(per_area, on=levels).fillna({metric: 0 for metric in METRIC_COLUMNS})
+
+    return {
+        "areas": matched.to_dict(orient="records"),
+        "totals": {metric: float(matched[metric].sum()) for metric in METRIC_COLUMNS},
+    }
@@ -0,0 +1,204 @@
+import json
+import os
+import shutil
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from solar_germany.dictionary import decode
+from solar_germany.params import DATASET_ROW_GROUP_SIZE, METRIC_COLUMNS
+
+
+# Block-indexed Parquet copy of the processed dataset.
+#
+# A dataset is a directory of part files, one per processed chunk. Each part
+# is sorted by State, CommissioningYear and AdministrativeRegion and split
+# into row groups ("blocks") of DATASET_ROW_GROUP_SIZE rows, so a block
+# covers few states and years. Besides Parquet's own min/max statistics, the
+# footer of every part carries the statistics used for pruning:
+#
+#   - min/max of CommissioningYear, City and the numeric columns
+#   - the distinct values ("dictionary") of State and AdministrativeRegion
+#
+# `read_filtered` checks a selection against these statistics and only
+# decodes the blocks that can hold matching rows.
+
+SORT_COLUMNS = ['State', 'CommissioningYear', 'AdministrativeRegion', 'City']
+RANGE_COLUMNS = ['CommissioningYear', 'City'] + METRIC_COLUMNS + ['AssignedActivePowerInverter', 'Efficiency']
+DICTIONARY_COLUMNS = ['State', 'AdministrativeRegion']
+STATS_KEY = b"solar_germany.block_stats"
+
+
+def _scalar(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def block_stats(block: pd.DataFrame) -> dict:
+    """
+    :param block: The rows of one block.
+    :return: Row count, min/max of RANGE_COLUMNS and distinct values of
+        DICTIONARY_COLUMNS, as JSON-serializable values.
+    """
+    stats = {"rows": int(len(block)), "ranges": {}, "values": {}}
+    for column in RANGE_COLUMNS:
+        if column in block and block[column].notna().any():
+            stats["ranges"][column] = [_scalar(block[column].min()), _scalar(block[column].max())]
+    for column in DICTIONARY_COLUMNS:
+        if column in block:
+            stats["values"][column] = sorted(block[column].dropna().unique().tolist())
+    return stats
+
+
+def write_part(frame: pd.DataFrame, path: Path, row_group_size: int = DATASET_ROW_GROUP_SIZE) -> None:
+    """
+    Write one part file of a dataset: sorted, split into blocks and with the
+    statistics of every block in its footer.
+
+    :param frame: Processed rows.
+    :param path: Target Parquet file.
+    :param row_group_size: Rows per block.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # Plain strings, so blocks sort and compare lexically; Parquet dictionary-encodes them on disk
+    frame = decode(frame).sort_values([column for column in SORT_COLUMNS if column in frame], kind="stable")
+    frame = frame.reset_index(drop=True)
+    stats = [block_stats(frame.iloc[start:start + row_group_size]) for start in range(0, len(frame), row_group_size)]
+
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), STATS_KEY: json.dumps(stats).encode()})
+    pq.write_table(table, str(path), row_group_size=row_group_size, use_dictionary=True,
+                   write_statistics=True, compression="snappy")
+
+
+def write_dataset(chunks: Iterable[pd.DataFrame], path: Path, row_group_size: int = DATASET_ROW_GROUP_SIZE) -> Path:
+    """
+    Write processed chunks as a dataset directory, replacing any previous one
+    only once every part is written.
+
+    :param chunks: Processed rows, one part file per chunk.
+    :param path: Target dataset directory.
+    :return: The dataset directory.
+    """
+    path = Path(path)
+    partial_path = path.with_name(path.name + ".partial")
+    shutil.rmtree(partial_path, ignore_errors=True)
+    partial_path.mkdir(parents=True)
+
+    for part, chunk in enumerate(chunks):
+        if len(chunk):
+            write_part(chunk, partial_path.joinpath(f"part-{part:05d}.parquet"), row_group_size)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(partial_path, path)
+    return path
+
+
+def _parts(path: Path) -> list:
+    path = Path(path)
+    return [path] if path.is_file() else sorted(path.glob("part-*.parquet"))
+
+
+@lru_cache(maxsize=8)
+def _block_index(path: str, modified: float) -> tuple:
+    import pyarrow.parquet as pq
+
+    blocks = []
+    for part in _parts(Path(path)):
+        metadata = pq.read_schema(part).metadata or {}
+        for row_group, stats in enumerate(json.loads(metadata.get(STATS_KEY, b"[]"))):
+            blocks.append((str(part), row_group, stats))
+    return tuple(blocks)
+
+
+def block_index(path: Path) -> tuple:
+    """
+    :param path: A dataset directory (or a single part file).
+    :return: (part file, row group, statistics) of every block; read from
+        the footers once per modification of the dataset.
+    """
+    return _block_index(str(path), os.path.getmtime(path))
+
+
+def _may_match(stats: dict, years, states, regions, cities, ranges) -> bool:
+    def overlaps(column, low, high):
+        bounds = stats["ranges"].get(column)
+        return bounds is None or (bounds[0] <= high and low <= bounds[1])
+
+    def shares(column, values):
+        return column not in stats["values"] or not set(stats["values"][column]).isdisjoint(values)
+
+    if years is not None and not overlaps('CommissioningYear', years[0], years[1]):
+        return False
+    if states is not None and not shares('State', states):
+        return False
+    if regions is not None and not shares('AdministrativeRegion', regions):
+        return False
+    if cities is not None and not any(overlaps('City', city, city) for city in cities):
+        return False
+    return all(overlaps(column, low, high) for column, (low, high) in (ranges or {}).items())
+
+
+def select_blocks(path: Path, years: Optional[tuple] = None, states: Optional[tuple] = None,
+                  regions: Optional[tuple] = None, cities: Optional[tuple] = None,
+                  ranges: Optional[dict] = None) -> list:
+    """
+    Prune the blocks of a dataset with their statistics.
+
+    :param years: Optional inclusive (first, last) commissioning year range.
+    :param states: Optional states to include.
+    :param regions: Optional administrative regions to include.
+    :param cities: Optional districts to include.
+    :param ranges: Optional inclusive (low, high) bounds per numeric column.
+    :return: (part file, row group) of every block that may hold matching rows.
+    """
+    return [
+        (part, row_group)
+        for part, row_group, stats in block_index(path)
+        if _may_match(stats, years, states, regions, cities, ranges)
+    ]
+
+
+def read_filtered(path: Path, years: Optional[tuple] = None, states: Optional[tuple] = None,
+                  regions: Optional[tuple] = None, cities: Optional[tuple] = None,
+                  ranges: Optional[dict] = None, columns: Optional[list] = None) -> pd.DataFrame:
+    """
+    Read the rows of a selection, decoding only the blocks that may match.
+
+    Filters are as for `select_blocks`; the rows of the selected blocks are
+    then filtered exactly.
+
+    :param columns: Optional columns to return; all by default.
+    :return: The matching rows.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    selected = {}
+    for part, row_group in select_blocks(path, years, states, regions, cities, ranges):
+        selected.setdefault(part, []).append(row_group)
+
+    filter_columns = ['CommissioningYear', 'State', 'AdministrativeRegion', 'City'] + list(ranges or {})
+    read_columns = None if columns is None else list(dict.fromkeys(list(columns) + filter_columns))
+    tables = [pq.ParquetFile(part).read_row_groups(row_groups, columns=read_columns)
+              for part, row_groups in selected.items()]
+    if not tables:
+        schema = pq.read_schema(_parts(path)[0]) if _parts(path) else pa.schema([])
+        tables = [schema.empty_table()]
+    frame = pa.concat_tables(tables).to_pandas()
+
+    mask = np.ones(len(frame), dtype=bool)
+    if years is not None:
+        mask &= frame['CommissioningYear'].between(years[0], years[1]).to_numpy()
+    for column, values in (('State', states), ('AdministrativeRegion', regions), ('City', cities)):
+        if values is not None:
+            mask &= frame[column].isin(list(values)).to_numpy()
+    for column, (low, high) in (ranges or {}).items():
+        mask &= frame[column].between(low, high).to_numpy()
+
+    frame = frame[mask].reset_index(drop=True)
+    return frame if columns is None else frame[list(columns)]
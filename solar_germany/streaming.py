@@ -0,0 +1,196 @@
+import codecs
+import io
+import json
+import queue
+import threading
+
+from solar_germany.params import STREAM_CHUNK_SIZE, STREAM_PREFETCH_CHUNKS
+
+
+# Bounded-memory readers for large downloads.
+#
+# Instead of downloading a whole object into one bytes (and then one str)
+# before parsing it, loads read from a `PrefetchReader`: a file-like object
+# whose next chunks are downloaded by a background thread while the current
+# one is parsed, with at most STREAM_PREFETCH_CHUNKS chunks held ahead.
+#
+#   - CSV: pandas parses straight from the reader, chunk by chunk.
+#   - JSON: `load_json` decodes the elements of the one big array of an
+#     object (the "features" of a GeoJSON FeatureCollection) one at a time,
+#     so only the parsed object and about one chunk of text are in memory.
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+_NUMBER_CHARACTERS = "0123456789.eE+-"
+
+
+class PrefetchReader(io.RawIOBase):
+    """
+    Binary file-like reader over a stream that is read ahead in the background.
+
+    :param source: A binary file-like object, e.g. ``blob.open("rb")``; it is
+        closed once read to the end or when the reader is closed.
+    :param chunk_size: Bytes per read of `source`.
+    :param depth: Chunks read ahead of the consumer at most.
+    :param executor: Optional executor to read `source` on; a dedicated
+        thread by default.
+    """
+
+    def __init__(self, source, chunk_size: int = STREAM_CHUNK_SIZE, depth: int = STREAM_PREFETCH_CHUNKS,
+                 executor=None):
+        super().__init__()
+        self._source = source
+        self._chunks = queue.Queue(maxsize=depth)
+        self._stopped = threading.Event()
+        self._buffer = memoryview(b"")
+        self._finished = False
+        if executor is None:
+            threading.Thread(target=self._produce, args=(chunk_size,), daemon=True).start()
+        else:
+            executor.submit(self._produce, chunk_size)
+
+    def _produce(self, chunk_size: int) -> None:
+        try:
+            while not self._stopped.is_set():
+                chunk = self._source.read(chunk_size)
+                self._chunks.put(chunk)
+                if not chunk:
+                    break
+        except Exception as e:
+            self._chunks.put(e)
+        finally:
+            self._source.close()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if not self._buffer:
+            if self._finished:
+                return 0
+            chunk = self._chunks.get()
+            if isinstance(chunk, Exception):
+                self._finished = True
+                raise chunk
+            if not chunk:
+                self._finished = True
+                return 0
+            self._buffer = memoryview(chunk)
+
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+    def close(self) -> None:
+        if not self.closed:
+            # Unblock the producer if it waits for room; it stops before its next read
+            self._stopped.set()
+            while True:
+                try:
+                    self._chunks.get_nowait()
+                except queue.Empty:
+                    break
+        super().close()
+
+
+class _Scanner:
+    # Decodes JSON values from a window of text over a binary stream
+    def __init__(self, stream, read_size: int):
+        self._stream = stream
+        self._read_size = read_size
+        self._utf8 = codecs.getincrementaldecoder("utf-8-sig")()
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, size: int) -> bool:
+        if self.eof:
+            return False
+        data = self._stream.read(size)
+        self.eof = not data
+        self.text = self.text[self.pos:] + self._utf8.decode(data, final=self.eof)
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Skip whitespace; return the next character, "" at the end."""
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self._fill(self._read_size):
+                return ""
+
+    def expect(self, characters: str) -> str:
+        character = self.peek()
+        if not character or character not in characters:
+            raise ValueError(f"Invalid JSON: expected one of {characters!r}, got {character or 'end of data'!r}")
+        self.pos += 1
+        return character
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.text, self.pos)
+                # A number cut by the end of the window decodes as a shorter one ("-2." of "-2.5e-3")
+                complete = end < len(self.text) and self.text[end] not in _NUMBER_CHARACTERS
+                if complete or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # Double the window before rescanning, so a large value is rescanned only a few times
+            window = len(self.text) - self.pos
+            while len(self.text) - self.pos <= 2 * window and self._fill(self._read_size):
+                pass
+
+
+def _members(scanner: _Scanner, result: dict, array_key: str) -> None:
+    while True:
+        key = scanner.value()
+        if not isinstance(key, str):
+            raise ValueError(f"Invalid JSON: object key {key!r} is not a string")
+        scanner.expect(":")
+        if key == array_key and scanner.peek() == "[":
+            scanner.pos += 1
+            items = []
+            if scanner.peek() == "]":
+                scanner.pos += 1
+            else:
+                items.append(scanner.value())
+                while scanner.expect(",]") == ",":
+                    items.append(scanner.value())
+            result[key] = items
+        else:
+            result[key] = scanner.value()
+
+        if scanner.expect(",}") == "}":
+            return
+
+
+def load_json(stream, array_key: str = "features", read_size: int = STREAM_CHUNK_SIZE) -> dict:
+    """
+    Parse a JSON object from a binary stream, decoding the elements of its
+    `array_key` array one at a time as the data arrives.
+
+    :param stream: A binary file-like object, e.g. a `PrefetchReader`.
+    :param array_key: Member whose array is streamed; other members are
+        decoded whole.
+    :param read_size: Bytes read from `stream` at a time.
+    :return: The parsed object, as `json.load` would return it.
+    :raises ValueError: If the data is not a JSON object.
+    """
+    scanner = _Scanner(stream, read_size)
+    result = {}
+    scanner.expect("{")
+    if scanner.peek() != "}":
+        _members(scanner, result, array_key)
+    else:
+        scanner.pos += 1
+    if scanner.peek():
+        raise ValueError("Invalid JSON: extra data after the object")
+    return result
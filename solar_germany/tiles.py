@@ -0,0 +1,370 @@
+import math
+import os
+import shutil
+import struct
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from colorama import Fore, Style
+
+from solar_germany.aggregates import GEOGRAPHY_LEVELS, geography_cube
+from solar_germany.clients import load_blob_json
+from solar_germany.params import (BUCKET_NAME, DISTRICT_PROPERTIES, DISTRICTS_GEOJSON_FILE, LOCAL_DATA_PATH,
+                                  METRIC_COLUMNS, STATES_GEOJSON_FILE, TILE_EXTENT, TILE_LEVELS, TILE_PATH)
+
+
+# Offline Mapbox Vector Tile (MVT) generation.
+#
+# For every map level (state, region, district) and zoom in TILE_LEVELS the
+# polygons are simplified to about one pixel at that zoom, clipped to each
+# tile, quantized to TILE_EXTENT and encoded as MVT with the yearly metrics of
+# each area as feature properties ("GrossPower_2023", ...). Tiles are written
+# to TILE_PATH/{level}/{z}/{x}/{y}.pbf and served from there as-is. Every
+# build starts from an empty directory that replaces the previous cache once
+# complete, so tiles an earlier build produced never outlive it.
+
+TILE_BUFFER = 64  # in tile units, so polygons overlap a bit across tile edges
+LEVEL_COLUMNS = {
+    "state": GEOGRAPHY_LEVELS[:1],
+    "region": GEOGRAPHY_LEVELS[:2],
+    "district": GEOGRAPHY_LEVELS,
+}
+
+
+# --- Web Mercator tile math -------------------------------------------------
+
+def lon_to_tile_x(lon, zoom: int):
+    return (np.asarray(lon) + 180.0) / 360.0 * (1 << zoom)
+
+
+def lat_to_tile_y(lat, zoom: int):
+    lat = np.radians(np.clip(np.asarray(lat), -85.0511, 85.0511))
+    return (1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / math.pi) / 2.0 * (1 << zoom)
+
+
+def tile_x_to_lon(x: float, zoom: int) -> float:
+    return x / (1 << zoom) * 360.0 - 180.0
+
+
+def tile_y_to_lat(y: float, zoom: int) -> float:
+    return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / (1 << zoom)))))
+
+
+def tile_bounds(zoom: int, x: int, y: int, buffer: float = 0.0) -> tuple:
+    """
+    :param buffer: Extra margin as a fraction of the tile size.
+    :return: (min_lon, min_lat, max_lon, max_lat) of a tile.
+    """
+    return (
+        tile_x_to_lon(x - buffer, zoom),
+        tile_y_to_lat(y + 1 + buffer, zoom),
+        tile_x_to_lon(x + 1 + buffer, zoom),
+        tile_y_to_lat(y - buffer, zoom),
+    )
+
+
+def tiles_covering(bounds: tuple, zoom: int):
+    """
+    :param bounds: (min_lon, min_lat, max_lon, max_lat).
+    :return: Every (x, y) tile at `zoom` intersecting the bounds.
+    """
+    min_lon, min_lat, max_lon, max_lat = bounds
+    x_range = range(int(lon_to_tile_x(min_lon, zoom)), int(lon_to_tile_x(max_lon, zoom)) + 1)
+    y_range = range(int(lat_to_tile_y(max_lat, zoom)), int(lat_to_tile_y(min_lat, zoom)) + 1)
+    return [(x, y) for x in x_range for y in y_range]
+
+
+# --- Protocol buffer encoding (vector_tile.proto, version 2) ---------------
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _zigzag(value: int) -> int:
+    return (value << 1) ^ (value >> 63)
+
+
+def _field(number: int, wire_type: int) -> bytes:
+    return _varint((number << 3) | wire_type)
+
+
+def _length_delimited(number: int, payload: bytes) -> bytes:
+    return _field(number, 2) + _varint(len(payload)) + payload
+
+
+def _packed(number: int, values) -> bytes:
+    return _length_delimited(number, b"".join(_varint(value) for value in values))
+
+
+def _encode_value(value) -> bytes:
+    if isinstance(value, str):
+        return _length_delimited(1, value.encode())
+    return _field(3, 1) + struct.pack("<d", float(value))
+
+
+def _encode_polygons(geometry) -> list:
+    """
+    Encode a (multi)polygon in tile coordinates as MVT geometry commands.
+
+    Exterior rings get a positive area and holes a negative one, as the MVT
+    specification requires; rings that collapsed to fewer than three points
+    are dropped together with their holes.
+    """
+    from shapely.geometry.polygon import orient
+
+    commands = []
+    cursor_x, cursor_y = 0, 0
+    for polygon in getattr(geometry, "geoms", [geometry]):
+        if polygon.geom_type != "Polygon" or polygon.is_empty:
+            continue
+        polygon = orient(polygon, sign=1.0)
+        for ring_id, ring in enumerate([polygon.exterior, *polygon.interiors]):
+            points = [(int(x), int(y)) for x, y in ring.coords[:-1]]
+            if len(points) < 3:
+                if ring_id == 0:
+                    break
+                continue
+
+            commands.append(1 | (1 << 3))  # MoveTo
+            commands += [_zigzag(points[0][0] - cursor_x), _zigzag(points[0][1] - cursor_y)]
+            cursor_x, cursor_y = points[0]
+
+            commands.append(2 | ((len(points) - 1) << 3))  # LineTo
+            for x, y in points[1:]:
+                commands += [_zigzag(x - cursor_x), _zigzag(y - cursor_y)]
+                cursor_x, cursor_y = x, y
+
+            commands.append(7 | (1 << 3))  # ClosePath
+    return commands
+
+
+def encode_layer(name: str, features: list, extent: int = TILE_EXTENT) -> bytes:
+    """
+    Encode one MVT layer.
+
+    :param name: Layer name.
+    :param features: (id, geometry in tile coordinates, properties) tuples.
+    :param extent: Tile extent the coordinates are quantized to.
+    :return: The layer as a serialized `Tile` message.
+    """
+    keys, values = {}, {}
+    encoded_features = []
+    for feature_id, geometry, properties in features:
+        commands = _encode_polygons(geometry)
+        if not commands:
+            continue
+        tags = []
+        for key, value in properties.items():
+            if value is None or (isinstance(value, float) and math.isnan(value)):
+                continue
+            tags.append(keys.setdefault(key, len(keys)))
+            tags.append(values.setdefault(value, len(values)))
+        encoded_features.append(
+            _field(1, 0) + _varint(feature_id)
+            + _packed(2, tags)
+            + _field(3, 0) + _varint(3)  # POLYGON
+            + _packed(4, commands)
+        )
+
+    if not encoded_features:
+        return b""
+
+    layer = (
+        _field(15, 0) + _varint(2)
+        + _length_delimited(1, name.encode())
+        + b"".join(_length_delimited(2, feature) for feature in encoded_features)
+        + b"".join(_length_delimited(3, key.encode()) for key in keys)
+        + b"".join(_length_delimited(4, _encode_value(value)) for value in values)
+        + _field(5, 0) + _varint(extent)
+    )
+    return _length_delimited(3, layer)
+
+
+# --- Tile generation ---------------------------------------------------------
+
+def level_areas(level: str, states_geojson: dict, districts_geojson: dict, level_properties: dict) -> pd.DataFrame:
+    """
+    Collect the polygons of one map level.
+
+    States come from the state GeoJSON; regions are dissolved from the
+    districts of each administrative region.
+
+    :param level: "state", "region" or "district".
+    :param states_geojson: State polygons, named by their "name" property.
+    :param districts_geojson: District polygons.
+    :param level_properties: Geography level to district feature property.
+    :return: Frame with the level's geography columns and a `geometry` column.
+    """
+    import shapely
+    from shapely.geometry import shape
+
+    if level == "state":
+        return pd.DataFrame([
+            {"State": feature["properties"]["name"], "geometry": shape(feature["geometry"])}
+            for feature in states_geojson["features"] if feature.get("geometry")
+        ])
+
+    districts = pd.DataFrame([
+        {**{column: feature["properties"].get(prop) for column, prop in level_properties.items()},
+         "geometry": shape(feature["geometry"])}
+        for feature in districts_geojson["features"] if feature.get("geometry")
+    ])
+    if level == "district":
+        return districts
+
+    columns = LEVEL_COLUMNS[level]
+    return (
+        districts.groupby(columns)["geometry"]
+        .apply(lambda geometries: shapely.union_all(geometries.to_numpy()))
+        .reset_index()
+    )
+
+
+def yearly_properties(cube: pd.DataFrame, columns: list) -> pd.DataFrame:
+    """
+    Pivot the geography cube to one row per area with a column per metric
+    and year, e.g. "NumberOfModules_2023".
+    """
+    totals = cube.groupby(columns + ["CommissioningYear"])[METRIC_COLUMNS].sum().unstack("CommissioningYear")
+    totals.columns = [f"{metric}_{int(year)}" for metric, year in totals.columns]
+    return totals
+
+
+def generate_level_tiles(level: str, areas: pd.DataFrame, properties: pd.DataFrame,
+                         min_zoom: int, max_zoom: int, output_dir: Path) -> int:
+    """
+    Write the tiles of one map level.
+
+    :return: Number of tiles written.
+    """
+    import shapely
+    from shapely.strtree import STRtree
+
+    columns = LEVEL_COLUMNS[level]
+    areas = areas.join(properties, on=columns)
+    geometries = areas["geometry"].to_numpy()
+    tree = STRtree(geometries)
+    bounds = tuple(shapely.total_bounds(geometries))
+    records = areas.drop(columns="geometry").to_dict(orient="records")
+
+    written = 0
+    for zoom in range(min_zoom, max_zoom + 1):
+        # Simplify to about one pixel at this zoom before clipping
+        tolerance = 360.0 / (1 << zoom) / TILE_EXTENT
+        simplified = shapely.simplify(geometries, tolerance, preserve_topology=True)
+
+        for x, y in tiles_covering(bounds, zoom):
+            min_lon, min_lat, max_lon, max_lat = tile_bounds(zoom, x, y, buffer=TILE_BUFFER / TILE_EXTENT)
+            hits = tree.query(shapely.box(min_lon, min_lat, max_lon, max_lat), predicate="intersects")
+            if len(hits) == 0:
+                continue
+
+            features = []
+            for area_id in np.sort(hits):
+                clipped = shapely.clip_by_rect(simplified[area_id], min_lon, min_lat, max_lon, max_lat)
+                if clipped.is_empty:
+                    continue
+                projected = shapely.transform(clipped, lambda coords: np.column_stack([
+                    (lon_to_tile_x(coords[:, 0], zoom) - x) * TILE_EXTENT,
+                    (lat_to_tile_y(coords[:, 1], zoom) - y) * TILE_EXTENT,
+                ]))
+                projected = shapely.set_precision(projected, 1.0)
+                if not projected.is_empty:
+                    features.append((int(area_id), projected, records[area_id]))
+
+            tile = encode_layer(level, features)
+            if tile:
+                tile_path = output_dir.joinpath(level, str(zoom), str(x), f"{y}.pbf")
+                tile_path.parent.mkdir(parents=True, exist_ok=True)
+                tile_path.write_bytes(tile)
+                written += 1
+
+        print(f"{level} z{zoom}: {written} tiles so far")
+    return written
+
+
+def generate_tiles(data: pd.DataFrame, data_version: str, states_geojson: dict, districts_geojson: dict,
+                   level_properties: dict, output_dir: str = TILE_PATH, levels: dict = TILE_LEVELS) -> dict:
+    """
+    Pre-generate the vector tiles of every map level.
+
+    :param data: The processed solar dataset.
+    :param data_version: Version string of the processed dataset.
+    :param states_geojson: State polygons, named by their "name" property.
+    :param districts_geojson: District polygons; region and district levels
+        are skipped if None.
+    :param level_properties: Geography level to district feature property.
+    :param output_dir: Root directory of the tile cache; replaced as a whole
+        once every tile is written.
+    :param levels: Level name to its (min_zoom, max_zoom).
+    :return: Number of tiles written per level.
+    """
+    print(Fore.MAGENTA + "\n ⭐️ Generating vector tiles" + Style.RESET_ALL)
+
+    output_path = Path(output_dir)
+    partial_path = output_path.with_name(output_path.name + ".partial")
+    shutil.rmtree(partial_path, ignore_errors=True)
+    partial_path.mkdir(parents=True)
+
+    cube = geography_cube(data, data_version).reset_index()
+    written = {}
+    try:
+        for level, (min_zoom, max_zoom) in levels.items():
+            if level != "state" and districts_geojson is None:
+                print(f"Skipping {level} tiles, no district polygons available")
+                continue
+            areas = level_areas(level, states_geojson, districts_geojson, level_properties)
+            properties = yearly_properties(cube, LEVEL_COLUMNS[level])
+            written[level] = generate_level_tiles(level, areas, properties, min_zoom, max_zoom, partial_path)
+    except BaseException:
+        shutil.rmtree(partial_path, ignore_errors=True)
+        raise
+
+    shutil.rmtree(output_path, ignore_errors=True)
+    os.replace(partial_path, output_path)
+    print(Fore.GREEN + f"✅ Vector tiles saved to {output_dir}: {written}" + Style.RESET_ALL)
+    return written
+
+
+def build_tiles(min_year: int = 2000, max_year: int = 2024) -> dict:
+    """
+    Generate the tile cache from the processed data of a year range and the
+    GeoJSON files in the bucket.
+
+    :param min_year: First commissioning year of the processed data.
+    :param max_year: Last commissioning year of the processed data.
+    :return: Number of tiles written per level.
+    """
+    from solar_germany.processing import dataset_version
+
+    processed_data_path = Path(LOCAL_DATA_PATH).joinpath(f"processed_solar_data_{min_year}_{max_year}.csv")
+    data = pd.read_csv(processed_data_path)
+    states_geojson = load_blob_json(BUCKET_NAME, STATES_GEOJSON_FILE)
+    try:
+        districts_geojson = load_blob_json(BUCKET_NAME, DISTRICTS_GEOJSON_FILE)
+    except Exception as e:
+        print(f"District polygons not available: {str(e)}")
+        districts_geojson = None
+
+    return generate_tiles(data, dataset_version(processed_data_path), states_geojson, districts_geojson, DISTRICT_PROPERTIES)
+
+
+def read_tile(level: str, zoom: int, x: int, y: int, tile_dir: str = TILE_PATH) -> bytes:
+    """
+    Read a pre-generated tile from the tile cache.
+
+    :return: The tile, or empty bytes if no area of the level touches it.
+    """
+    if level not in LEVEL_COLUMNS:
+        raise ValueError(f"Unknown tile level {level!r}")
+    tile_path = Path(tile_dir).joinpath(level, str(int(zoom)), str(int(x)), f"{int(y)}.pbf")
+    return tile_path.read_bytes() if tile_path.is_file() else b""
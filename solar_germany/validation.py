@@ -0,0 +1,143 @@
+import json
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from solar_germany.params import CATEGORY_VOCABULARIES, EFFICIENCY_RANGE, REQUIRED_COLUMNS, VALUE_RANGES
+
+
+# Validation and quarantine of raw rows, before preprocessing.
+#
+# Every rule is a vectorized check over whole columns that sets one bit of a
+# per-row reason code, so a chunk is validated in a single pass without any
+# per-row Python. Rows with a non-zero code are quarantined: they are kept out
+# of the processed data and written to a side file with their reasons spelled
+# out, and the number of rows failing each rule is recorded.
+
+REASONS = (
+    [f"missing_{column}" for column in REQUIRED_COLUMNS]
+    + [f"not_numeric_{column}" for column in VALUE_RANGES]
+    + [f"out_of_range_{column}" for column in VALUE_RANGES]
+    + [f"unknown_{column}" for column in CATEGORY_VOCABULARIES]
+    + ["efficiency_outlier"]
+)
+_BITS = {reason: np.uint32(1) << np.uint32(bit) for bit, reason in enumerate(REASONS)}
+_VOCABULARIES = {column: pd.Index(values) for column, values in CATEGORY_VOCABULARIES.items()}
+
+
+def reason_codes(chunk: pd.DataFrame) -> np.ndarray:
+    """
+    Check every row of a raw chunk.
+
+    Numeric columns that arrive as strings are converted in place; values
+    that cannot be converted become NaN and are flagged as not numeric.
+
+    :param chunk: Raw rows.
+    :return: One uint32 per row, a bit set for every failed rule (see REASONS).
+    """
+    codes = np.zeros(len(chunk), dtype=np.uint32)
+
+    def flag(reason: str, mask) -> None:
+        codes[np.asarray(mask, dtype=bool)] |= _BITS[reason]
+
+    for column, (low, high) in VALUE_RANGES.items():
+        if not pd.api.types.is_numeric_dtype(chunk[column]):
+            converted = pd.to_numeric(chunk[column], errors="coerce")
+            flag(f"not_numeric_{column}", converted.isna() & chunk[column].notna())
+            chunk[column] = converted
+        values = chunk[column].to_numpy(dtype=float, na_value=np.nan)
+        flag(f"out_of_range_{column}", (values < low) | (values > high))
+
+    for column in REQUIRED_COLUMNS:
+        flag(f"missing_{column}", chunk[column].isna())
+
+    for column, vocabulary in _VOCABULARIES.items():
+        flag(f"unknown_{column}", ~chunk[column].isin(vocabulary) & chunk[column].notna())
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        efficiency = chunk["GrossPower"].to_numpy(dtype=float, na_value=np.nan) / chunk["NetRatedPower"].to_numpy(dtype=float, na_value=np.nan)
+        flag("efficiency_outlier", ~((efficiency >= EFFICIENCY_RANGE[0]) & (efficiency <= EFFICIENCY_RANGE[1])))
+    return codes
+
+
+def describe(codes: np.ndarray) -> list:
+    """
+    :return: The reasons of each code, as "reason;reason" strings.
+    """
+    unique_codes, positions = np.unique(np.asarray(codes, dtype=np.uint32), return_inverse=True)
+    names = np.array([";".join(reason for reason, bit in _BITS.items() if code & bit) for code in unique_codes], dtype=object)
+    return list(names[positions.reshape(-1)])
+
+
+def count_reasons(codes: np.ndarray, counts=None) -> dict:
+    """
+    :param codes: Reason codes.
+    :param counts: Optional number of rows having each code (for distinct codes).
+    :return: Number of rows failing each rule.
+    """
+    codes = np.asarray(codes, dtype=np.uint32)
+    counts = np.ones(len(codes), dtype=np.int64) if counts is None else np.asarray(counts)
+    return {reason: int(counts[(codes & bit) != 0].sum()) for reason, bit in _BITS.items()}
+
+
+def validate_chunk(chunk: pd.DataFrame) -> tuple:
+    """
+    Split a raw chunk into valid and quarantined rows.
+
+    :param chunk: Raw rows.
+    :return: The valid rows, the quarantined rows with a `Reasons` column,
+        and the number of rows failing each rule.
+    """
+    codes = reason_codes(chunk)
+    bad = codes != 0
+    if not bad.any():
+        return chunk, chunk.iloc[:0].assign(Reasons=[]), count_reasons(codes)
+
+    quarantined = chunk[bad].assign(Reasons=describe(codes[bad]))
+    return chunk[~bad].copy(), quarantined, count_reasons(codes)
+
+
+def with_reason_codes(chunk: pd.DataFrame) -> pd.DataFrame:
+    """
+    :return: The chunk with a `ReasonCodes` column (for dask partitions).
+    """
+    codes = reason_codes(chunk)
+    return chunk.assign(ReasonCodes=codes)
+
+
+def with_reasons(chunk: pd.DataFrame) -> pd.DataFrame:
+    """
+    :return: The chunk with `ReasonCodes` spelled out as a `Reasons` column.
+    """
+    return chunk.assign(Reasons=describe(chunk["ReasonCodes"].to_numpy())).drop(columns="ReasonCodes")
+
+
+class QualityStats:
+    """
+    Running data-quality counts of a preprocessing run.
+    """
+
+    def __init__(self):
+        self.rows_checked = 0
+        self.rows_quarantined = 0
+        self.reasons = dict.fromkeys(REASONS, 0)
+
+    def add(self, rows_checked: int, rows_quarantined: int, reasons: dict) -> None:
+        self.rows_checked += rows_checked
+        self.rows_quarantined += rows_quarantined
+        for reason, count in reasons.items():
+            self.reasons[reason] += count
+
+    def to_dict(self) -> dict:
+        return {
+            "created_at": datetime.now().isoformat(),
+            "rows_checked": self.rows_checked,
+            "rows_valid": self.rows_checked - self.rows_quarantined,
+            "rows_quarantined": self.rows_quarantined,
+            "reasons": {reason: count for reason, count in self.reasons.items() if count},
+        }
+
+    def save(self, path: Path) -> None:
+        Path(path).write_text(json.dumps(self.to_dict(), indent=2))
@@ -0,0 +1,162 @@
+import pandas as pd
+
+from solar_germany.aggregates import modules_by_state, rollup, year_summary
+from solar_germany.analytics import yearly_series
+from solar_germany.cache import memoize
+from solar_germany.dictionary import decode
+
+
+# Data preparation for the dashboard views.
+#
+# Every function below computes what a single view (or sidebar widget) needs
+# and is memoized on its filter arguments, so a rerun only pays for the view
+# that is on screen. Results live in the process-wide cache shared by all
+# sessions; the frame itself is never hashed, `data_version` identifies it.
+
+
+@memoize
+def state_options(data: pd.DataFrame, data_version: str) -> list:
+    """
+    List the states available in the dataset.
+
+    :param data: The processed solar dataset.
+    :param data_version: Version string of the processed dataset.
+    :return: Alphabetically sorted state names.
+    """
+    return sorted(data['State'].unique())
+
+
+@memoize
+def region_options(data: pd.DataFrame, data_version: str, year: int, state: str) -> list:
+    """
+    List the administrative regions of a state with units commissioned in a year.
+
+    :param data: The processed solar dataset.
+    :param data_version: Version string of the processed dataset.
+    :param year: Selected commissioning year.
+    :param state: Selected state.
+    :return: Alphabetically sorted administrative region names.
+    """
+    state_data = data[(data['CommissioningYear'] == year) & (data['State'] == state)]
+    return sorted(state_data['AdministrativeRegion'].unique())
+
+
+@memoize
+def district_options(data: pd.DataFrame, data_version: str, year: int, state: str, administrative_region: str) -> list:
+    """
+    List the districts of an administrative region with units commissioned in a year.
+
+    :param data: The processed solar dataset.
+    :param data_version: Version string of the processed dataset.
+    :param year: Selected commissioning year.
+    :param state: Selected state.
+    :param administrative_region: Selected administrative region.
+    :return: Alphabetically sorted district (city) names.
+    """
+    city_filtered_data = data[
+        (data['CommissioningYear'] == year) &
+        (data['State'] == state) &
+        (data['AdministrativeRegion'] == administrative_region)
+    ]
+    return sorted(city_filtered_data['City'].unique())
+
+
+@memoize
+def state_insights(data: pd.DataFrame, data_version: str, year: int, state: str) -> dict:
+    """
+    Prepare the "State Insights" view.
+
+    :param data: The processed solar dataset.
+    :param data_version: Version string of the processed dataset.
+    :param year: Selected commissioning year.
+    :param state: Selected state.
+    :return: Summary metrics, the per-state choropleth frame and the yearly
+        Germany / state series with cumulative module counts.
+    """
+    cumulative = {'CumulativeMetric': 'CumulativeModules'}
+
+    return {
+        **year_summary(data, data_version, year),
+        "df_grouped": modules_by_state(data, data_version, year),
+        "germany_data": yearly_series(data, data_version, 'NumberOfModules').rename(columns=cumulative),
+        "state_data_full": yearly_series(data, data_version, 'NumberOfModules', (state,)).rename(columns=cumulative),
+    }
+
+
+def _card_totals(totals: dict) -> dict:
+    # A selection without units has no efficiency; the cards show 0 for it like for the sums
+    return {**totals, 'Efficiency': 0 if pd.isna(totals['Efficiency']) else totals['Efficiency']}
+
+
+@memoize
+def regional_focus(data: pd.DataFrame, data_version: str, year: int, state: str,
+                   administrative_region: str, city: str) -> dict:
+    """
+    Prepare the metric cards of the "Regional Focus" view; its pie charts
+    come from `category_counts` (see figures.distribution_pie).
+
+    :param data: The processed solar dataset.
+    :param data_version: Version string of the processed dataset.
+    :param year: Selected commissioning year.
+    :param state: Selected state.
+    :param administrative_region: Selected administrative region.
+    :param city: Selected district.
+    :return: Region and district totals.
+    """
+    # Totals come from the cube, without touching the rows
+    region_totals = _card_totals(rollup(data, data_version, years=(year, year), states=(state,), regions=(administrative_region,)))
+    if city is None:
+        district_totals = {'GrossPower': 0, 'Efficiency': 0, 'NumberOfModules': 0}
+    else:
+        district_totals = _card_totals(rollup(data, data_version, years=(year, year), states=(state,),
+                                              regions=(administrative_region,), cities=(city,)))
+
+    return {
+        "total_power_region": region_totals['GrossPower'],
+        "avg_efficiency_region": region_totals['Efficiency'],
+        "total_modules_region": region_totals['NumberOfModules'],
+        "total_power_city": district_totals['GrossPower'],
+        "avg_efficiency_city": district_totals['Efficiency'],
+        "total_modules_city": district_totals['NumberOfModules'],
+    }
+
+
+@memoize
+def category_counts(data: pd.DataFrame, data_version: str, year: int, state: str,
+                    administrative_region: str, column: str) -> pd.DataFrame:
+    """
+    Count the units of an administrative region commissioned in a year per category.
+
+    :param data: The processed solar dataset.
+    :param data_version: Version string of the processed dataset.
+    :param year: Selected commissioning year.
+    :param state: Selected state.
+    :param administrative_region: Selected administrative region.
+    :param column: Category column, e.g. "FeedInType" or "Location".
+    :return: Frame with `column` and `Count`, most frequent first.
+    """
+    district_data = data[
+        (data['CommissioningYear'] == year) &
+        (data['State'] == state) &
+        (data['AdministrativeRegion'] == administrative_region)
+    ]
+    counts = district_data[column].value_counts()
+    # Categorical columns also count the dictionary's values that do not occur here
+    summary = decode(counts[counts > 0].reset_index())
+    summary.columns = [column, 'Count']
+    return summary
+
+
+@memoize
+def forecast_options(data: pd.DataFrame, data_version: str) -> dict:
+    """
+    Prepare the selectbox options of the "Solar Power Forecast" view.
+
+    :param data: The processed solar dataset.
+    :param data_version: Version string of the processed dataset.
+    :return: Sorted main orientations and location types.
+    """
+    return {
+        "orientations": sorted(data['MainOrientation'].unique()),
+        "locations": sorted(data['Location'].unique()),
+    }
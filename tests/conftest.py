@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def make_solar_data(rows: int = 5000, years: tuple = (2015, 2020), seed: int = 0) -> pd.DataFrame:
+    """
+    Synthetic processed rows with the columns of the real dataset.
+
+    :param rows: Number of installations.
+    :param years: Inclusive range of commissioning years.
+    :param seed: Random seed.
+    """
+    rng = np.random.default_rng(seed)
+    states = rng.choice(["Bayern", "Berlin", "Hessen"], rows)
+    regions = rng.choice(["R1", "R2"], rows)
+    cities = rng.choice(["C1", "C2", "C3"], rows)
+    net_rated_power = rng.lognormal(1.5, 0.8, rows)
+    gross_power = net_rated_power * rng.uniform(0.8, 1.3, rows)
+    return pd.DataFrame({
+        "State": states,
+        "AdministrativeRegion": [f"{state}-{region}" for state, region in zip(states, regions)],
+        "City": [f"{state}-{region}-{city}" for state, region, city in zip(states, regions, cities)],
+        "GrossPower": gross_power,
+        "NetRatedPower": net_rated_power,
+        "NumberOfModules": rng.integers(1, 120, rows),
+        "AssignedActivePowerInverter": rng.uniform(0, 30, rows),
+        "MainOrientation": rng.choice(["Süd", "Ost", "West"], rows),
+        "FeedInType": rng.choice(["Full Feed-in", "Partial Feed-in"], rows),
+        "Location": rng.choice(["Roof", "Ground"], rows),
+        "CommissioningYear": rng.integers(years[0], years[1] + 1, rows),
+        "Efficiency": gross_power / net_rated_power,
+    })
+
+
+@pytest.fixture
+def solar_data() -> pd.DataFrame:
+    return make_solar_data()
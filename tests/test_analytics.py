@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from solar_germany.aggregates import GEOGRAPHY_LEVELS, cube_from_frame
+from solar_germany.analytics import KINDS, LEVELS, TREND_METRICS, TrendIndex, trend_index, yearly_series
+from tests.conftest import make_solar_data
+
+
+def assert_same_index(incremental: TrendIndex, rebuilt: TrendIndex) -> None:
+    np.testing.assert_array_equal(incremental.years, rebuilt.years)
+    for depth in range(len(LEVELS)):
+        assert set(incremental._nodes[depth]) == set(rebuilt._nodes[depth])
+        for node in rebuilt._nodes[depth]:
+            pd.testing.assert_frame_equal(incremental.series(node), rebuilt.series(node), rtol=1e-9)
+
+    for level in LEVELS[1:]:
+        for year in rebuilt.years:
+            for kind in KINDS:
+                pd.testing.assert_frame_equal(
+                    incremental.top(level, 'GrossPower', year, kind, n=50),
+                    rebuilt.top(level, 'GrossPower', year, kind, n=50),
+                    rtol=1e-9,
+                )
+
+
+def split(data: pd.DataFrame, mask) -> tuple:
+    return cube_from_frame(data[~mask]), cube_from_frame(data[mask])
+
+
+@pytest.mark.parametrize("case", ["new_year", "middle_year", "new_nodes", "earlier_year"])
+def test_apply_matches_full_rebuild(case):
+    data = make_solar_data(rows=3000, years=(2015, 2020), seed=1)
+    if case == "new_year":
+        mask = data["CommissioningYear"] == 2020
+    elif case == "middle_year":
+        mask = (data["CommissioningYear"] == 2017) & (np.arange(len(data)) % 2 == 0)
+    elif case == "new_nodes":
+        mask = data["State"] == "Hessen"
+    else:
+        mask = data["CommissioningYear"] <= 2016
+
+    before, delta = split(data, mask)
+    incremental = TrendIndex(before).apply(delta)
+    assert_same_index(incremental, TrendIndex(cube_from_frame(data)))
+
+
+def test_apply_with_removals_matches_full_rebuild():
+    # A snapshot delta holds negative cells for removed units
+    data = make_solar_data(rows=3000, seed=2)
+    kept = data[np.arange(len(data)) % 3 != 0]
+    full, smaller = cube_from_frame(data), cube_from_frame(kept)
+    delta = smaller.sub(full, fill_value=0)
+    delta = delta[(delta != 0).any(axis=1)]
+
+    assert_same_index(TrendIndex(full).apply(delta), TrendIndex(smaller))
+
+
+def test_apply_leaves_the_original_unchanged():
+    data = make_solar_data(rows=1000, seed=3)
+    before, delta = split(data, data["CommissioningYear"] == 2020)
+    index = TrendIndex(before)
+    expected = index.series(("Bayern",)).copy()
+
+    index.apply(delta)
+    pd.testing.assert_frame_equal(index.series(("Bayern",)), expected)
+
+
+def test_series_and_growth_match_group_by(solar_data):
+    index = TrendIndex(cube_from_frame(solar_data))
+    state = solar_data[solar_data["State"] == "Berlin"]
+    annual = state.groupby("CommissioningYear")["NumberOfModules"].sum().astype(float)
+    cumulative = annual.cumsum()
+
+    series = index.series(("Berlin",))
+    np.testing.assert_allclose(series[("Annual", "NumberOfModules")], annual)
+    np.testing.assert_allclose(series[("Cumulative", "NumberOfModules")], cumulative)
+    np.testing.assert_allclose(series[("Growth", "NumberOfModules")].iloc[1:], (cumulative / cumulative.shift() - 1).iloc[1:])
+    assert np.isnan(series[("Growth", "NumberOfModules")].iloc[0])
+    assert index.series(("Nowhere",)).empty
+
+
+def test_top_matches_brute_force(solar_data):
+    index = TrendIndex(cube_from_frame(solar_data))
+    annual = solar_data.groupby(GEOGRAPHY_LEVELS + ["CommissioningYear"])["GrossPower"].sum().unstack(fill_value=0)
+    cumulative = annual.cumsum(axis=1)
+    growth = (cumulative[2019] / cumulative[2018] - 1)[cumulative[2018] >= 50].sort_values(ascending=False)
+
+    top = index.top("City", "GrossPower", 2019, "Growth", n=5, min_base=50)
+    assert list(top["City"]) == list(growth.index.get_level_values("City")[:5])
+    np.testing.assert_allclose(top["Growth"], growth.to_numpy()[:5])
+
+    within = index.top("City", "GrossPower", 2019, "Growth", n=100, within=("Bayern",))
+    assert set(within["State"]) == {"Bayern"}
+
+
+def test_yearly_series_matches_group_by(solar_data):
+    city = solar_data["City"].iloc[0]
+    node = tuple(solar_data.loc[solar_data["City"] == city, GEOGRAPHY_LEVELS].iloc[0])
+    expected = solar_data[solar_data["City"] == city].groupby("CommissioningYear")["GrossPower"].sum()
+
+    series = yearly_series(solar_data, "test-yearly-series", "GrossPower", node)
+    np.testing.assert_array_equal(series["CommissioningYear"], expected.index)
+    np.testing.assert_allclose(series["GrossPower"], expected.to_numpy())
+    np.testing.assert_allclose(series["CumulativeMetric"], expected.cumsum().to_numpy())
+    assert set(TREND_METRICS) >= {"GrossPower", "Installations"}
+
+
+def test_trend_index_derives_a_new_data_version_from_the_previous_one(monkeypatch):
+    data = make_solar_data(rows=3000, years=(2015, 2020), seed=6)
+    earlier = data[data["CommissioningYear"] < 2020]
+    trend_index(earlier, "test-derive-2019")
+
+    applied = []
+    original_apply = TrendIndex.apply
+    monkeypatch.setattr(TrendIndex, "apply", lambda self, delta: applied.append(delta) or original_apply(self, delta))
+    derived = trend_index(data, "test-derive-2020")
+
+    assert len(applied) == 1
+    assert set(applied[0].index.get_level_values("CommissioningYear")) == {2020}
+    assert_same_index(derived, TrendIndex(cube_from_frame(data)))
+
+
+def test_trend_index_rebuilds_when_cells_disappear():
+    data = make_solar_data(rows=3000, years=(2015, 2020), seed=7)
+    trend_index(data, "test-rebuild-full")
+    narrower = data[data["CommissioningYear"] >= 2017]
+
+    index = trend_index(narrower, "test-rebuild-narrower")
+    assert_same_index(index, TrendIndex(cube_from_frame(narrower)))
@@ -0,0 +1,182 @@
+import asyncio
+import io
+import itertools
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("httpx")
+TestClient = pytest.importorskip("fastapi.testclient").TestClient
+pa = pytest.importorskip("pyarrow")
+
+from api import fast
+from solar_germany.concurrency import BoundedExecutor
+from solar_germany.export import ARROW_STREAM, JSON, PARQUET
+from tests.conftest import make_solar_data
+
+_versions = itertools.count()
+
+
+@pytest.fixture
+def client(monkeypatch) -> TestClient:
+    # Serve synthetic data without the startup download (no lifespan)
+    monkeypatch.setattr(fast, "solar_data", make_solar_data(rows=3000, years=(2015, 2020), seed=40))
+    monkeypatch.setattr(fast, "data_version", f"test-api-{next(_versions)}")
+    monkeypatch.setattr(fast, "dataset_path", None)
+    return TestClient(fast.app)
+
+
+def test_summary_totals(client):
+    data = fast.solar_data
+    selected = data[data["CommissioningYear"].between(2016, 2018) & (data["State"] == "Bayern")]
+
+    response = client.get("/summary", params={"start_year": 2016, "end_year": 2018, "state": "Bayern"})
+    assert response.status_code == 200
+    summary = response.json()
+    assert summary["Installations"] == len(selected)
+    assert summary["GrossPower"] == pytest.approx(selected["GrossPower"].sum())
+    assert summary["Efficiency"] == pytest.approx(selected["GrossPower"].sum() / selected["NetRatedPower"].sum())
+    assert set(summary["GrossPowerQuantiles"]) == {"p50", "p90"}
+    assert summary["approximate"] is False
+
+
+@pytest.mark.parametrize("params", [
+    {"start_year": 1990, "end_year": 1991},
+    {"state": "Bayern", "city": "Nowhere"},
+])
+@pytest.mark.parametrize("approximate", [False, True])
+def test_summary_of_an_empty_selection(client, params, approximate):
+    response = client.get("/summary", params={**params, "approximate": approximate})
+    assert response.status_code == 200
+    summary = response.json()
+    assert summary["GrossPowerQuantiles"] == {"p50": None, "p90": None}
+    if approximate:
+        assert summary["GrossPower"]["estimate"] == 0
+    else:
+        assert summary["Installations"] == 0
+        assert summary["Efficiency"] is None and summary["MeanEfficiency"] is None
+
+
+def test_summary_rejects_reversed_years(client):
+    assert client.get("/summary", params={"start_year": 2020, "end_year": 2010}).status_code == 400
+
+
+def test_overloaded_server_answers_503(client, monkeypatch):
+    # One worker, no queue, and the worker is busy
+    executor = BoundedExecutor(max_workers=1, max_queue=0)
+    monkeypatch.setattr(fast, "cpu_executor", executor)
+    release = threading.Event()
+    busy = threading.Thread(target=asyncio.run, args=(executor.run(release.wait),))
+    busy.start()
+    try:
+        while executor.in_flight == 0:
+            time.sleep(0.01)
+        response = client.get("/summary")
+    finally:
+        release.set()
+        busy.join()
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert client.get("/summary").status_code == 200
+
+
+@pytest.mark.parametrize("headers, params, media_type", [
+    ({}, {}, JSON),
+    ({"Accept": ARROW_STREAM}, {}, ARROW_STREAM),
+    ({"Accept": f"{ARROW_STREAM};q=0"}, {}, JSON),
+    ({"Accept": ARROW_STREAM}, {"format": "parquet"}, PARQUET),
+])
+def test_data_negotiates_its_format(client, headers, params, media_type):
+    response = client.get("/data", params={"limit": 5, **params}, headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith(media_type)
+
+    if media_type == JSON:
+        rows = pd.DataFrame(response.json())
+    elif media_type == ARROW_STREAM:
+        rows = pa.ipc.open_stream(pa.py_buffer(response.content)).read_pandas()
+    else:
+        rows = pd.read_parquet(io.BytesIO(response.content))
+    assert len(rows) == 5
+    assert rows["GrossPower"].tolist() == pytest.approx(fast.solar_data["GrossPower"].head(5).tolist())
+
+
+def test_data_rejects_unknown_formats(client):
+    assert client.get("/data", params={"format": "csv"}).status_code == 400
+
+
+def test_filter_returns_the_matching_rows(client):
+    data = fast.solar_data
+    expected = data[(data["State"] == "Hessen") & (data["CommissioningYear"] == 2017)
+                    & (data["AdministrativeRegion"] == "Hessen-R2")]
+
+    response = client.post("/filter", params={"format": "arrow"},
+                           json={"state": "Hessen", "year": 2017, "administrative_region": "Hessen-R2"})
+    rows = pa.ipc.open_stream(pa.py_buffer(response.content)).read_pandas()
+    assert len(rows) == len(expected) > 0
+    assert set(rows["AdministrativeRegion"]) == {"Hessen-R2"}
+
+    response = client.post("/filter", json={"state": "Hessen", "year": 1990})
+    assert response.status_code == 404
+
+
+def test_compare_snapshots(client, tmp_path, monkeypatch):
+    from solar_germany import snapshots
+
+    monkeypatch.setattr(snapshots, "SNAPSHOT_PATH", str(tmp_path))
+    data = make_solar_data(rows=1000, seed=43)[snapshots.RAW_COLUMNS]
+    snapshots.create_snapshot("base", [data])
+    snapshots.create_snapshot("next", [data[data["State"] != "Berlin"]], parent="base")
+
+    response = client.get("/snapshots/compare", params={"base": "base", "target": "next"})
+    assert response.status_code == 200
+    berlin = next(record for record in response.json() if record["State"] == "Berlin")
+    assert berlin["target_GrossPower"] == 0
+    assert berlin["change_GrossPower"] == pytest.approx(-data.loc[data["State"] == "Berlin", "GrossPower"].sum())
+
+    assert client.get("/snapshots/compare", params={"base": "base", "target": "missing"}).status_code == 404
+    assert client.get("/snapshots/compare", params={"base": "base", "target": "next", "level": "Year"}).status_code == 400
+
+
+def test_locate_and_aggregate_by_bounding_box(client, monkeypatch):
+    pytest.importorskip("shapely")
+    from solar_germany.spatial import SpatialIndex
+    from tests.test_spatial import DISTRICTS, LEVELS
+
+    monkeypatch.setattr(fast, "district_index", SpatialIndex(DISTRICTS, LEVELS))
+    located = client.get("/locate", params={"lat": 48.5, "lon": 10.5})
+    assert located.status_code == 200 and located.json()["City"] == "Bayern-R1-C1"
+    assert client.get("/locate", params={"lat": 0, "lon": 0}).status_code == 404
+
+    data = fast.solar_data
+    selected = data[data["City"].isin(["Bayern-R1-C1", "Bayern-R1-C2"]) & (data["CommissioningYear"] == 2018)]
+    response = client.get("/aggregate/bbox", params={"min_lon": 10.2, "min_lat": 48.2, "max_lon": 11.2, "max_lat": 48.4, "year": 2018})
+    assert response.status_code == 200
+    assert [area["City"] for area in response.json()["areas"]] == ["Bayern-R1-C1", "Bayern-R1-C2"]
+    assert response.json()["totals"]["GrossPower"] == pytest.approx(selected["GrossPower"].sum())
+
+    reversed_box = {"min_lon": 11.2, "min_lat": 48.2, "max_lon": 10.2, "max_lat": 48.4}
+    assert client.get("/aggregate/bbox", params=reversed_box).status_code == 400
+
+
+def test_predict_answers_repeated_configurations_from_the_cache(client, monkeypatch):
+    from solar_germany.prediction import clear_prediction_cache
+    from tests.test_prediction import ModulesModel, installation
+
+    model = ModulesModel(scale=2.0)
+    monkeypatch.setattr(fast, "model", model)
+    monkeypatch.setattr(fast, "model_digest", f"test-api-model-{next(_versions)}")
+    clear_prediction_cache()
+
+    response = client.post("/predict", json=[installation(), installation(NumberOfModules=30), installation()])
+    assert response.status_code == 200
+    assert [result["GrossPower"] for result in response.json()] == [40.0, 60.0, 40.0]
+    assert model.rows == 2
+
+    assert client.post("/predict", json=[installation()]).json()[0]["NetRatedPower"] == 20.0
+    assert model.rows == 2
+    assert client.post("/predict", json=[]).status_code == 400
+    clear_prediction_cache()
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from solar_germany.approximate import estimate_distinct, estimate_totals
+from solar_germany.params import HLL_PRECISION
+from tests.conftest import make_solar_data
+
+
+def test_totals_are_exact_when_every_stratum_is_sampled_whole(solar_data):
+    # 5000 rows over 3 states and 6 years stay below SAMPLE_PER_STRATUM per stratum
+    totals = estimate_totals(solar_data, "test-exact-totals", years=(2016, 2018), states=("Bayern",))
+    selected = solar_data[solar_data["CommissioningYear"].between(2016, 2018) & (solar_data["State"] == "Bayern")]
+
+    assert totals["Installations"]["estimate"] == pytest.approx(len(selected))
+    assert totals["GrossPower"]["estimate"] == pytest.approx(selected["GrossPower"].sum())
+    assert totals["GrossPower"]["ci_high"] == pytest.approx(totals["GrossPower"]["ci_low"])
+
+
+def test_sampled_totals_cover_the_exact_sum():
+    data = make_solar_data(rows=60000, seed=4)
+    totals = estimate_totals(data, "test-sampled-totals", states=("Berlin", "Hessen"))
+    exact = data.loc[data["State"].isin(["Berlin", "Hessen"]), "NetRatedPower"].sum()
+
+    estimate = totals["NetRatedPower"]
+    assert estimate["ci_low"] < exact < estimate["ci_high"]
+    assert estimate["ci_low"] < estimate["estimate"] < estimate["ci_high"]
+
+
+@pytest.mark.parametrize("distinct", [50, 3000, 50000])
+def test_distinct_estimate_within_three_standard_errors(distinct):
+    rng = np.random.default_rng(distinct)
+    rows = 2 * distinct
+    data = pd.DataFrame({
+        "State": rng.choice(["Bayern", "Berlin"], rows),
+        "CommissioningYear": rng.integers(2018, 2021, rows),
+        "City": [f"city-{value}" for value in np.concatenate([np.arange(distinct), rng.integers(0, distinct, distinct)])],
+    })
+    estimate = estimate_distinct(data, f"test-distinct-{distinct}", "City")["estimate"]
+    standard_error = 1.04 / np.sqrt(1 << HLL_PRECISION)
+    assert estimate == pytest.approx(distinct, rel=3 * standard_error)
+
+
+def test_distinct_sketches_merge_across_strata():
+    data = make_solar_data(rows=20000, seed=5)
+    estimate = estimate_distinct(data, "test-distinct-merge", "City", years=(2016, 2017), states=("Bayern", "Hessen"))
+    selected = data[data["CommissioningYear"].between(2016, 2017) & data["State"].isin(["Bayern", "Hessen"])]
+
+    # Few distinct values fall in the linear-counting range, which is nearly exact
+    assert estimate["estimate"] == pytest.approx(selected["City"].nunique(), rel=0.05)
@@ -0,0 +1,89 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from solar_germany import bundle, clients
+from solar_germany.aggregates import cube_from_frame, geography_cube
+from solar_germany.bundle import bake_bundle, bundle_dir, current_bundle, load_bundle
+from tests.conftest import make_solar_data
+
+pytest.importorskip("pyarrow")
+pytest.importorskip("shapely")
+
+STATES = {
+    "type": "FeatureCollection",
+    "features": [
+        {"type": "Feature", "properties": {"name": "Bayern"},
+         "geometry": {"type": "Polygon", "coordinates": [[[10, 48], [12, 48], [12, 50], [10, 50], [10, 48]]]}},
+    ],
+}
+
+
+@pytest.fixture
+def processed(tmp_path, monkeypatch) -> pd.DataFrame:
+    monkeypatch.setattr(bundle, "LOCAL_DATA_PATH", str(tmp_path))
+    monkeypatch.setattr(bundle, "BUNDLE_PATH", str(tmp_path.joinpath("bundles")))
+
+    def load_blob_json(bucket_name, blob_name):
+        if blob_name == bundle.STATES_GEOJSON_FILE:
+            return STATES
+        raise FileNotFoundError(blob_name)
+
+    monkeypatch.setattr(clients, "load_blob_json", load_blob_json)
+    data = make_solar_data(rows=2000, years=(2018, 2020), seed=20)
+    data.to_csv(tmp_path.joinpath("processed_solar_data_2018_2020.csv"), index=False)
+    return data
+
+
+def test_bake_and_load_round_trip(processed, tmp_path):
+    manifest = bake_bundle(2018, 2020, model_path=str(tmp_path.joinpath("missing.pkl")))
+    assert current_bundle() == manifest["version"]
+    assert manifest["rows"] == len(processed)
+    assert "model.pkl" not in manifest["files"]
+
+    loaded = load_bundle()
+    assert loaded["data_version"] == manifest["data_version"]
+    pd.testing.assert_frame_equal(
+        loaded["data"].astype({column: str for column in ("State", "City")})[["State", "City", "GrossPower", "CommissioningYear"]],
+        processed[["State", "City", "GrossPower", "CommissioningYear"]],
+    )
+    # The bundled cube is served from the derived cache under the data version
+    pd.testing.assert_frame_equal(geography_cube(None, loaded["data_version"]), cube_from_frame(processed), check_dtype=False)
+    assert loaded["state_index"].locate(11, 49) == {"State": "Bayern"}
+    assert loaded["district_index"] is None and loaded["model"] is None
+
+
+def test_rebuilds_of_the_same_data_keep_the_data_version(processed, tmp_path, monkeypatch):
+    first = bake_bundle(2018, 2020, model_path=str(tmp_path.joinpath("missing.pkl")))
+    class Later(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime(2100, 1, 1)
+
+    monkeypatch.setattr(bundle, "datetime", Later)
+    second = bake_bundle(2018, 2020, model_path=str(tmp_path.joinpath("missing.pkl")))
+
+    assert first["version"] != second["version"]
+    assert first["data_version"] == second["data_version"]
+    assert load_bundle(first["version"])["data_version"] == load_bundle(second["version"])["data_version"]
+
+
+def test_failed_bake_leaves_no_bundle_behind(processed, tmp_path, monkeypatch):
+    first = bake_bundle(2018, 2020, model_path=str(tmp_path.joinpath("missing.pkl")))
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(bundle, "simplify_geojson", fail)
+    with pytest.raises(RuntimeError):
+        bake_bundle(2018, 2020, model_path=str(tmp_path.joinpath("missing.pkl")))
+
+    assert [path.name for path in tmp_path.joinpath("bundles").iterdir() if path.is_dir()] == [first["version"]]
+    assert current_bundle() == first["version"]
+
+
+def test_unknown_bundles_are_rejected(processed):
+    with pytest.raises(ValueError):
+        load_bundle("missing")
+    assert current_bundle() is None
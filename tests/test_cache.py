@@ -0,0 +1,122 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from solar_germany import cache
+from solar_germany.cache import cache_info, clear_cache, get_or_compute, memoize
+from solar_germany.figures import figure_cache
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    clear_cache()
+    yield
+    clear_cache()
+
+
+def test_memoize_keys_by_version_and_filters():
+    calls = []
+
+    @memoize
+    def total(data, data_version, year, column="GrossPower"):
+        calls.append((data_version, year, column))
+        return data.loc[data["CommissioningYear"] == year, column].sum()
+
+    data = pd.DataFrame({"CommissioningYear": [2020, 2020, 2021], "GrossPower": [1.0, 2.0, 4.0], "NetRatedPower": [1.0, 1.0, 1.0]})
+    assert total(data, "v1", 2020) == 3.0
+    assert total(data, "v1", 2020) == 3.0
+    # The frame is never hashed: the same version with other data is a hit
+    assert total(data.iloc[:0], "v1", 2020) == 3.0
+    assert total(data, "v2", 2020) == 3.0
+    assert total(data, "v1", 2021) == 4.0
+    assert total(data, "v1", 2020, column="NetRatedPower") == 2.0
+
+    assert calls == [("v1", 2020, "GrossPower"), ("v2", 2020, "GrossPower"), ("v1", 2021, "GrossPower"), ("v1", 2020, "NetRatedPower")]
+    info = cache_info()
+    assert (info["entries"], info["bytes"] > 0) == (4, True)
+
+
+def test_cached_results_are_shared():
+    @memoize
+    def frame(data, data_version):
+        return pd.DataFrame({"a": [1, 2, 3]})
+
+    assert frame(None, "v1") is frame(None, "v1")
+
+
+def test_results_larger_than_the_cache_are_not_kept(monkeypatch):
+    monkeypatch.setattr(cache, "derived_cache", type(cache.derived_cache)(maxsize=1000, getsizeof=cache.sizeof))
+    calls = []
+
+    @memoize
+    def big(data, data_version):
+        calls.append(data_version)
+        return pd.DataFrame({"a": np.zeros(10000)})
+
+    big(None, "v1")
+    big(None, "v1")
+    assert calls == ["v1", "v1"]
+    assert cache_info()["entries"] == 0
+
+
+def test_least_recently_used_results_are_evicted_by_size(monkeypatch):
+    monkeypatch.setattr(cache, "derived_cache", type(cache.derived_cache)(maxsize=250000, getsizeof=cache.sizeof))
+
+    @memoize
+    def block(data, data_version, n):
+        return pd.DataFrame({"a": np.zeros(10000)})  # about 80 kB each
+
+    for n in range(5):
+        block(None, "v1", n)
+    assert cache_info()["entries"] == 3
+    assert cache_info()["bytes"] <= 250000
+
+
+def test_get_or_compute_computes_a_missing_key_once():
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "payload"
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        first = executor.submit(get_or_compute, ("figure", "test"), compute)
+        started.wait(5)
+        others = [executor.submit(get_or_compute, ("figure", "test"), compute) for _ in range(3)]
+        release.set()
+        assert [future.result(5) for future in [first] + others] == ["payload"] * 4
+    assert len(calls) == 1
+
+
+def test_get_or_compute_errors_are_not_cached():
+    def fail():
+        raise RuntimeError("plotly failed")
+
+    with pytest.raises(RuntimeError):
+        get_or_compute(("figure", "failing"), fail)
+    assert get_or_compute(("figure", "failing"), lambda: "payload") == "payload"
+
+
+def test_figure_cache_leaves_fixed_inputs_out_of_the_key():
+    calls = []
+
+    class Figure:
+        def to_json(self):
+            return "{}"
+
+    @figure_cache
+    def chart(data, data_version, year, geojson=None, estimate=False):
+        calls.append((year, estimate))
+        return Figure()
+
+    assert chart(None, "v1", 2020, geojson={"features": []}) == "{}"
+    assert chart(None, "v1", 2020, geojson={"features": [1]}) == "{}"
+    chart(None, "v1", 2020, estimate=True)
+    chart(None, "v2", 2020)
+    assert calls == [(2020, False), (2020, True), (2020, False)]
@@ -0,0 +1,88 @@
+import asyncio
+import threading
+
+import pytest
+
+from solar_germany.concurrency import BoundedExecutor, Overloaded
+
+
+def test_runs_work_off_the_event_loop():
+    executor = BoundedExecutor(max_workers=2, max_queue=2)
+    loop_thread = threading.get_ident()
+
+    async def main():
+        return await executor.run(lambda x: (x * 2, threading.get_ident()), 21)
+
+    result, worker_thread = asyncio.run(main())
+    assert result == 42
+    assert worker_thread != loop_thread
+    assert executor.in_flight == 0
+
+
+def test_rejects_work_beyond_workers_and_queue():
+    executor = BoundedExecutor(max_workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def main():
+        running = [asyncio.ensure_future(executor.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        assert executor.in_flight == 2
+        with pytest.raises(Overloaded):
+            await executor.run(release.wait)
+
+        release.set()
+        assert await asyncio.gather(*running) == [True, True]
+        assert executor.in_flight == 0
+        # Room again once the work is done
+        assert await executor.run(lambda: "done") == "done"
+
+    try:
+        asyncio.run(main())
+    finally:
+        release.set()
+
+
+def test_errors_reach_the_caller_and_free_the_slot():
+    executor = BoundedExecutor(max_workers=1, max_queue=0)
+
+    def fail():
+        raise KeyError("boom")
+
+    async def main():
+        with pytest.raises(KeyError):
+            await executor.run(fail)
+        assert executor.in_flight == 0
+
+    asyncio.run(main())
+
+
+def test_cancelled_requests_count_until_their_thread_is_done():
+    executor = BoundedExecutor(max_workers=1, max_queue=0)
+    started, release = threading.Event(), threading.Event()
+
+    def work():
+        started.set()
+        release.wait()
+
+    async def main():
+        request = asyncio.ensure_future(executor.run(work))
+        await asyncio.to_thread(started.wait)
+        # The client disconnects, but the worker thread is still busy
+        request.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await request
+        assert executor.in_flight == 1
+        with pytest.raises(Overloaded):
+            await executor.run(work)
+
+        release.set()
+        for _ in range(100):
+            if executor.in_flight == 0:
+                break
+            await asyncio.sleep(0.01)
+        assert executor.in_flight == 0
+
+    try:
+        asyncio.run(main())
+    finally:
+        release.set()
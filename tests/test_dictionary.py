@@ -0,0 +1,65 @@
+import json
+
+import pandas as pd
+
+from solar_germany import dictionary
+from solar_germany.dictionary import decode, decode_index, encode, read_csv
+from tests.conftest import make_solar_data
+
+# The dictionary is shared by the whole process, so every test uses values of its own
+
+
+def codes(series: pd.Series) -> dict:
+    return dict(zip(series.astype(str), series.cat.codes))
+
+
+def test_frames_encoded_apart_share_codes():
+    first = encode(pd.DataFrame({"City": ["shared-b", "shared-a"]}))
+    second = encode(pd.DataFrame({"City": ["shared-c", "shared-a", "shared-b"]}))
+
+    assert isinstance(first["City"].dtype, pd.CategoricalDtype)
+    # The dictionary only grows: earlier frames hold a prefix of it
+    later = list(second["City"].cat.categories)
+    assert list(first["City"].cat.categories) == later[:len(first["City"].cat.categories)]
+    assert codes(first["City"]) == {value: code for value, code in codes(second["City"]).items() if value != "shared-c"}
+    # A batch is appended in sorted order, later values after it
+    assert codes(second["City"])["shared-a"] < codes(second["City"])["shared-b"] < codes(second["City"])["shared-c"]
+    # Filters compare codes across frames
+    assert second["City"].isin(first["City"]).tolist() == [False, True, True]
+
+
+def test_encode_and_decode_round_trip():
+    data = make_solar_data(rows=500, seed=30)
+    encoded = encode(data)
+
+    for column in dictionary.CATEGORY_COLUMNS:
+        assert isinstance(encoded[column].dtype, pd.CategoricalDtype)
+    pd.testing.assert_frame_equal(decode(encoded), data, check_dtype=False)
+    # Encoding an encoded frame again keeps it as it is
+    pd.testing.assert_frame_equal(encode(encoded), encoded)
+
+    cube = encoded.groupby(["State", "City"], observed=True)["GrossPower"].sum()
+    plain = decode_index(cube.to_frame())
+    assert not isinstance(plain.index.get_level_values("State").dtype, pd.CategoricalDtype)
+
+
+def test_read_csv_encodes_category_columns(tmp_path):
+    csv_path = tmp_path.joinpath("processed.csv")
+    pd.DataFrame({"State": ["csv-state"], "City": ["csv-city"], "GrossPower": [1.5]}).to_csv(csv_path, index=False)
+
+    frame = read_csv(csv_path)
+    assert frame["State"].dtype == dictionary.dtype("State")
+    assert frame["GrossPower"].tolist() == [1.5]
+
+
+def test_saved_dictionaries_keep_their_codes(tmp_path):
+    dictionary_path = tmp_path.joinpath("dictionary.json")
+    encode(pd.DataFrame({"Location": ["saved-roof"]}))
+    dictionary.save(dictionary_path)
+    assert "saved-roof" in json.loads(dictionary_path.read_text())["Location"]
+
+    # A dictionary baked elsewhere appends its unseen values in its own order
+    dictionary_path.write_text(json.dumps({"Location": ["loaded-z", "loaded-a"]}))
+    dictionary.load(dictionary_path)
+    categories = list(dictionary.dtype("Location").categories)
+    assert categories.index("saved-roof") < categories.index("loaded-z") < categories.index("loaded-a")
@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from solar_germany import explain
+from solar_germany.explain import contributions, explain_cached, sweep_values
+from solar_germany.params import MODEL_FEATURES, MODEL_TARGETS, SENSITIVITY_FACTORS, SENSITIVITY_FEATURES
+from solar_germany.prediction import canonical_features, model_input
+from tests.conftest import make_solar_data
+
+xgboost = pytest.importorskip("xgboost")
+pytest.importorskip("sklearn")
+
+CATEGORIES = ["State", "Administrative Region", "City", "MainOrientation", "FeedInType", "Location"]
+
+
+@pytest.fixture(scope="module")
+def model():
+    from sklearn.compose import ColumnTransformer
+    from sklearn.multioutput import MultiOutputRegressor
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import OneHotEncoder
+
+    data = make_solar_data(rows=800, seed=50)
+    preprocess = ColumnTransformer(
+        [("cat", OneHotEncoder(handle_unknown="ignore", sparse_output=False), CATEGORIES)],
+        remainder="passthrough",
+    )
+    regressor = MultiOutputRegressor(xgboost.XGBRegressor(n_estimators=20, max_depth=3))
+    pipeline = Pipeline([("preprocess", preprocess), ("regressor", regressor)])
+    return pipeline.fit(model_input(data), data[MODEL_TARGETS])
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    explain.explanation_cache.clear()
+    yield
+    explain.explanation_cache.clear()
+
+
+def installations(rows: int = 5, seed: int = 51) -> list:
+    data = make_solar_data(rows=rows, seed=seed)
+    return model_input(data).rename(columns={"Administrative Region": "AdministrativeRegion"}).to_dict("records")
+
+
+def test_contributions_add_up_to_the_predictions(model):
+    frame = make_solar_data(rows=50, seed=52)
+    shap, features = contributions(model, frame)
+
+    assert shap.shape == (len(frame), len(MODEL_TARGETS), len(features) + 1)
+    assert features[:len(MODEL_FEATURES)] == MODEL_FEATURES
+    # One-hot columns are summed back into the input they encode
+    assert len(features) == len(MODEL_FEATURES)
+    np.testing.assert_allclose(shap.sum(axis=2), model.predict(model_input(frame)), rtol=1e-4, atol=1e-4)
+
+
+def test_explanations_match_the_model(model):
+    configurations = installations()
+    explanations = explain_cached(model, "v1", configurations)
+    predicted = model.predict(model_input(pd.DataFrame(configurations)))
+
+    for explanation, expected in zip(explanations, predicted):
+        np.testing.assert_allclose(list(explanation["prediction"].values()), expected, rtol=1e-4, atol=1e-4)
+        for target in MODEL_TARGETS:
+            total = explanation["base_value"][target] + sum(explanation["contributions"][target].values())
+            assert total == pytest.approx(explanation["prediction"][target], rel=1e-4, abs=1e-4)
+
+    # Sweeps run around the canonical inputs, and a sweep point predicts like
+    # the configuration with that input changed
+    first = configurations[0]
+    for feature in SENSITIVITY_FEATURES:
+        sweep = explanations[0]["sensitivity"][feature]
+        value = canonical_features(first)[MODEL_FEATURES.index(feature)]
+        assert [point[feature] for point in sweep] == sweep_values(feature, value)
+        changed = model.predict(model_input(pd.DataFrame([{**first, feature: sweep[-1][feature]}])))[0]
+        np.testing.assert_allclose([sweep[-1][target] for target in MODEL_TARGETS], changed, rtol=1e-4, atol=1e-4)
+
+
+def test_explanations_are_cached_per_model_version(model, monkeypatch):
+    configurations = installations(rows=2)
+    explain_cached(model, "v1", configurations)
+
+    calls = []
+    monkeypatch.setattr(explain, "contributions", lambda *args: calls.append(args) or contributions(*args))
+    cached = explain_cached(model, "v1", configurations)
+    assert calls == []
+
+    # Copies, so callers cannot alter the cached results
+    cached[0]["prediction"]["GrossPower"] = -1
+    assert explain_cached(model, "v1", configurations)[0]["prediction"]["GrossPower"] != -1
+
+    explain_cached(model, "v2", configurations)
+    assert len(calls) == 1
+
+
+def test_sweep_values():
+    assert sweep_values("NumberOfModules", 10) == sorted({float(round(10 * factor)) for factor in SENSITIVITY_FACTORS})
+    assert sweep_values("AssignedActivePowerInverter", 0) == [0.0]
+    assert 4.0 in sweep_values("AssignedActivePowerInverter", 4.0)
+
+
+def test_only_xgboost_models_can_be_explained():
+    from sklearn.linear_model import LinearRegression
+
+    with pytest.raises(ValueError):
+        contributions(LinearRegression(), make_solar_data(rows=5))
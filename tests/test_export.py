@@ -0,0 +1,69 @@
+import io
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from solar_germany.export import ARROW_STREAM, JSON, PARQUET, negotiate, serialize
+
+pa = pytest.importorskip("pyarrow")
+
+
+@pytest.mark.parametrize("accept, expected", [
+    (None, JSON),
+    ("", JSON),
+    ("*/*", JSON),
+    ("text/html, application/json", JSON),
+    (ARROW_STREAM, ARROW_STREAM),
+    (f"{PARQUET}, {ARROW_STREAM}", PARQUET),
+    (f"{JSON};q=0.5, {ARROW_STREAM};q=0.9", ARROW_STREAM),
+    (f"{PARQUET};q=0.2, text/csv, {ARROW_STREAM};q=0.8", ARROW_STREAM),
+    (f"{ARROW_STREAM};q=0", JSON),
+    (f"{ARROW_STREAM};q=0.0, {PARQUET};q=0.1", PARQUET),
+    (f"{ARROW_STREAM};q=abc", JSON),
+    (f"{ARROW_STREAM} ; q=1", ARROW_STREAM),
+])
+def test_negotiate_accept_header(accept, expected):
+    assert negotiate(accept) == expected
+
+
+def test_format_overrides_accept_header():
+    assert negotiate(ARROW_STREAM, "parquet") == PARQUET
+    assert negotiate(None, "json") == JSON
+    with pytest.raises(ValueError):
+        negotiate(None, "csv")
+
+
+@pytest.fixture
+def frame() -> pd.DataFrame:
+    return pd.DataFrame({
+        "State": pd.Categorical(["Bayern", "Berlin", "Bayern"]),
+        "GrossPower": [1.5, np.nan, 3.25],
+        "CommissioningYear": [2020, 2021, 2022],
+    })
+
+
+def test_serialize_json(frame):
+    records = json.loads(bytes(serialize(frame, JSON)))
+    assert records == [
+        {"State": "Bayern", "GrossPower": 1.5, "CommissioningYear": 2020},
+        {"State": "Berlin", "GrossPower": None, "CommissioningYear": 2021},
+        {"State": "Bayern", "GrossPower": 3.25, "CommissioningYear": 2022},
+    ]
+
+
+def test_serialize_arrow_stream_round_trips(frame):
+    payload = serialize(frame, ARROW_STREAM)
+    table = pa.ipc.open_stream(pa.py_buffer(payload)).read_all()
+    pd.testing.assert_frame_equal(table.to_pandas(), frame)
+
+
+def test_serialize_parquet_round_trips(frame):
+    payload = serialize(frame, PARQUET)
+    pd.testing.assert_frame_equal(pd.read_parquet(io.BytesIO(bytes(payload))), frame)
+
+
+def test_serialize_rejects_unknown_media_types(frame):
+    with pytest.raises(ValueError):
+        serialize(frame, "text/csv")
@@ -0,0 +1,102 @@
+import threading
+
+import pytest
+
+from solar_germany.jobs import CANCELLED, FAILED, QUEUED, SUCCEEDED, JobRunner
+
+
+def wait(job, timeout: float = 5.0) -> None:
+    job._future.exception(timeout=timeout)
+    assert job.finished
+
+
+def blocking(release: threading.Event, progress) -> str:
+    progress({"message": "started"})
+    release.wait(5)
+    progress({"message": "done"})
+    return "ok"
+
+
+def test_identical_jobs_share_one_run():
+    runner = JobRunner(max_workers=1)
+    release = threading.Event()
+    first = runner.submit(("preprocess", 2000, 2024), blocking, release)
+    second = runner.submit(("preprocess", 2000, 2024), blocking, release)
+    assert second is first
+
+    release.set()
+    wait(first)
+    assert first.status == SUCCEEDED and first.result == "ok"
+    assert first.progress == {"message": "done"}
+    # A finished job can be run again
+    assert runner.submit(("preprocess", 2000, 2024), blocking, release) is not first
+
+
+def test_cancel_queued_and_running_jobs():
+    runner = JobRunner(max_workers=1)
+    release = threading.Event()
+    running = runner.submit(("running",), blocking, release)
+    queued = runner.submit(("queued",), blocking, release)
+    assert queued.status == QUEUED
+
+    runner.cancel(("queued",))
+    assert queued.status == CANCELLED
+    runner.cancel(("running",))
+    release.set()
+    wait(running)
+    assert running.status == CANCELLED
+
+
+def test_failures_are_recorded():
+    def fail(progress):
+        raise ValueError("no data")
+
+    runner = JobRunner(max_workers=1)
+    job = runner.submit(("failing",), fail)
+    wait(job)
+    assert job.status == FAILED
+    assert job.error == "ValueError: no data"
+    assert runner.jobs()[0]["status"] == FAILED
+
+
+def test_finished_jobs_let_go_of_their_arguments():
+    runner = JobRunner(max_workers=1)
+    release = threading.Event()
+    big = list(range(100000))
+    done = runner.submit(("done",), lambda data, progress: len(data), big)
+    running = runner.submit(("running",), blocking, release)
+    cancelled = runner.submit(("cancelled",), lambda data, progress: None, big)
+    runner.cancel(("cancelled",))
+
+    wait(done)
+    assert done.result == len(big)
+    assert (done.args, done.kwargs) == ((), {})
+    assert (cancelled.args, cancelled.kwargs) == ((), {})
+    assert running.args == (release,)
+    release.set()
+    wait(running)
+
+
+def test_only_the_most_recent_finished_jobs_are_kept():
+    runner = JobRunner(max_workers=2, history=3)
+    release = threading.Event()
+    long_running = runner.submit(("long",), blocking, release)
+    for year in range(2000, 2010):
+        wait(runner.submit(("pies", year), lambda progress: None))
+
+    assert [runner.get(("pies", year)) is not None for year in range(2000, 2010)] == [False] * 7 + [True] * 3
+    # Queued and running jobs are never evicted
+    assert runner.get(("long",)) is long_running
+    release.set()
+    wait(long_running)
+
+
+@pytest.mark.parametrize("history", [0, 1])
+def test_history_can_be_tiny(history):
+    runner = JobRunner(max_workers=1, history=history)
+    first = runner.submit(("a",), lambda progress: 1)
+    wait(first)
+    second = runner.submit(("b",), lambda progress: 2)
+    wait(second)
+    assert runner.get(("a",)) is None
+    assert second.result == 2
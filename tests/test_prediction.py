@@ -0,0 +1,88 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from solar_germany import prediction
+from solar_germany.params import MODEL_FEATURES, MODEL_TARGETS
+from solar_germany.prediction import canonical_features, clear_prediction_cache, load_model, predict_cached
+
+
+class ModulesModel:
+    """Predicts GrossPower = scale * NumberOfModules and NetRatedPower = half of it, counting rows."""
+
+    def __init__(self, scale: float = 1.0):
+        self.scale = scale
+        self.rows = 0
+
+    def predict(self, frame: pd.DataFrame) -> np.ndarray:
+        self.rows += len(frame)
+        gross = self.scale * frame["NumberOfModules"].to_numpy(dtype=float)
+        return np.column_stack([gross, gross / 2])
+
+
+def installation(**overrides) -> dict:
+    features = {
+        "State": "Bayern", "AdministrativeRegion": "Bayern-R1", "City": "Bayern-R1-C1",
+        "MainOrientation": "Süd", "FeedInType": "Full Feed-in", "AssignedActivePowerInverter": 10.0,
+        "Location": "Roof", "NumberOfModules": 20,
+    }
+    return {**features, **overrides}
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    clear_prediction_cache()
+    yield
+    clear_prediction_cache()
+
+
+def test_canonical_features_share_a_key_across_spellings():
+    key = canonical_features(installation())
+    assert len(key) == len(MODEL_FEATURES)
+    assert canonical_features(installation(NumberOfModules=20.0, City=" Bayern-R1-C1 ")) == key
+    assert canonical_features(installation(NumberOfModules=np.int64(20))) == key
+    assert canonical_features(installation(NumberOfModules=20.0001)) == key
+    assert canonical_features(installation(NumberOfModules=21)) != key
+
+    with pytest.raises(ValueError):
+        canonical_features({"State": "Bayern"})
+
+
+def test_predict_cached_predicts_each_configuration_once():
+    model = ModulesModel()
+    results = predict_cached(model, "v1", [installation(), installation(NumberOfModules=40), installation()])
+
+    assert [result["GrossPower"] for result in results] == [20.0, 40.0, 20.0]
+    assert set(results[0]) == set(MODEL_TARGETS)
+    assert model.rows == 2
+
+    # Answered from the cache, and the copies returned cannot alter it
+    results[0]["GrossPower"] = -1
+    assert predict_cached(model, "v1", [installation()])[0]["GrossPower"] == 20.0
+    assert model.rows == 2
+
+
+def test_predict_cached_keys_results_by_model_version():
+    predict_cached(ModulesModel(), "v1", [installation()])
+    newer = ModulesModel(scale=2.0)
+    assert predict_cached(newer, "v2", [installation()])[0]["GrossPower"] == 40.0
+    assert newer.rows == 1
+
+
+def test_load_model_reloads_a_replaced_model_file(tmp_path):
+    joblib = pytest.importorskip("joblib")
+    model_path = tmp_path.joinpath("model.pkl")
+    joblib.dump(ModulesModel(scale=1.0), model_path)
+    first = load_model(str(model_path))
+    assert load_model(str(model_path)) is first
+
+    # The file is replaced in place: a new version, and the new pipeline with it
+    modified = model_path.stat().st_mtime_ns
+    joblib.dump(ModulesModel(scale=3.0), model_path)
+    os.utime(model_path, ns=(modified + 10 ** 9, modified + 10 ** 9))
+    version = prediction.model_version(str(model_path))
+    reloaded = load_model(str(model_path))
+    assert reloaded.scale == 3.0
+    assert predict_cached(reloaded, version, [installation()])[0]["GrossPower"] == 60.0
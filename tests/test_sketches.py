@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from solar_germany.sketches import quantiles, sketch_from_frame
+
+ACCURACY = 0.01
+
+
+def exact_quantile(values: np.ndarray, q: float) -> float:
+    # The rank `quantiles` reads: the value at position q * (n - 1)
+    return float(np.sort(values)[int(np.floor(q * (len(values) - 1)))])
+
+
+@pytest.mark.parametrize("q", [0.0, 0.1, 0.5, 0.9, 0.99, 1.0])
+def test_quantiles_within_relative_accuracy(q):
+    values = np.random.default_rng(0).lognormal(1.0, 2.0, 20000)
+    sketch = sketch_from_frame(pd.DataFrame({"GrossPower": values, "State": "Bayern"}), "GrossPower", ["State"], ACCURACY)
+    estimate = quantiles(sketch, [q], ACCURACY)[q]
+    assert estimate == pytest.approx(exact_quantile(values, q), rel=ACCURACY)
+
+
+def test_merged_sketches_equal_the_sketch_of_the_union():
+    rng = np.random.default_rng(1)
+    frame = pd.DataFrame({"GrossPower": rng.lognormal(0.0, 1.5, 5000), "State": rng.choice(["Bayern", "Berlin"], 5000)})
+    per_state = sketch_from_frame(frame, "GrossPower", ["State"])
+    whole = sketch_from_frame(frame.assign(State="all"), "GrossPower", ["State"])
+
+    qs = [0.25, 0.5, 0.75]
+    assert quantiles(per_state, qs) == quantiles(whole, qs)
+
+
+def test_zero_and_empty_sketches():
+    frame = pd.DataFrame({"GrossPower": [0.0, 0.0, 0.0, 5.0], "State": "Bayern"})
+    sketch = sketch_from_frame(frame, "GrossPower", ["State"])
+    assert quantiles(sketch, [0.5])[0.5] == 0.0
+    assert np.isnan(quantiles(sketch.iloc[:0], [0.5])[0.5])
@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from solar_germany import snapshots
+from solar_germany.aggregates import cube_from_frame
+from solar_germany.snapshots import RAW_COLUMNS, compare_snapshots, create_snapshot, load_snapshot, read_cube
+from tests.conftest import make_solar_data
+
+
+@pytest.fixture(autouse=True)
+def snapshot_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshots, "SNAPSHOT_PATH", str(tmp_path))
+
+
+def raw(data: pd.DataFrame) -> pd.DataFrame:
+    return data[RAW_COLUMNS].reset_index(drop=True)
+
+
+def chunks(data: pd.DataFrame, size: int = 700) -> list:
+    return [data.iloc[start:start + size] for start in range(0, len(data), size)]
+
+
+def assert_same_cube(actual: pd.DataFrame, expected: pd.DataFrame) -> None:
+    pd.testing.assert_frame_equal(actual.sort_index(), expected.sort_index(), check_dtype=False, rtol=1e-9)
+
+
+def test_child_snapshot_stores_only_the_delta():
+    data = raw(make_solar_data(rows=3000, seed=10))
+    # A release drops every fifth unit and adds a new year
+    newer = pd.concat([data[np.arange(len(data)) % 5 != 0], raw(make_solar_data(rows=400, years=(2021, 2021), seed=11))])
+
+    create_snapshot("base", chunks(data))
+    manifest = create_snapshot("next", chunks(newer), parent="base")
+
+    assert manifest["rows"] == len(newer)
+    assert manifest["added"] == 400
+    assert manifest["removed"] == len(data) - (np.arange(len(data)) % 5 != 0).sum()
+    assert len(pd.read_parquet(snapshots.snapshot_dir("next").joinpath("added.parquet"))) == 400
+
+    loaded = load_snapshot("next")
+    assert len(loaded) == len(newer)
+    assert_same_cube(read_cube("next"), cube_from_frame(loaded))
+
+
+def test_duplicate_rows_stay_distinct():
+    data = raw(make_solar_data(rows=200, seed=12))
+    doubled = pd.concat([data, data.iloc[:50]])
+    create_snapshot("base", [doubled])
+    # Removing one of two identical rows removes exactly one unit
+    manifest = create_snapshot("next", [pd.concat([data, data.iloc[:49]])], parent="base")
+
+    assert manifest["removed"] == 1
+    assert read_cube("next")["Installations"].sum() == len(data) + 49
+
+
+def test_removals_do_not_read_the_history():
+    data = raw(make_solar_data(rows=2000, seed=13))
+    create_snapshot("base", [data])
+    create_snapshot("second", [data.iloc[100:]], parent="base")
+
+    def read_added(*args, **kwargs):
+        raise AssertionError("a removal must not read the rows added by earlier snapshots")
+
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(snapshots, "_read_added", read_added)
+        create_snapshot("third", [data.iloc[300:]], parent="second")
+
+    assert_same_cube(read_cube("third"), cube_from_frame(load_snapshot("third")))
+
+
+def test_quarantined_rows_are_neither_stored_nor_aggregated():
+    data = raw(make_solar_data(rows=500, seed=14))
+    data.loc[:9, "State"] = "Atlantis"
+    manifest = create_snapshot("base", [data])
+    assert manifest["quarantined"] == 10
+
+    # Removing quarantined rows later leaves the cube unchanged
+    create_snapshot("next", [data.iloc[10:]], parent="base")
+    assert_same_cube(read_cube("next"), read_cube("base"))
+
+
+def test_compare_reports_the_change_per_level():
+    data = raw(make_solar_data(rows=2000, seed=15))
+    create_snapshot("base", [data])
+    newer = data[data["State"] != "Berlin"]
+    create_snapshot("next", [newer], parent="base")
+
+    comparison = compare_snapshots("base", "next", level="State")
+    berlin = data.loc[data["State"] == "Berlin", "GrossPower"].sum()
+    assert comparison.loc["Berlin", ("target", "GrossPower")] == 0
+    assert comparison.loc["Berlin", ("change", "GrossPower")] == pytest.approx(-berlin)
+    assert comparison.loc["Bayern", ("change", "GrossPower")] == pytest.approx(0, abs=1e-9)
+
+
+def test_existing_snapshots_are_not_overwritten():
+    create_snapshot("base", [raw(make_solar_data(rows=100))])
+    with pytest.raises(ValueError):
+        create_snapshot("base", [raw(make_solar_data(rows=100))])
+    with pytest.raises(ValueError):
+        load_snapshot("missing")
+
+
+def test_parents_without_stored_cells_fall_back_to_their_lineage():
+    data = raw(make_solar_data(rows=1000, seed=16))
+    create_snapshot("base", [data])
+    snapshots.snapshot_dir("base").joinpath("cells.parquet").unlink()
+
+    create_snapshot("next", [data.iloc[250:]], parent="base")
+    assert_same_cube(read_cube("next"), cube_from_frame(load_snapshot("next")))
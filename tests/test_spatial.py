@@ -0,0 +1,89 @@
+import math
+import pickle
+
+import pytest
+
+from solar_germany.spatial import KM_PER_DEGREE_LAT, KM_PER_DEGREE_LON_AT_EQUATOR, SpatialIndex, aggregate_areas, bounding_box, circle
+
+shapely = pytest.importorskip("shapely")
+
+
+def square(lon: float, lat: float, size: float = 1.0) -> dict:
+    ring = [[lon, lat], [lon + size, lat], [lon + size, lat + size], [lon, lat + size], [lon, lat]]
+    return {"type": "Polygon", "coordinates": [ring]}
+
+
+# Three districts side by side, the first two in the same region
+DISTRICTS = {
+    "type": "FeatureCollection",
+    "features": [
+        {"type": "Feature", "properties": {"state": "Bayern", "region": "Bayern-R1", "name": "Bayern-R1-C1"}, "geometry": square(10, 48)},
+        {"type": "Feature", "properties": {"state": "Bayern", "region": "Bayern-R1", "name": "Bayern-R1-C2"}, "geometry": square(11, 48)},
+        {"type": "Feature", "properties": {"state": "Berlin", "region": "Berlin-R1", "name": "Berlin-R1-C1"}, "geometry": square(13, 52)},
+        {"type": "Feature", "properties": {"name": "no geometry"}, "geometry": None},
+    ],
+}
+LEVELS = {"State": "state", "AdministrativeRegion": "region", "City": "name"}
+
+
+@pytest.fixture
+def index() -> SpatialIndex:
+    return SpatialIndex(DISTRICTS, LEVELS)
+
+
+def test_locate(index):
+    assert index.locate(10.5, 48.5) == {"State": "Bayern", "AdministrativeRegion": "Bayern-R1", "City": "Bayern-R1-C1"}
+    assert index.locate(13.2, 52.9)["City"] == "Berlin-R1-C1"
+    assert index.locate(0, 0) is None
+    # A point on a shared border goes to the first area
+    assert index.locate(11.0, 48.5)["City"] == "Bayern-R1-C1"
+
+
+def test_locate_many_matches_locate(index):
+    lons, lats = [10.5, 11.5, 13.5, 0.0, 11.0], [48.5, 48.5, 52.5, 0.0, 48.5]
+    located = index.locate_many(lons, lats)
+    for row, (lon, lat) in enumerate(zip(lons, lats)):
+        expected = index.locate(lon, lat)
+        if expected is None:
+            assert located.iloc[row].isna().all()
+        else:
+            assert located.iloc[row].to_dict() == expected
+
+
+def test_bbox_and_radius_queries(index):
+    assert list(index.intersecting(bounding_box(10.2, 48.2, 11.2, 48.4))["City"]) == ["Bayern-R1-C1", "Bayern-R1-C2"]
+    assert index.intersecting(bounding_box(0, 0, 1, 1)).empty
+    # 1 degree of latitude is about 111 km
+    assert list(index.intersecting(circle(13.5, 51.5, 40))["City"]) == []
+    assert list(index.intersecting(circle(13.5, 51.5, 60))["City"]) == ["Berlin-R1-C1"]
+
+
+def test_circle_radius_on_the_ground():
+    disk = circle(10.0, 50.0, 10.0)
+    min_lon, min_lat, max_lon, max_lat = disk.bounds
+    assert (max_lat - min_lat) / 2 * KM_PER_DEGREE_LAT == pytest.approx(10.0)
+    assert (max_lon - min_lon) / 2 * KM_PER_DEGREE_LON_AT_EQUATOR * math.cos(math.radians(50.0)) == pytest.approx(10.0)
+
+
+def test_index_survives_pickling(index):
+    restored = pickle.loads(pickle.dumps(index))
+    assert restored.locate(11.5, 48.5) == index.locate(11.5, 48.5)
+
+
+def test_aggregate_areas_sums_the_cube(index, solar_data):
+    areas = index.intersecting(bounding_box(10.2, 48.2, 11.2, 48.4))
+    result = aggregate_areas(solar_data, "test-aggregate-areas", areas, year=2018)
+
+    selected = solar_data[solar_data["City"].isin(["Bayern-R1-C1", "Bayern-R1-C2"]) & (solar_data["CommissioningYear"] == 2018)]
+    assert [area["City"] for area in result["areas"]] == ["Bayern-R1-C1", "Bayern-R1-C2"]
+    assert result["totals"]["GrossPower"] == pytest.approx(selected["GrossPower"].sum())
+    assert result["totals"]["NumberOfModules"] == selected["NumberOfModules"].sum()
+
+
+def test_aggregate_areas_without_data_gives_zeros(solar_data):
+    index = SpatialIndex({"type": "FeatureCollection", "features": [
+        {"type": "Feature", "properties": {"name": "Bremen"}, "geometry": square(8, 53)},
+    ]}, {"State": "name"})
+    result = aggregate_areas(solar_data, "test-aggregate-empty", index.intersecting(bounding_box(8, 53, 9, 54)))
+    assert result["areas"] == [{"State": "Bremen", "NumberOfModules": 0.0, "GrossPower": 0.0, "NetRatedPower": 0.0}]
+    assert result["totals"]["GrossPower"] == 0
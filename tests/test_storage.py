@@ -0,0 +1,69 @@
+import pandas as pd
+import pytest
+
+from solar_germany.storage import block_index, read_filtered, select_blocks, write_dataset
+from tests.conftest import make_solar_data
+
+pytest.importorskip("pyarrow")
+
+
+def chunks(data: pd.DataFrame, size: int = 1500) -> list:
+    return [data.iloc[start:start + size] for start in range(0, len(data), size)]
+
+
+def expected(data: pd.DataFrame, mask) -> pd.DataFrame:
+    rows = data[mask]
+    return rows.sort_values(list(rows.columns)).reset_index(drop=True)
+
+
+def actual(frame: pd.DataFrame, columns: list) -> pd.DataFrame:
+    return frame[columns].sort_values(columns).reset_index(drop=True)
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    data = make_solar_data(rows=6000, years=(2010, 2020), seed=20)
+    path = write_dataset(chunks(data), tmp_path.joinpath("dataset"), row_group_size=200)
+    return data, path
+
+
+def test_read_filtered_matches_a_full_scan(dataset):
+    data, path = dataset
+    columns = list(data.columns)
+
+    selection = read_filtered(path, years=(2012, 2014), states=("Berlin", "Hessen"))
+    mask = data["CommissioningYear"].between(2012, 2014) & data["State"].isin(["Berlin", "Hessen"])
+    pd.testing.assert_frame_equal(actual(selection, columns), expected(data, mask), check_dtype=False)
+
+    selection = read_filtered(path, cities=("Bayern-R1-C2",), ranges={"GrossPower": (2.0, 5.0)})
+    mask = (data["City"] == "Bayern-R1-C2") & data["GrossPower"].between(2.0, 5.0)
+    pd.testing.assert_frame_equal(actual(selection, columns), expected(data, mask), check_dtype=False)
+
+
+def test_statistics_prune_blocks(dataset):
+    _, path = dataset
+    every = select_blocks(path)
+    assert len(every) == len(block_index(path)) > 0
+
+    one_state_year = select_blocks(path, years=(2015, 2015), states=("Berlin",))
+    assert 0 < len(one_state_year) < len(every) / 2
+    assert select_blocks(path, states=("Atlantis",)) == []
+
+
+def test_selected_columns_and_empty_selections(dataset):
+    _, path = dataset
+    selection = read_filtered(path, years=(2020, 2020), columns=["City", "GrossPower"])
+    assert list(selection.columns) == ["City", "GrossPower"]
+    assert len(selection) > 0
+
+    empty = read_filtered(path, years=(1990, 1995), columns=["GrossPower"])
+    assert empty.empty and list(empty.columns) == ["GrossPower"]
+
+
+def test_write_dataset_replaces_the_previous_one(dataset):
+    data, path = dataset
+    write_dataset(chunks(data[data["State"] == "Bayern"]), path, row_group_size=200)
+
+    assert not path.with_name(path.name + ".partial").exists()
+    assert set(read_filtered(path, columns=["State"])["State"]) == {"Bayern"}
+    assert select_blocks(path, states=("Berlin",)) == []
@@ -0,0 +1,77 @@
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from solar_germany.streaming import PrefetchReader, load_json
+
+DOCUMENTS = [
+    {"type": "FeatureCollection", "features": []},
+    {"features": [{"id": 1}, {"id": 2}], "type": "FeatureCollection"},
+    {
+        "type": "FeatureCollection",
+        "name": "Landkreise – Süd",
+        "crs": {"properties": {"name": "urn:ogc:def:crs:OGC:1.3:CRS84"}},
+        "features": [
+            {
+                "type": "Feature",
+                "properties": {"name": "Müncheñ 😀", "value": -2.5e-3, "count": 123456789, "flag": True, "none": None},
+                "geometry": {"type": "Polygon", "coordinates": [[[11.5, 48.1], [11.6, 48.1], [11.6, 48.2], [11.5, 48.1]]]},
+            }
+            for _ in range(20)
+        ],
+        "bbox": [5.8, 47.2, 15.1, 55.1],
+    },
+    {"type": "FeatureCollection"},
+    # Bare numbers can be cut by the end of a read
+    {"features": [123456789, -2.5e-3, 1e100, 0, 17], "total": 987654321, "ratio": -0.125},
+    {"features": {"not": "an array"}},
+    {},
+]
+
+
+@pytest.mark.parametrize("document", DOCUMENTS)
+@pytest.mark.parametrize("read_size", [1, 3, 7, 64, 1 << 20])
+@pytest.mark.parametrize("indent", [None, 2])
+def test_load_json_matches_json_loads(document, read_size, indent):
+    text = json.dumps(document, ensure_ascii=False, indent=indent)
+    assert load_json(io.BytesIO(text.encode()), read_size=read_size) == json.loads(text)
+
+
+def test_load_json_through_prefetch_reader():
+    text = json.dumps(DOCUMENTS[2]).encode()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        reader = PrefetchReader(io.BytesIO(text), chunk_size=5, depth=2, executor=executor)
+        assert load_json(reader, read_size=11) == json.loads(text)
+        reader.close()
+
+
+def test_load_json_skips_byte_order_mark():
+    assert load_json(io.BytesIO(b'\xef\xbb\xbf{"features": [1]}')) == {"features": [1]}
+
+
+@pytest.mark.parametrize("text", [b'{"features": [1, 2}', b'{"a": 1} {"b": 2}', b'[1, 2]', b'{"a" 1}', b'{1: 2}', b''])
+def test_load_json_rejects_invalid_documents(text):
+    with pytest.raises(ValueError):
+        load_json(io.BytesIO(text), read_size=4)
+
+
+def test_prefetch_reader_returns_every_byte():
+    data = bytes(range(256)) * 1000
+    reader = PrefetchReader(io.BytesIO(data), chunk_size=1000, depth=3)
+    assert reader.read() == data
+    assert reader.read() == b""
+
+
+def test_prefetch_reader_raises_source_errors():
+    class Failing(io.RawIOBase):
+        def readable(self):
+            return True
+
+        def read(self, size=-1):
+            raise OSError("connection reset")
+
+    reader = PrefetchReader(Failing(), chunk_size=10)
+    with pytest.raises(OSError, match="connection reset"):
+        reader.read()
@@ -0,0 +1,121 @@
+import math
+
+import pytest
+
+from solar_germany.tiles import _varint, _zigzag, encode_layer, generate_tiles, read_tile
+
+mapbox_vector_tile = pytest.importorskip("mapbox_vector_tile")
+shapely_geometry = pytest.importorskip("shapely.geometry")
+
+
+def decode(tile: bytes) -> dict:
+    # Keep tile coordinates as encoded (y down, no flip to the extent)
+    return mapbox_vector_tile.decode(tile, default_options={"y_coord_down": True})
+
+
+def signed_area(ring: list) -> float:
+    # Shoelace formula in tile coordinates (y down), as used by the MVT specification
+    return sum(x1 * y2 - x2 * y1 for (x1, y1), (x2, y2) in zip(ring, ring[1:] + ring[:1])) / 2
+
+
+def test_varint_and_zigzag():
+    assert _varint(0) == b"\x00"
+    assert _varint(1) == b"\x01"
+    assert _varint(300) == b"\xac\x02"
+    assert [_zigzag(value) for value in (0, -1, 1, -2, 2)] == [0, 1, 2, 3, 4]
+
+
+def test_polygon_with_hole_round_trips():
+    polygon = shapely_geometry.Polygon(
+        [(0, 0), (4000, 0), (4000, 4000), (0, 4000)],
+        holes=[[(1000, 1000), (1000, 2000), (2000, 2000), (2000, 1000)]],
+    )
+    tile = decode(encode_layer("district", [(7, polygon, {"City": "München", "GrossPower_2023": 1.5})]))
+
+    layer = tile["district"]
+    assert layer["extent"] == 4096
+    (feature,) = layer["features"]
+    assert feature["id"] == 7
+    assert feature["properties"] == {"City": "München", "GrossPower_2023": 1.5}
+    decoded = shapely_geometry.shape(feature["geometry"])
+    assert decoded.geom_type == "Polygon"
+    assert len(decoded.interiors) == 1
+    assert decoded.equals(polygon)
+    # Exterior rings have a positive area and holes a negative one
+    exterior, hole = feature["geometry"]["coordinates"]
+    assert signed_area(exterior) > 0
+    assert signed_area(hole) < 0
+
+
+def test_multipolygon_and_winding_round_trip():
+    # Clockwise input rings must come out as separate exteriors, not holes
+    first = shapely_geometry.Polygon([(0, 0), (0, 100), (100, 100), (100, 0)])
+    second = shapely_geometry.Polygon([(200, 200), (300, 200), (300, 300), (200, 300)])
+    multipolygon = shapely_geometry.MultiPolygon([first, second])
+    tile = decode(encode_layer("state", [(1, multipolygon, {"State": "Bayern"})]))
+
+    decoded = shapely_geometry.shape(tile["state"]["features"][0]["geometry"])
+    assert decoded.geom_type == "MultiPolygon"
+    assert decoded.equals(multipolygon)
+
+
+def test_properties_and_values_are_shared_and_nan_dropped():
+    square = shapely_geometry.box(0, 0, 10, 10)
+    features = [
+        (1, square, {"State": "Bayern", "NumberOfModules_2023": 12.0, "GrossPower_2023": math.nan}),
+        (2, square, {"State": "Bayern", "NumberOfModules_2023": None}),
+    ]
+    tile = decode(encode_layer("state", features))
+
+    first, second = tile["state"]["features"]
+    assert first["properties"] == {"State": "Bayern", "NumberOfModules_2023": 12.0}
+    assert second["properties"] == {"State": "Bayern"}
+
+
+def test_features_without_polygons_are_dropped():
+    # Clipping can leave empty or line geometries behind
+    for geometry in (shapely_geometry.Polygon(), shapely_geometry.LineString([(0, 0), (10, 0)])):
+        assert encode_layer("state", [(1, geometry, {"State": "Bayern"})]) == b""
+    assert encode_layer("state", []) == b""
+
+
+STATES = {
+    "type": "FeatureCollection",
+    "features": [
+        {"type": "Feature", "properties": {"name": "Bayern"},
+         "geometry": {"type": "Polygon", "coordinates": [[[10, 48], [12, 48], [12, 50], [10, 50], [10, 48]]]}},
+    ],
+}
+
+
+def tile_files(root) -> set:
+    return {path.relative_to(root).as_posix() for path in root.rglob("*.pbf")}
+
+
+def test_generate_tiles_replaces_the_previous_build(tmp_path, solar_data):
+    output_dir = tmp_path.joinpath("tiles")
+    generate_tiles(solar_data, "test-tiles", STATES, None, {}, str(output_dir), levels={"state": (4, 6)})
+    assert {path.split("/")[1] for path in tile_files(output_dir)} == {"4", "5", "6"}
+
+    written = generate_tiles(solar_data, "test-tiles", STATES, None, {}, str(output_dir), levels={"state": (4, 4)})
+    assert written == {"state": 1}
+    assert tile_files(output_dir) == {"state/4/8/5.pbf"}
+    assert read_tile("state", 5, 16, 11, tile_dir=str(output_dir)) == b""
+    (feature,) = decode(read_tile("state", 4, 8, 5, tile_dir=str(output_dir)))["state"]["features"]
+    assert feature["properties"]["State"] == "Bayern"
+    assert not tmp_path.joinpath("tiles.partial").exists()
+
+
+def test_failed_build_keeps_the_previous_tiles(tmp_path, solar_data, monkeypatch):
+    output_dir = tmp_path.joinpath("tiles")
+    generate_tiles(solar_data, "test-tiles", STATES, None, {}, str(output_dir), levels={"state": (4, 5)})
+    before = tile_files(output_dir)
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("broken polygons")
+
+    monkeypatch.setattr("solar_germany.tiles.level_areas", fail)
+    with pytest.raises(RuntimeError):
+        generate_tiles(solar_data, "test-tiles", STATES, None, {}, str(output_dir), levels={"state": (4, 4)})
+    assert tile_files(output_dir) == before
+    assert not tmp_path.joinpath("tiles.partial").exists()
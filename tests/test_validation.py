@@ -0,0 +1,79 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from solar_germany.validation import REASONS, QualityStats, count_reasons, describe, reason_codes, validate_chunk
+from tests.conftest import make_solar_data
+
+
+def raw_chunk(rows: int = 20) -> pd.DataFrame:
+    return make_solar_data(rows=rows, seed=30).drop(columns="Efficiency")
+
+
+def test_valid_rows_have_no_reasons():
+    chunk = raw_chunk()
+    assert not reason_codes(chunk).any()
+    valid, quarantined, counts = validate_chunk(chunk)
+    assert len(valid) == len(chunk) and quarantined.empty
+    assert set(counts.values()) == {0}
+
+
+@pytest.mark.parametrize("column, value, reason", [
+    ("State", None, "missing_State"),
+    ("State", "Atlantis", "unknown_State"),
+    ("FeedInType", "Sometimes", "unknown_FeedInType"),
+    ("GrossPower", -1.0, "out_of_range_GrossPower;efficiency_outlier"),
+    ("NumberOfModules", 0, "out_of_range_NumberOfModules"),
+    ("CommissioningYear", 1900, "out_of_range_CommissioningYear"),
+    ("AssignedActivePowerInverter", "n/a", "not_numeric_AssignedActivePowerInverter"),
+])
+def test_each_rule_sets_its_reason(column, value, reason):
+    chunk = raw_chunk()
+    chunk[column] = chunk[column].astype(object)
+    chunk.loc[3, column] = value
+
+    codes = reason_codes(chunk)
+    assert np.flatnonzero(codes).tolist() == [3]
+    assert describe(codes[3:4]) == [reason]
+
+
+def test_several_failures_are_all_reported():
+    chunk = raw_chunk()
+    chunk["GrossPower"] = chunk["GrossPower"].astype(object)
+    chunk.loc[0, ["State", "GrossPower"]] = ["Atlantis", "lots"]
+    chunk.loc[1, "NetRatedPower"] = chunk.loc[1, "GrossPower"] * 100  # efficiency 0.01
+
+    valid, quarantined, counts = validate_chunk(chunk)
+    assert len(valid) == len(chunk) - 2
+    assert quarantined["Reasons"].tolist() == [
+        "missing_GrossPower;not_numeric_GrossPower;unknown_State;efficiency_outlier",
+        "efficiency_outlier",
+    ]
+    assert counts["efficiency_outlier"] == 2
+    assert counts["unknown_State"] == 1
+    # Numbers sent as strings are converted in place
+    assert pd.api.types.is_numeric_dtype(valid["GrossPower"])
+
+
+def test_count_reasons_weights_distinct_codes():
+    chunk = raw_chunk()
+    chunk.loc[[2, 5], "State"] = "Atlantis"
+    codes, counts = np.unique(reason_codes(chunk), return_counts=True)
+    assert count_reasons(codes, counts)["unknown_State"] == 2
+
+
+def test_quality_stats_accumulate(tmp_path):
+    stats = QualityStats()
+    for _ in range(2):
+        chunk = raw_chunk()
+        chunk.loc[0, "State"] = "Atlantis"
+        valid, quarantined, counts = validate_chunk(chunk)
+        stats.add(len(chunk), len(quarantined), counts)
+
+    stats.save(tmp_path.joinpath("quality.json"))
+    saved = json.loads(tmp_path.joinpath("quality.json").read_text())
+    assert (saved["rows_checked"], saved["rows_valid"], saved["rows_quarantined"]) == (40, 38, 2)
+    assert saved["reasons"] == {"unknown_State": 2}
+    assert set(saved["reasons"]) <= set(REASONS)